@@ -0,0 +1,53 @@
+"""Индексы для частых запросов
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18 15:10:00
+
+Таблицы создает Base.metadata.create_all при запуске бота, поэтому миграция
+только добавляет индексы и применяется к существующим bot.db на месте.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя индекса, таблица, колонки)
+INDEXES = [
+    # Последняя попытка пользователя по тесту, прогресс по тестам
+    ('ix_test_attempts_user_test_created', 'test_attempts', ['user_id', 'test_id', 'created_at']),
+    # Непрочитанные объявления пользователя
+    ('ix_announcement_deliveries_user_delivered', 'announcement_deliveries', ['user_id', 'is_delivered']),
+    # Ожидающие записи рассылки и прогресс по объявлению
+    ('ix_announcement_deliveries_announcement_delivered', 'announcement_deliveries', ['announcement_id', 'is_delivered']),
+    # Дочерние категории по родителю и уровню
+    ('ix_categories_parent_level', 'categories', ['parent_id', 'level']),
+    # Статьи категории
+    ('ix_articles_category', 'articles', ['category_id']),
+    # Вопросы теста
+    ('ix_questions_test', 'questions', ['test_id']),
+    # Варианты ответа в порядке отображения
+    ('ix_answers_question_position', 'answers', ['question_id', 'position']),
+    # Изображения статьи в порядке отображения
+    ('ix_article_images_article_position', 'article_images', ['article_id', 'position']),
+    # Журнал действий администраторов по дате
+    ('ix_admin_logs_created', 'admin_logs', ['created_at']),
+]
+
+
+def upgrade() -> None:
+    # if_not_exists: на новых базах индексы уже созданы create_all из моделей
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
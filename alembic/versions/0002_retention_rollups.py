@@ -0,0 +1,56 @@
+"""Итоги архивированных попыток и индексы для архивации
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 15:30:00
+
+На новых базах таблицу и индексы уже создает create_all из моделей,
+поэтому миграция пропускает существующие объекты.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (имя индекса, таблица, колонки)
+INDEXES = [
+    # Поиск устаревших попыток для архивации
+    ('ix_test_attempts_created', 'test_attempts', ['created_at']),
+    # Поиск устаревших доставок объявлений для архивации
+    ('ix_announcement_deliveries_delivered_at', 'announcement_deliveries', ['delivered_at']),
+    # Статистика теста по итогам архивированных попыток
+    ('ix_test_attempt_rollups_test', 'test_attempt_rollups', ['test_id']),
+]
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('test_attempt_rollups'):
+        op.create_table(
+            'test_attempt_rollups',
+            sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.user_id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('test_id', sa.Integer(), sa.ForeignKey('tests.test_id', ondelete='CASCADE'), primary_key=True),
+            sa.Column('attempts_count', sa.Integer(), nullable=False),
+            sa.Column('passed_count', sa.Integer(), nullable=False),
+            sa.Column('score_sum', sa.Integer(), nullable=False),
+            sa.Column('best_score', sa.Integer(), nullable=False),
+            sa.Column('last_score', sa.Integer(), nullable=False),
+            sa.Column('last_is_passed', sa.Boolean(), nullable=False),
+            sa.Column('last_attempt_at', sa.DateTime(), nullable=True),
+        )
+
+    for name, table, columns in INDEXES:
+        op.create_index(name, table, columns, if_not_exists=True)
+
+
+def downgrade() -> None:
+    for name, table, columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table, if_exists=True)
+
+    op.drop_table('test_attempt_rollups')
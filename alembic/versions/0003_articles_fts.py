@@ -0,0 +1,56 @@
+"""Полнотекстовый индекс статей (SQLite FTS5)
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 16:00:00
+
+Индекс и триггеры также создаются при запуске бота
+(bot/services/search.py), поэтому миграция пропускает существующие объекты.
+Для других СУБД миграция ничего не делает.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SCHEMA = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5("
+    "title, content, content='articles', content_rowid='article_id')",
+    "CREATE TRIGGER IF NOT EXISTS articles_fts_ai AFTER INSERT ON articles BEGIN "
+    "INSERT INTO articles_fts(rowid, title, content) VALUES (new.article_id, new.title, new.content); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS articles_fts_ad AFTER DELETE ON articles BEGIN "
+    "INSERT INTO articles_fts(articles_fts, rowid, title, content) "
+    "VALUES ('delete', old.article_id, old.title, old.content); "
+    "END",
+    "CREATE TRIGGER IF NOT EXISTS articles_fts_au AFTER UPDATE OF title, content ON articles BEGIN "
+    "INSERT INTO articles_fts(articles_fts, rowid, title, content) "
+    "VALUES ('delete', old.article_id, old.title, old.content); "
+    "INSERT INTO articles_fts(rowid, title, content) VALUES (new.article_id, new.title, new.content); "
+    "END",
+    # Заполнение индекса из существующих статей
+    "INSERT INTO articles_fts(articles_fts) VALUES ('rebuild')",
+]
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for statement in SCHEMA:
+        op.execute(statement)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for trigger in ('articles_fts_au', 'articles_fts_ad', 'articles_fts_ai'):
+        op.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+    op.execute("DROP TABLE IF EXISTS articles_fts")
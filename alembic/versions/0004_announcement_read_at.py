@@ -0,0 +1,38 @@
+"""Отметка о прочтении объявления
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 17:00:00
+
+Прочтение объявления хранится отдельно от статуса рассылки
+(is_delivered/delivered_at), которым пользуется очередь отправки.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_read_at() -> bool:
+    columns = sa.inspect(op.get_bind()).get_columns('announcement_deliveries')
+    return any(column['name'] == 'read_at' for column in columns)
+
+
+def upgrade() -> None:
+    # На новых базах колонку уже создал create_all из моделей
+    if not _has_read_at():
+        with op.batch_alter_table('announcement_deliveries') as batch_op:
+            batch_op.add_column(sa.Column('read_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    if _has_read_at():
+        with op.batch_alter_table('announcement_deliveries') as batch_op:
+            batch_op.drop_column('read_at')
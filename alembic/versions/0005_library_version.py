@@ -0,0 +1,34 @@
+"""Версия библиотеки для сброса кэшей запущенного бота
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 18:00:00
+
+На новых базах таблицу уже создает create_all из моделей,
+поэтому миграция пропускает существующую таблицу.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if not sa.inspect(op.get_bind()).has_table('library_version'):
+        op.create_table(
+            'library_version',
+            sa.Column('id', sa.Integer(), primary_key=True),
+            sa.Column('version', sa.Integer(), nullable=False),
+            sa.Column('updated_at', sa.DateTime(), nullable=True),
+        )
+
+
+def downgrade() -> None:
+    op.drop_table('library_version')
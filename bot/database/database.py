@@ -5,32 +5,187 @@ import os
 if __name__ == "__main__":
     sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from bot.config import DATABASE_URL
+from bot.config import (
+    DATABASE_URL, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_RECYCLE, DB_POOL_TIMEOUT, DB_ECHO,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE_KB, SQLITE_MMAP_SIZE, SQLITE_BUSY_TIMEOUT
+)
+from bot.utils.logger import logger
 
 # Создаем базовый класс для моделей
 Base = declarative_base()
 
+
+def get_async_database_url(url: str) -> str:
+    """
+    Преобразование DATABASE_URL в адрес для асинхронного драйвера
+
+    Args:
+        url: Адрес базы данных из настроек
+
+    Returns:
+        str: Адрес с асинхронным драйвером (aiosqlite или asyncpg)
+    """
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith("postgres://"):
+        return url.replace("postgres://", "postgresql+asyncpg://", 1)
+    if url.startswith("postgresql://"):
+        return url.replace("postgresql://", "postgresql+asyncpg://", 1)
+    return url
+
+
+def get_engine_options(url: str, is_async: bool = False) -> dict:
+    """
+    Параметры движка для диалекта базы данных
+
+    Args:
+        url: Адрес базы данных
+        is_async: Параметры для асинхронного движка
+
+    Returns:
+        dict: Параметры create_engine/create_async_engine
+    """
+    options = {"echo": DB_ECHO}
+    if url.startswith("sqlite"):
+        if is_async and ":memory:" not in url:
+            # aiosqlite по умолчанию открывает новое соединение на каждую сессию,
+            # пул сохраняет соединения с уже примененным профилем PRAGMA
+            options.update(poolclass=AsyncAdaptedQueuePool, pool_size=DB_POOL_SIZE)
+    else:
+        # Пул соединений для серверной СУБД
+        options.update(
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_recycle=DB_POOL_RECYCLE,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_pre_ping=True
+        )
+    return options
+
+
 # Создаем синхронный движок для Alembic и других задач
-engine = create_engine(DATABASE_URL)
+engine = create_engine(
+    DATABASE_URL.replace("postgres://", "postgresql://", 1),
+    **get_engine_options(DATABASE_URL)
+)
 
 # Создаем асинхронный движок для работы бота
-# Заменяем postgresql:// на postgresql+asyncpg:// для асинхронной работы
-#async_engine = create_async_engine(
-#    DATABASE_URL.replace('postgresql://', 'postgresql+asyncpg://'),
-#    echo=False
-#)
-# Изменим создание async_engine
 async_engine = create_async_engine(
-    "sqlite+aiosqlite:///bot.db",  # Используем aiosqlite для асинхронного доступа
-    echo=False
+    get_async_database_url(DATABASE_URL),
+    **get_engine_options(DATABASE_URL, is_async=True)
 )
 
 
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Профиль хранения SQLite для каждого нового соединения: WAL позволяет
+    читать во время записи, busy_timeout ждет блокировку вместо ошибки
+    "database is locked", foreign_keys включает ON DELETE CASCADE/SET NULL
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode={SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        # Отрицательное значение cache_size задается в килобайтах
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA foreign_keys=ON")
+    finally:
+        cursor.close()
+
+
+def _set_sqlite_read_pragmas(dbapi_connection, connection_record):
+    """
+    Профиль соединений только для чтения: запись запрещена query_only
+    """
+    _set_sqlite_pragmas(dbapi_connection, connection_record)
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute("PRAGMA query_only=ON")
+    finally:
+        cursor.close()
+
+
+if engine.dialect.name == "sqlite":
+    # Отдельный пул соединений только для чтения: в режиме WAL чтение не ждет запись
+    read_async_engine = create_async_engine(
+        get_async_database_url(DATABASE_URL),
+        **get_engine_options(DATABASE_URL, is_async=True)
+    )
+
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
+    event.listen(read_async_engine.sync_engine, "connect", _set_sqlite_read_pragmas)
+elif async_engine.dialect.name == "postgresql":
+    # Транзакции только для чтения в общем пуле соединений
+    read_async_engine = async_engine.execution_options(postgresql_readonly=True)
+else:
+    read_async_engine = async_engine
+
+
+async def check_database_profile() -> dict:
+    """
+    Проверка профиля базы данных при запуске бота
+
+    Returns:
+        dict: Фактические настройки соединения
+    """
+    async with async_engine.connect() as conn:
+        if conn.dialect.name != "sqlite":
+            version = (await conn.execute(text("SELECT version()"))).scalar()
+            profile = {"dialect": conn.dialect.name, "version": version}
+        else:
+            profile = {"dialect": "sqlite"}
+            for pragma in ("journal_mode", "synchronous", "cache_size", "mmap_size",
+                           "busy_timeout", "foreign_keys"):
+                profile[pragma] = (await conn.execute(text(f"PRAGMA {pragma}"))).scalar()
+
+            if str(profile["journal_mode"]).lower() != SQLITE_JOURNAL_MODE.lower():
+                logger.warning(
+                    f"SQLite: journal_mode={profile['journal_mode']} вместо {SQLITE_JOURNAL_MODE}"
+                )
+
+    logger.info(f"Профиль базы данных: {profile}")
+    return profile
+
+
+# Диалект поддерживает INSERT ... RETURNING (PostgreSQL, SQLite 3.35+)
+SUPPORTS_RETURNING = async_engine.dialect.insert_returning
+
+
+def get_insert(table):
+    """
+    INSERT для текущего диалекта с поддержкой ON CONFLICT (PostgreSQL, SQLite)
+
+    Args:
+        table: Модель или таблица
+
+    Returns:
+        Insert: Конструкция INSERT; для PostgreSQL и SQLite доступны
+        on_conflict_do_nothing/on_conflict_do_update
+    """
+    if async_engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    elif async_engine.dialect.name == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert
+    else:
+        from sqlalchemy import insert
+    return insert(table)
+
+
+def supports_on_conflict() -> bool:
+    """Поддерживает ли текущий диалект INSERT ... ON CONFLICT"""
+    return async_engine.dialect.name in ("postgresql", "sqlite")
+
+
 # Создаем фабрику сессий для синхронного использования
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
@@ -43,6 +198,15 @@ AsyncSessionLocal = sessionmaker(
     expire_on_commit=False
 )
 
+# Фабрика сессий только для чтения (просмотр библиотеки, списки, статистика)
+ReadOnlySessionLocal = sessionmaker(
+    autocommit=False,
+    autoflush=False,
+    bind=read_async_engine,
+    class_=AsyncSession,
+    expire_on_commit=False
+)
+
 def get_db():
     """
     Получение синхронной сессии базы данных.
@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Integer, String, Text, JSON, UniqueConstraint
+from sqlalchemy import Boolean, Column, DateTime, ForeignKey, Index, Integer, String, Text, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from bot.database.database import Base
@@ -62,6 +62,9 @@ class Category(Base):
     parent_id = Column(Integer, ForeignKey("categories.category_id", ondelete="SET NULL"), nullable=True)
     level = Column(Integer, nullable=False)  # 1: тип товара, 2: категория, 3: группа товаров
 
+    # Дочерние категории выбираются по родителю и уровню
+    __table_args__ = (Index('ix_categories_parent_level', 'parent_id', 'level'),)
+
     # Отношения
     parent = relationship("Category", remote_side=[category_id], backref="children")
     articles = relationship("Article", back_populates="category")
@@ -78,6 +81,8 @@ class Article(Base):
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     created_by = Column(Integer, ForeignKey("users.user_id", ondelete="SET NULL"))
 
+    __table_args__ = (Index('ix_articles_category', 'category_id'),)
+
     # Отношения
     category = relationship("Category", back_populates="articles")
     images = relationship("ArticleImage", back_populates="article", cascade="all, delete-orphan")
@@ -94,6 +99,8 @@ class ArticleImage(Base):
     file_unique_id = Column(String(255), nullable=False)  # Для проверки дубликатов
     position = Column(Integer, nullable=False)  # Порядок отображения
 
+    __table_args__ = (Index('ix_article_images_article_position', 'article_id', 'position'),)
+
     # Отношения
     article = relationship("Article", back_populates="images")
 
@@ -123,6 +130,8 @@ class Question(Base):
     question_text = Column(Text, nullable=False)
     points = Column(Integer, default=1, nullable=False)  # Вес вопроса
 
+    __table_args__ = (Index('ix_questions_test', 'test_id'),)
+
     # Отношения
     test = relationship("Test", back_populates="questions")
     answers = relationship("Answer", back_populates="question", cascade="all, delete-orphan")
@@ -138,6 +147,8 @@ class Answer(Base):
     is_correct = Column(Boolean, nullable=False)
     position = Column(Integer, nullable=False)  # Порядок отображения
 
+    __table_args__ = (Index('ix_answers_question_position', 'question_id', 'position'),)
+
     # Отношения
     question = relationship("Question", back_populates="answers")
     user_answers = relationship("UserAnswer", back_populates="answer")
@@ -153,6 +164,13 @@ class TestAttempt(Base):
     is_passed = Column(Boolean, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Последняя попытка пользователя по тесту
+        Index('ix_test_attempts_user_test_created', 'user_id', 'test_id', 'created_at'),
+        # Поиск устаревших попыток для архивации
+        Index('ix_test_attempts_created', 'created_at'),
+    )
+
     # Отношения
     user = relationship("User", back_populates="test_attempts")
     test = relationship("Test", back_populates="attempts")
@@ -174,6 +192,23 @@ class UserAnswer(Base):
     question = relationship("Question", back_populates="user_answers")
     answer = relationship("Answer", back_populates="user_answers")
 
+# Итоги попыток, перенесенных в архив (для статистики тестов и прогресса пользователя)
+class TestAttemptRollup(Base):
+    __tablename__ = "test_attempt_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"), primary_key=True)
+    test_id = Column(Integer, ForeignKey("tests.test_id", ondelete="CASCADE"), primary_key=True)
+    attempts_count = Column(Integer, default=0, nullable=False)
+    passed_count = Column(Integer, default=0, nullable=False)
+    score_sum = Column(Integer, default=0, nullable=False)
+    best_score = Column(Integer, default=0, nullable=False)
+    last_score = Column(Integer, nullable=False)
+    last_is_passed = Column(Boolean, nullable=False)
+    last_attempt_at = Column(DateTime, nullable=True)
+
+    # Статистика теста
+    __table_args__ = (Index('ix_test_attempt_rollups_test', 'test_id'),)
+
 # Уведомления/объявления
 class Announcement(Base):
     __tablename__ = "announcements"
@@ -197,6 +232,16 @@ class AnnouncementDelivery(Base):
     user_id = Column(Integer, ForeignKey("users.user_id", ondelete="CASCADE"))
     is_delivered = Column(Boolean, default=False)
     delivered_at = Column(DateTime, nullable=True)
+    # Когда пользователь открыл список объявлений (статус отправки не меняет)
+    read_at = Column(DateTime, nullable=True)
+
+    # Непрочитанные объявления пользователя и ожидающие записи рассылки
+    __table_args__ = (
+        Index('ix_announcement_deliveries_user_delivered', 'user_id', 'is_delivered'),
+        Index('ix_announcement_deliveries_announcement_delivered', 'announcement_id', 'is_delivered'),
+        # Поиск устаревших записей для архивации
+        Index('ix_announcement_deliveries_delivered_at', 'delivered_at'),
+    )
 
     # Отношения
     announcement = relationship("Announcement", back_populates="deliveries")
@@ -214,6 +259,17 @@ class AdminLog(Base):
     details = Column(JSON, nullable=True)  # Дополнительная информация
     created_at = Column(DateTime, default=datetime.utcnow)
 
+    __table_args__ = (Index('ix_admin_logs_created', 'created_at'),)
+
     # Отношения
     admin = relationship("User", back_populates="admin_logs")
-    
\ No newline at end of file
+    
+
+# Версия библиотеки: увеличивается импортом из командной строки, чтобы
+# запущенный бот сбросил кэши статей и тестов (bot/services/library_version.py)
+class LibraryVersion(Base):
+    __tablename__ = "library_version"
+
+    id = Column(Integer, primary_key=True)
+    version = Column(Integer, default=0, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow)
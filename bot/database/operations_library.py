@@ -3,10 +3,18 @@ from sqlalchemy import select, insert, update, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from bot.database.models import Category, Article, ArticleImage, Test, User
 from bot.utils.logger import logger
+from bot.services.tests import (
+    invalidate_test_snapshot, invalidate_question_snapshot, invalidate_article_snapshots, invalidate_user_progress
+)
+from bot.services.articles import (
+    get_category_tree, refresh_category_tree, load_article_details, invalidate_article_view,
+    select_article_summaries, fetch_article_summaries
+)
+from bot.services.audit import queue_admin_log
 from sqlalchemy import select, insert, update, delete
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload
-from bot.database.models import Test, Question, Answer, Article, AdminLog, User
+from bot.database.models import Test, Question, Answer, Article, AdminLog, User, TestAttempt, UserAnswer, TestAttemptRollup
 from datetime import datetime
 
 # ====================== ФУНКЦИИ ДЛЯ РАБОТЫ С КАТЕГОРИЯМИ ======================
@@ -21,23 +29,11 @@ async def get_categories(session: AsyncSession, parent_id=None, level=1):
         level: Уровень категорий (1: тип товара, 2: категория, 3: группа товаров)
     
     Returns:
-        List[Category]: Список объектов категорий
+        List[CategoryNode]: Список категорий из индекса дерева категорий
     """
     try:
-        if parent_id is None:
-            result = await session.execute(
-                select(Category).where(Category.level == level)
-            )
-        else:
-            result = await session.execute(
-                select(Category).where(
-                    Category.parent_id == parent_id,
-                    Category.level == level
-                )
-            )
-        
-        categories = result.scalars().all()
-        return categories
+        tree = await get_category_tree(session)
+        return list(tree.get_children(parent_id, level))
     except Exception as e:
         logger.error(f"Error getting categories: {e}")
         return []
@@ -51,13 +47,11 @@ async def get_category_by_id(session: AsyncSession, category_id: int):
         category_id: ID категории
     
     Returns:
-        Category: Объект категории или None
+        CategoryNode: Категория из индекса дерева категорий или None
     """
     try:
-        result = await session.execute(
-            select(Category).where(Category.category_id == category_id)
-        )
-        return result.scalar_one_or_none()
+        tree = await get_category_tree(session)
+        return tree.get(category_id)
     except Exception as e:
         logger.error(f"Error getting category by ID: {e}")
         return None
@@ -77,14 +71,9 @@ async def create_category(session: AsyncSession, name: str, parent_id=None, leve
     """
     try:
         # Проверяем, существует ли уже такая категория
-        existing = await session.execute(
-            select(Category).where(
-                Category.name == name,
-                Category.parent_id == parent_id,
-                Category.level == level
-            )
-        )
-        if existing.scalar_one_or_none():
+        tree = await get_category_tree(session)
+        siblings = tree.levels.get(level, ()) if parent_id is None else tree.get_children(parent_id, level)
+        if any(c.name == name and c.parent_id == parent_id for c in siblings):
             logger.warning(f"Category with name '{name}' already exists")
             return None
         
@@ -97,6 +86,7 @@ async def create_category(session: AsyncSession, name: str, parent_id=None, leve
         session.add(new_category)
         await session.commit()
         await session.refresh(new_category)
+        await refresh_category_tree(session)
         return new_category
     except Exception as e:
         await session.rollback()
@@ -115,11 +105,10 @@ async def create_default_categories(session: AsyncSession):
     """
     try:
         # Проверяем, есть ли уже категории
-        result = await session.execute(select(Category))
-        existing_categories = result.scalars().all()
+        tree = await get_category_tree(session)
         
-        if existing_categories:
-            return existing_categories
+        if tree.nodes:
+            return list(tree.nodes.values())
         
         # Создаем корневые категории
         food = await create_category(session, "Продовольчі товари", None, 1)
@@ -159,8 +148,8 @@ async def create_default_categories(session: AsyncSession):
                 await create_category(session, "Зарядні пристрої", electronics.category_id, 3)
         
         # Возвращаем созданные корневые категории
-        result = await session.execute(select(Category).where(Category.level == 1))
-        return result.scalars().all()
+        tree = await get_category_tree(session)
+        return list(tree.get_children(None, 1))
     except Exception as e:
         await session.rollback()
         logger.error(f"Error creating default categories: {e}")
@@ -186,70 +175,149 @@ async def update_category(session: AsyncSession, category_id: int, name: str):
             return False
         
         # Обновляем название
-        category.name = name
+        await session.execute(
+            update(Category).where(Category.category_id == category_id).values(name=name)
+        )
         await session.commit()
+        await refresh_category_tree(session)
+        # Кэшированные статьи содержат название категории
+        invalidate_article_view()
         return True
     except Exception as e:
         await session.rollback()
         logger.error(f"Error updating category: {e}")
         return False
 
+async def _detach_test_history(session: AsyncSession, test_ids=None, question_ids=None, answer_ids=None):
+    """
+    Обнуление ссылок истории прохождения на удаляемые тесты, вопросы и ответы
+
+    Внешние ключи попыток и ответов пользователей объявлены с ondelete="CASCADE",
+    поэтому без обнуления удаление теста или вопроса стерло бы историю
+    прохождения. Итоги архивных попыток удаляемых тестов удаляются: test_id
+    входит в их первичный ключ, а SQLite может выдать тот же test_id новому
+    тесту. Сами архивные попытки остаются в архивной базе.
+
+    Args:
+        session: Сессия SQLAlchemy
+        test_ids: ID удаляемых тестов (список или подзапрос)
+        question_ids: ID удаляемых вопросов (список или подзапрос)
+        answer_ids: ID удаляемых ответов (список или подзапрос)
+    """
+    bulk = {"synchronize_session": False}
+    if test_ids is not None:
+        await session.execute(
+            update(TestAttempt).where(TestAttempt.test_id.in_(test_ids)).values(test_id=None),
+            execution_options=bulk
+        )
+        await session.execute(
+            delete(TestAttemptRollup).where(TestAttemptRollup.test_id.in_(test_ids)),
+            execution_options=bulk
+        )
+    if question_ids is not None:
+        await session.execute(
+            update(UserAnswer).where(UserAnswer.question_id.in_(question_ids)).values(question_id=None, answer_id=None),
+            execution_options=bulk
+        )
+    if answer_ids is not None:
+        await session.execute(
+            update(UserAnswer).where(UserAnswer.answer_id.in_(answer_ids)).values(answer_id=None),
+            execution_options=bulk
+        )
+
 async def delete_category(session: AsyncSession, category_id: int):
     """
-    Удаление категории и всех её подкатегорий
+    Удаление категории со всем поддеревом одной транзакцией
+    
+    Поддерево категорий выбирается рекурсивным CTE, статьи, изображения,
+    тесты, вопросы и ответы удаляются групповыми DELETE. Попытки прохождения
+    тестов и ответы пользователей сохраняются для истории (ссылки обнуляются,
+    см. _detach_test_history).
     
     Args:
         session: Сессия SQLAlchemy
         category_id: ID категории
     
     Returns:
-        bool: True если удаление успешно, иначе False
+        dict: Количество удаленных записей по типам или None в случае ошибки
     """
     try:
-        # Получаем категорию
+        # Проверяем, что категория существует
         category = await get_category_by_id(session, category_id)
         if not category:
             logger.warning(f"Category with ID {category_id} not found")
-            return False
+            return None
+        
+        # Категория и все её потомки
+        subtree = (
+            select(Category.category_id)
+            .where(Category.category_id == category_id)
+            .cte("category_subtree", recursive=True)
+        )
+        subtree = subtree.union_all(
+            select(Category.category_id).where(Category.parent_id == subtree.c.category_id)
+        )
+        
+        # Идентификаторы поддерева выбираем одним запросом: счетчики удаленных
+        # строк (rowcount) недоступны для DELETE, начинающихся с WITH
+        category_ids = (await session.execute(select(subtree.c.category_id))).scalars().all()
         
-        # Рекурсивно удаляем все подкатегории
-        if category.level < 3:  # Если это не группа товаров
-            subcategories = await get_categories(session, category_id, category.level + 1)
-            for subcategory in subcategories:
-                await delete_category(session, subcategory.category_id)
+        article_ids = select(Article.article_id).where(Article.category_id.in_(category_ids))
+        test_ids = select(Test.test_id).where(Test.article_id.in_(article_ids))
+        question_ids = select(Question.question_id).where(Question.test_id.in_(test_ids))
         
-        # Удаляем статьи в этой категории
-        articles = await get_articles_by_category(session, category_id)
-        for article in articles:
-            await delete_article(session, article.article_id)
+        bulk = {"synchronize_session": False}
+        
+        # История прохождения тестов остается, ссылки на удаленные тесты обнуляются
+        await _detach_test_history(session, test_ids=test_ids, question_ids=question_ids)
+        
+        counts = {}
+        for name, stmt in (
+            ("answers", delete(Answer).where(Answer.question_id.in_(question_ids))),
+            ("questions", delete(Question).where(Question.test_id.in_(test_ids))),
+            ("tests", delete(Test).where(Test.article_id.in_(article_ids))),
+            ("images", delete(ArticleImage).where(ArticleImage.article_id.in_(article_ids))),
+            ("articles", delete(Article).where(Article.category_id.in_(category_ids))),
+            ("categories", delete(Category).where(Category.category_id.in_(category_ids))),
+        ):
+            result = await session.execute(stmt, execution_options=bulk)
+            counts[name] = result.rowcount
         
-        # Удаляем саму категорию
-        await session.delete(category)
         await session.commit()
-        return True
+        await refresh_category_tree(session)
+        invalidate_article_view()
+        
+        # Снимки и прогресс по удаленным тестам больше не действительны
+        invalidate_test_snapshot()
+        invalidate_user_progress()
+        
+        logger.info(f"Category {category_id} deleted with subtree: {counts}")
+        return counts
     except Exception as e:
         await session.rollback()
         logger.error(f"Error deleting category: {e}")
-        return False
+        return None
 
 # ====================== ФУНКЦИИ ДЛЯ РАБОТЫ СО СТАТЬЯМИ ======================
 
 async def get_articles_by_category(session: AsyncSession, category_id: int):
     """
-    Получение списка статей в категории
+    Получение списка статей в категории (без текста статей)
     
     Args:
         session: Сессия SQLAlchemy
         category_id: ID категории
     
     Returns:
-        List[Article]: Список статей
+        List[ArticleSummary]: Список статей
     """
     try:
-        result = await session.execute(
-            select(Article).where(Article.category_id == category_id)
+        return await fetch_article_summaries(
+            session,
+            select_article_summaries()
+            .where(Article.category_id == category_id)
+            .order_by(Article.article_id)
         )
-        return result.scalars().all()
     except Exception as e:
         logger.error(f"Error getting articles by category: {e}")
         return []
@@ -276,81 +344,17 @@ async def get_article_by_id(session: AsyncSession, article_id: int):
 
 async def get_article_with_details(session: AsyncSession, article_id: int):
     """
-    Получение статьи со всеми деталями (изображения, тесты, категория, автор)
+    Получение статьи со всеми деталями (изображения, тесты, категория, автор) одним запросом
     
     Args:
         session: Сессия SQLAlchemy
         article_id: ID статьи
     
     Returns:
-        dict: Словарь с данными статьи или None
+        ArticleDetails: Неизменяемые данные статьи или None
     """
     try:
-        # Получаем статью
-        article_result = await session.execute(
-            select(Article).where(Article.article_id == article_id)
-        )
-        article = article_result.scalar_one_or_none()
-        
-        if not article:
-            return None
-        
-        # Получаем категорию
-        category_result = await session.execute(
-            select(Category).where(Category.category_id == article.category_id)
-        )
-        category = category_result.scalar_one_or_none()
-        
-        # Получаем автора
-        author_result = await session.execute(
-            select(User).where(User.user_id == article.created_by)
-        )
-        author = author_result.scalar_one_or_none()
-        
-        # Получаем изображения
-        images_result = await session.execute(
-            select(ArticleImage)
-            .where(ArticleImage.article_id == article_id)
-            .order_by(ArticleImage.position)
-        )
-        images = images_result.scalars().all()
-        
-        # Получаем тесты
-        tests_result = await session.execute(
-            select(Test).where(Test.article_id == article_id)
-        )
-        tests = tests_result.scalars().all()
-        
-        # Форматируем результат
-        result = {
-            "article_id": article.article_id,
-            "title": article.title,
-            "content": article.content,
-            "category_id": article.category_id,
-            "category_name": category.name if category else "Без категорії",
-            "created_at": article.created_at.strftime("%d.%m.%Y %H:%M") if article.created_at else "",
-            "updated_at": article.updated_at.strftime("%d.%m.%Y %H:%M") if article.updated_at else "",
-            "author": f"{author.first_name} {author.last_name}" if author else "Невідомий",
-            "images": [
-                {
-                    "image_id": img.image_id,
-                    "file_id": img.file_id,
-                    "file_unique_id": img.file_unique_id,
-                    "position": img.position
-                }
-                for img in images
-            ],
-            "tests": [
-                {
-                    "test_id": test.test_id,
-                    "title": test.title,
-                    "pass_threshold": test.pass_threshold
-                }
-                for test in tests
-            ]
-        }
-        
-        return result
+        return await load_article_details(session, article_id)
     except Exception as e:
         logger.error(f"Error getting article with details: {e}")
         return None
@@ -435,6 +439,8 @@ async def update_article(session: AsyncSession, article_id: int, title=None, con
         article.updated_at = datetime.now()
         
         await session.commit()
+        invalidate_article_snapshots(article_id)
+        invalidate_article_view(article_id)
         return True
     except Exception as e:
         await session.rollback()
@@ -462,6 +468,8 @@ async def delete_article(session: AsyncSession, article_id: int):
         # Удаляем статью (каскадное удаление сработает для изображений и тестов)
         await session.delete(article)
         await session.commit()
+        invalidate_article_snapshots(article_id)
+        invalidate_article_view(article_id)
         return True
     except Exception as e:
         await session.rollback()
@@ -528,6 +536,7 @@ async def add_article_image(session: AsyncSession, article_id: int, file_id: str
         session.add(new_image)
         await session.commit()
         await session.refresh(new_image)
+        invalidate_article_view(article_id)
         return new_image
     except Exception as e:
         await session.rollback()
@@ -579,6 +588,7 @@ async def delete_article_image(session: AsyncSession, image_id: int):
             img.position -= 1
         
         await session.commit()
+        invalidate_article_view(article_id)
         return True
     except Exception as e:
         await session.rollback()
@@ -599,14 +609,9 @@ async def check_user_is_admin(session: AsyncSession, user_id: int):
         bool: True если пользователь администратор, иначе False
     """
     try:
-        # Получаем пользователя из базы данных
-        result = await session.execute(
-            select(User).where(User.user_id == user_id)
-        )
-        user = result.scalar_one_or_none()
-        
-        # Проверяем, является ли пользователь администратором
-        return user is not None and user.is_admin
+        # Поиск в множестве администраторов в памяти
+        from bot.services.admins import is_admin_user
+        return await is_admin_user(session, user_id)
     except Exception as e:
         logger.error(f"Error checking if user is admin: {e}")
         return False
@@ -615,8 +620,11 @@ async def log_admin_action(session: AsyncSession, admin_id: int, action_type: st
     """
     Запись действия администратора в лог
     
+    Запись ставится в очередь и пишется в БД фоновой задачей пакетами,
+    поэтому не требует отдельной транзакции
+    
     Args:
-        session: Сессия SQLAlchemy
+        session: Сессия SQLAlchemy (не используется, оставлен для совместимости)
         admin_id: ID администратора
         action_type: Тип действия (ADD, EDIT, DELETE, SEND)
         entity_type: Тип сущности (ARTICLE, TEST, CITY, STORE, CATEGORY)
@@ -624,24 +632,19 @@ async def log_admin_action(session: AsyncSession, admin_id: int, action_type: st
         details: Дополнительные детали (опционально)
     
     Returns:
-        bool: True если запись успешна, иначе False
+        bool: True если запись поставлена в очередь, иначе False
     """
     try:
-        from bot.database.models import AdminLog
-        
-        # Создаем запись в логе
-        log = AdminLog(
+        # Ставим запись в очередь журнала
+        queue_admin_log(
             admin_id=admin_id,
             action_type=action_type,
             entity_type=entity_type,
             entity_id=entity_id,
             details=details
         )
-        session.add(log)
-        await session.commit()
         return True
     except Exception as e:
-        await session.rollback()
         logger.error(f"Error logging admin action: {e}")
         return False
 
@@ -697,17 +700,16 @@ async def create_test(session: AsyncSession, title: str, article_id: int, pass_t
         session.add(new_test)
         await session.commit()
         await session.refresh(new_test)
+        invalidate_article_view(article_id)
         
         # Логируем действие администратора
-        admin_log = AdminLog(
+        queue_admin_log(
             admin_id=admin_id,
             action_type="ADD",
             entity_type="TEST",
             entity_id=new_test.test_id,
             details={"title": title, "article_id": article_id}
         )
-        session.add(admin_log)
-        await session.commit()
         
         return new_test
     except Exception as e:
@@ -733,18 +735,19 @@ async def update_test(session: AsyncSession, test_id: int, title: str = None, pa
             test.pass_threshold = pass_threshold
         
         await session.commit()
+        invalidate_test_snapshot(test_id)
+        
+        invalidate_article_view()
         
         # Логируем действие администратора, если указан ID админа
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="EDIT",
                 entity_type="TEST",
                 entity_id=test_id,
                 details={"title": title, "pass_threshold": pass_threshold}
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -772,18 +775,18 @@ async def delete_test(session: AsyncSession, test_id: int, admin_id: int = None)
         # Удаление теста (каскадно удалит все вопросы и ответы благодаря настройкам в моделях)
         await session.execute(delete(Test).where(Test.test_id == test_id))
         await session.commit()
+        invalidate_test_snapshot(test_id)
+        invalidate_article_view()
         
         # Логируем действие администратора, если указан ID админа
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="DELETE",
                 entity_type="TEST",
                 entity_id=test_id,
                 details=test_info
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -826,19 +829,18 @@ async def create_question(session: AsyncSession, test_id: int, question_text: st
         
         session.add(new_question)
         await session.commit()
+        invalidate_test_snapshot(test_id)
         await session.refresh(new_question)
         
         # Логируем действие администратора, если указан ID админа
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="ADD",
                 entity_type="QUESTION",
                 entity_id=new_question.question_id,
                 details={"test_id": test_id, "question_text": question_text}
             )
-            session.add(admin_log)
-            await session.commit()
         
         return new_question
     except Exception as e:
@@ -864,18 +866,17 @@ async def update_question(session: AsyncSession, question_id: int, question_text
             question.points = points
         
         await session.commit()
+        invalidate_test_snapshot(question.test_id)
         
         # Логируем действие администратора, если указан ID админа
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="EDIT",
                 entity_type="QUESTION",
                 entity_id=question_id,
                 details={"question_text": question_text, "points": points}
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -903,18 +904,17 @@ async def delete_question(session: AsyncSession, question_id: int, admin_id: int
         # Удаление вопроса (каскадно удалит все ответы благодаря настройкам в моделях)
         await session.execute(delete(Question).where(Question.question_id == question_id))
         await session.commit()
+        invalidate_test_snapshot(question_info["test_id"])
         
         # Логируем действие администратора, если указан ID админа
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="DELETE",
                 entity_type="QUESTION",
                 entity_id=question_id,
                 details=question_info
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -945,19 +945,18 @@ async def create_answer(session: AsyncSession, question_id: int, answer_text: st
         
         session.add(new_answer)
         await session.commit()
+        invalidate_question_snapshot(question_id)
         await session.refresh(new_answer)
         
         # Логируем действие администратора, если указан ID админа
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="ADD",
                 entity_type="ANSWER",
                 entity_id=new_answer.answer_id,
                 details={"question_id": question_id, "answer_text": answer_text, "is_correct": is_correct}
             )
-            session.add(admin_log)
-            await session.commit()
         
         return new_answer
     except Exception as e:
@@ -986,18 +985,17 @@ async def update_answer(session: AsyncSession, answer_id: int, answer_text: str
             answer.position = position
         
         await session.commit()
+        invalidate_question_snapshot(answer.question_id)
         
         # Логируем действие администратора, если указан ID админа
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="EDIT",
                 entity_type="ANSWER",
                 entity_id=answer_id,
                 details={"answer_text": answer_text, "is_correct": is_correct, "position": position}
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -1026,18 +1024,17 @@ async def delete_answer(session: AsyncSession, answer_id: int, admin_id: int = N
         # Удаление ответа
         await session.execute(delete(Answer).where(Answer.answer_id == answer_id))
         await session.commit()
+        invalidate_question_snapshot(answer_info["question_id"])
         
         # Логируем действие администратора, если указан ID админа
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="DELETE",
                 entity_type="ANSWER",
                 entity_id=answer_id,
                 details=answer_info
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -1200,18 +1197,17 @@ async def create_test(
         session.add(new_test)
         await session.commit()
         await session.refresh(new_test)
+        invalidate_article_view(article_id)
         
         # Логируем действия администратора
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="ADD",
                 entity_type="TEST",
                 entity_id=new_test.test_id,
                 details={"title": title, "article_id": article_id, "pass_threshold": pass_threshold}
             )
-            session.add(admin_log)
-            await session.commit()
         
         return new_test
     except Exception as e:
@@ -1259,18 +1255,18 @@ async def update_test(
         
         # Сохраняем изменения
         await session.commit()
+        invalidate_test_snapshot(test_id)
+        invalidate_article_view()
         
         # Логируем действия администратора
         if admin_id and changes:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="EDIT",
                 entity_type="TEST",
                 entity_id=test_id,
                 details=changes
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -1303,21 +1299,29 @@ async def delete_test(session: AsyncSession, test_id: int, admin_id: int = None)
             "pass_threshold": test.pass_threshold
         }
         
+        # Попытки и ответы пользователей остаются в истории без ссылок на тест
+        await _detach_test_history(
+            session,
+            test_ids=[test_id],
+            question_ids=select(Question.question_id).where(Question.test_id == test_id)
+        )
+        
         # Удаляем тест (каскадное удаление удалит вопросы и ответы)
         await session.execute(delete(Test).where(Test.test_id == test_id))
         await session.commit()
+        invalidate_test_snapshot(test_id)
+        invalidate_article_view()
+        invalidate_user_progress()
         
         # Логируем действия администратора
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="DELETE",
                 entity_type="TEST",
                 entity_id=test_id,
                 details=test_info
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -1381,11 +1385,12 @@ async def create_question(
         
         session.add(new_question)
         await session.commit()
+        invalidate_test_snapshot(test_id)
         await session.refresh(new_question)
         
         # Логируем действия администратора
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="ADD",
                 entity_type="QUESTION",
@@ -1396,8 +1401,6 @@ async def create_question(
                     "points": points
                 }
             )
-            session.add(admin_log)
-            await session.commit()
         
         return new_question
     except Exception as e:
@@ -1445,18 +1448,17 @@ async def update_question(
         
         # Сохраняем изменения
         await session.commit()
+        invalidate_test_snapshot(question.test_id)
         
         # Логируем действия администратора
         if admin_id and changes:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="EDIT",
                 entity_type="QUESTION",
                 entity_id=question_id,
                 details=changes
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -1489,21 +1491,23 @@ async def delete_question(session: AsyncSession, question_id: int, admin_id: int
             "points": question.points
         }
         
+        # Ответы пользователей остаются в истории попыток без ссылки на вопрос
+        await _detach_test_history(session, question_ids=[question_id])
+        
         # Удаляем вопрос (каскадное удаление удалит ответы)
         await session.execute(delete(Question).where(Question.question_id == question_id))
         await session.commit()
+        invalidate_test_snapshot(question_info["test_id"])
         
         # Логируем действия администратора
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="DELETE",
                 entity_type="QUESTION",
                 entity_id=question_id,
                 details=question_info
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -1552,11 +1556,12 @@ async def create_answer(
         
         session.add(new_answer)
         await session.commit()
+        invalidate_question_snapshot(question_id)
         await session.refresh(new_answer)
         
         # Логируем действия администратора
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="ADD",
                 entity_type="ANSWER",
@@ -1568,8 +1573,6 @@ async def create_answer(
                     "position": position
                 }
             )
-            session.add(admin_log)
-            await session.commit()
         
         return new_answer
     except Exception as e:
@@ -1623,18 +1626,17 @@ async def update_answer(
         
         # Сохраняем изменения
         await session.commit()
+        invalidate_question_snapshot(answer.question_id)
         
         # Логируем действия администратора
         if admin_id and changes:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="EDIT",
                 entity_type="ANSWER",
                 entity_id=answer_id,
                 details=changes
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -1668,21 +1670,23 @@ async def delete_answer(session: AsyncSession, answer_id: int, admin_id: int = N
             "position": answer.position
         }
         
+        # Ответы пользователей остаются в истории попыток без ссылки на вариант
+        await _detach_test_history(session, answer_ids=[answer_id])
+        
         # Удаляем ответ
         await session.execute(delete(Answer).where(Answer.answer_id == answer_id))
         await session.commit()
+        invalidate_question_snapshot(answer_info["question_id"])
         
         # Логируем действия администратора
         if admin_id:
-            admin_log = AdminLog(
+            queue_admin_log(
                 admin_id=admin_id,
                 action_type="DELETE",
                 entity_type="ANSWER",
                 entity_id=answer_id,
                 details=answer_info
             )
-            session.add(admin_log)
-            await session.commit()
         
         return True
     except Exception as e:
@@ -1702,43 +1706,9 @@ async def get_test_statistics(session: AsyncSession, test_id: int) -> Dict[str,
     Returns:
         Словарь со статистикой
     """
-    # Получаем общее количество попыток прохождения теста
-    result = await session.execute(
-        select(func.count(TestAttempt.attempt_id)).where(TestAttempt.test_id == test_id)
-    )
-    total_attempts = result.scalar() or 0
-    
-    # Получаем количество уникальных пользователей
-    result = await session.execute(
-        select(func.count(func.distinct(TestAttempt.user_id))).where(TestAttempt.test_id == test_id)
-    )
-    unique_users = result.scalar() or 0
-    
-    # Получаем средний балл
-    result = await session.execute(
-        select(func.avg(TestAttempt.score)).where(TestAttempt.test_id == test_id)
-    )
-    avg_score = result.scalar() or 0
-    if avg_score:
-        avg_score = round(avg_score, 1)
-    
-    # Получаем процент успешных прохождений
-    result = await session.execute(
-        select(
-            func.sum(case((TestAttempt.is_passed == True, 1), else_=0)) * 100 / func.count(TestAttempt.attempt_id)
-        ).where(TestAttempt.test_id == test_id)
-    )
-    success_rate = result.scalar() or 0
-    if success_rate:
-        success_rate = round(success_rate, 1)
-    
-    # Формируем результат
-    return {
-        "total_attempts": total_attempts,
-        "unique_users": unique_users,
-        "avg_score": avg_score,
-        "success_rate": success_rate
-    }
+    # Учитываются и попытки, перенесенные в архив
+    from bot.services.tests import get_test_statistics as get_statistics
+    return await get_statistics(session, test_id)
     #########################################################################################
     
     
\ No newline at end of file
@@ -16,6 +16,8 @@ from sqlalchemy import select, func
 from bot.database.models import Category, Article, ArticleImage, User, Test, AdminLog
 from bot.keyboards.admin_kb import get_admin_menu_kb
 from bot.utils.logger import logger
+from bot.services.articles import get_article_media_groups, send_media_groups
+from bot.services.audit import queue_admin_log
 from bot.database.operations_library import (
     get_categories, get_category_by_id, create_category, update_category, delete_category,
     get_articles_by_category, get_article_by_id, create_article, update_article, delete_article,
@@ -357,14 +359,12 @@ async def admin_articles_command(callback: CallbackQuery, session: AsyncSession)
         )
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="LIBRARY",
             details={"action": "view_library_categories"}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -453,15 +453,13 @@ async def admin_category_selection(callback: CallbackQuery, session: AsyncSessio
             )
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="CATEGORY",
             entity_id=category_id,
             details={"category_name": category.name, "level": category.level}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -578,15 +576,13 @@ async def process_category_name(message: Message, state: FSMContext, session: As
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="ADD",
             entity_type="CATEGORY",
             entity_id=category.category_id,
             details={"category_name": category_name, "level": level, "parent_id": parent_id}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном создании категории
         if parent_id is None:
@@ -665,15 +661,13 @@ async def process_subcategory_name(message: Message, state: FSMContext, session:
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="ADD",
             entity_type="CATEGORY",
             entity_id=subcategory.category_id,
             details={"category_name": subcategory_name, "level": level, "parent_id": parent_id, "parent_name": parent.name}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном создании подкатегории
         await message.answer(
@@ -783,15 +777,13 @@ async def process_edit_category_name(message: Message, state: FSMContext, sessio
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="EDIT",
             entity_type="CATEGORY",
             entity_id=category_id,
             details={"old_name": old_name, "new_name": new_name, "level": category.level}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном обновлении категории
         await message.answer(
@@ -923,15 +915,13 @@ async def confirm_delete_category(callback: CallbackQuery, session: AsyncSession
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="DELETE",
             entity_type="CATEGORY",
             entity_id=category_id,
-            details=category_data
+            details={**category_data, "deleted": success}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном удалении категории
         await callback.message.edit_text(
@@ -1002,14 +992,12 @@ async def admin_articles_in_category(callback: CallbackQuery, session: AsyncSess
             )
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="ARTICLES",
             details={"category_id": category_id, "category_name": category.name}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -1143,15 +1131,13 @@ async def process_article_content(message: Message, state: FSMContext, session:
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="ADD",
             entity_type="ARTICLE",
             entity_id=article.article_id,
             details={"title": title, "category_id": category_id}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном создании статьи и предлагаем добавить изображения
         await message.answer(
@@ -1230,15 +1216,13 @@ async def process_article_image(message: Message, state: FSMContext, session: As
         await state.update_data(image_count=image_count)
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="ADD",
             entity_type="IMAGE",
             entity_id=image.image_id,
             details={"article_id": article_id, "position": image_count - 1}
         )
-        session.add(log)
-        await session.commit()
         
         if image_count < 5:
             # Если можно добавить еще изображения
@@ -1371,12 +1355,15 @@ async def admin_article_view(callback: CallbackQuery, session: AsyncSession):
             parse_mode="HTML"
         )
         
-        # Отправляем изображения, если они есть
-        for image in images:
-            await callback.message.answer_photo(
-                photo=image.file_id,
-                caption=f"Зображення {image.position + 1}/{len(images)}"
+        # Отправляем изображения альбомами
+        await send_media_groups(
+            callback.message,
+            get_article_media_groups(
+                article.article_id,
+                article.updated_at,
+                [image.file_id for image in images]
             )
+        )
         
         # Отправляем клавиатуру с действиями со статьей
         await callback.message.answer(
@@ -1385,15 +1372,13 @@ async def admin_article_view(callback: CallbackQuery, session: AsyncSession):
         )
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="ARTICLE",
             entity_id=article_id,
             details={"title": article.title, "category_id": article.category_id}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -1496,15 +1481,13 @@ async def process_edit_article_title(message: Message, state: FSMContext, sessio
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="EDIT",
             entity_type="ARTICLE",
             entity_id=article_id,
             details={"field": "title", "old_value": old_title, "new_value": new_title}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном обновлении заголовка
         await message.answer(
@@ -1622,15 +1605,13 @@ async def process_edit_article_content(message: Message, state: FSMContext, sess
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="EDIT",
             entity_type="ARTICLE",
             entity_id=article_id,
             details={"field": "content", "content_length": len(new_content)}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном обновлении содержимого
         await message.answer(
@@ -1697,14 +1678,12 @@ async def manage_article_images(callback: CallbackQuery, session: AsyncSession):
             )
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="IMAGES",
             details={"article_id": article_id, "article_title": article.title, "images_count": len(images)}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -1777,15 +1756,13 @@ async def delete_image(callback: CallbackQuery, session: AsyncSession):
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="DELETE",
             entity_type="IMAGE",
             entity_id=image_id,
             details={"article_id": article_id, "position": image.position}
         )
-        session.add(log)
-        await session.commit()
         
         # Получаем информацию о статье
         article = await get_article_by_id(session, article_id)
@@ -1912,15 +1889,13 @@ async def confirm_delete_article(callback: CallbackQuery, session: AsyncSession)
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="DELETE",
             entity_type="ARTICLE",
             entity_id=article_id,
             details=article_data
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном удалении статьи
         await callback.message.edit_text(
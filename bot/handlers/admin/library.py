@@ -29,6 +29,13 @@ from bot.keyboards.library_kb import (
     get_confirm_delete_kb
 )
 
+# Отправка изображений статей альбомами
+from bot.services.articles import (
+    build_media_groups, get_article_media_groups, send_article_images, send_media_groups
+)
+# Журнал действий администраторов
+from bot.services.audit import queue_admin_log
+
 # Создаем класс для хранения состояний FSM (Finite State Machine)
 class LibraryAdminStates(StatesGroup):
     # Состояния для работы с категориями
@@ -754,15 +761,14 @@ async def admin_article_selected(callback: CallbackQuery):
         parse_mode="HTML"
     )
     
-    # Если у статьи есть изображения, отправляем их в отдельных сообщениях
+    # Если у статьи есть изображения, отправляем их альбомами
     images = article.get("images", [])
     
     if images:
-        for i, image in enumerate(images):
-            await callback.message.answer_photo(
-                photo=image['file_id'],
-                caption=f"Зображення {i+1}/{len(images)}"
-            )
+        await send_media_groups(
+            callback.message,
+            build_media_groups([image['file_id'] for image in images])
+        )
     
     await callback.answer()
 
@@ -917,15 +923,14 @@ async def process_edit_article_content(message: Message, state: FSMContext):
             parse_mode="HTML"
         )
         
-        # Если у статьи есть изображения, отправляем их в отдельных сообщениях
+        # Если у статьи есть изображения, отправляем их альбомами
         images = updated_article.get("images", [])
         
         if images:
-            for i, image in enumerate(images):
-                await message.answer_photo(
-                    photo=image['file_id'],
-                    caption=f"Зображення {i+1}/{len(images)}"
-                )
+            await send_media_groups(
+                message,
+                build_media_groups([image['file_id'] for image in images])
+            )
     else:
         # Ошибка при обновлении статьи
         await message.answer(
@@ -1592,14 +1597,12 @@ async def admin_articles_command(callback: CallbackQuery, session: AsyncSession)
         )
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="LIBRARY",
             details={"action": "view_library_categories"}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -1688,15 +1691,13 @@ async def admin_category_selection(callback: CallbackQuery, session: AsyncSessio
             )
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="CATEGORY",
             entity_id=category_id,
             details={"category_name": category.name, "level": category.level}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -1813,15 +1814,13 @@ async def process_category_name(message: Message, state: FSMContext, session: As
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="ADD",
             entity_type="CATEGORY",
             entity_id=category.category_id,
             details={"category_name": category_name, "level": level, "parent_id": parent_id}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном создании категории
         if parent_id is None:
@@ -1900,15 +1899,13 @@ async def process_subcategory_name(message: Message, state: FSMContext, session:
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="ADD",
             entity_type="CATEGORY",
             entity_id=subcategory.category_id,
             details={"category_name": subcategory_name, "level": level, "parent_id": parent_id, "parent_name": parent.name}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном создании подкатегории
         await message.answer(
@@ -2018,15 +2015,13 @@ async def process_edit_category_name(message: Message, state: FSMContext, sessio
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="EDIT",
             entity_type="CATEGORY",
             entity_id=category_id,
             details={"old_name": old_name, "new_name": new_name, "level": category.level}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном обновлении категории
         await message.answer(
@@ -2158,15 +2153,13 @@ async def confirm_delete_category(callback: CallbackQuery, session: AsyncSession
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="DELETE",
             entity_type="CATEGORY",
             entity_id=category_id,
-            details=category_data
+            details={**category_data, "deleted": success}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном удалении категории
         await callback.message.edit_text(
@@ -2237,14 +2230,12 @@ async def admin_articles_in_category(callback: CallbackQuery, session: AsyncSess
             )
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="ARTICLES",
             details={"category_id": category_id, "category_name": category.name}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -2378,15 +2369,13 @@ async def process_article_content(message: Message, state: FSMContext, session:
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="ADD",
             entity_type="ARTICLE",
             entity_id=article.article_id,
             details={"title": title, "category_id": category_id}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном создании статьи и предлагаем добавить изображения
         await message.answer(
@@ -2465,15 +2454,13 @@ async def process_article_image(message: Message, state: FSMContext, session: As
         await state.update_data(image_count=image_count)
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="ADD",
             entity_type="IMAGE",
             entity_id=image.image_id,
             details={"article_id": article_id, "position": image_count - 1}
         )
-        session.add(log)
-        await session.commit()
         
         if image_count < 5:
             # Если можно добавить еще изображения
@@ -2606,12 +2593,15 @@ async def admin_article_view(callback: CallbackQuery, session: AsyncSession):
             parse_mode="HTML"
         )
         
-        # Отправляем изображения, если они есть
-        for image in images:
-            await callback.message.answer_photo(
-                photo=image.file_id,
-                caption=f"Зображення {image.position + 1}/{len(images)}"
+        # Отправляем изображения альбомами
+        await send_media_groups(
+            callback.message,
+            get_article_media_groups(
+                article.article_id,
+                article.updated_at,
+                [image.file_id for image in images]
             )
+        )
         
         # Отправляем клавиатуру с действиями со статьей
         await callback.message.answer(
@@ -2620,15 +2610,13 @@ async def admin_article_view(callback: CallbackQuery, session: AsyncSession):
         )
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="ARTICLE",
             entity_id=article_id,
             details={"title": article.title, "category_id": article.category_id}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -2731,15 +2719,13 @@ async def process_edit_article_title(message: Message, state: FSMContext, sessio
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="EDIT",
             entity_type="ARTICLE",
             entity_id=article_id,
             details={"field": "title", "old_value": old_title, "new_value": new_title}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном обновлении заголовка
         await message.answer(
@@ -2857,15 +2843,13 @@ async def process_edit_article_content(message: Message, state: FSMContext, sess
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=message.from_user.id,
             action_type="EDIT",
             entity_type="ARTICLE",
             entity_id=article_id,
             details={"field": "content", "content_length": len(new_content)}
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном обновлении содержимого
         await message.answer(
@@ -2932,14 +2916,12 @@ async def manage_article_images(callback: CallbackQuery, session: AsyncSession):
             )
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="IMAGES",
             details={"article_id": article_id, "article_title": article.title, "images_count": len(images)}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -3012,15 +2994,13 @@ async def delete_image(callback: CallbackQuery, session: AsyncSession):
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="DELETE",
             entity_type="IMAGE",
             entity_id=image_id,
             details={"article_id": article_id, "position": image.position}
         )
-        session.add(log)
-        await session.commit()
         
         # Получаем информацию о статье
         article = await get_article_by_id(session, article_id)
@@ -3147,15 +3127,13 @@ async def confirm_delete_article(callback: CallbackQuery, session: AsyncSession)
             return
         
         # Логируем действие администратора
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="DELETE",
             entity_type="ARTICLE",
             entity_id=article_id,
             details=article_data
         )
-        session.add(log)
-        await session.commit()
         
         # Сообщаем об успешном удалении статьи
         await callback.message.edit_text(
@@ -3222,10 +3200,14 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, insert, update, and_, or_
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, defer
 
 from bot.database.models import User, Article, Test, Question, Answer, TestAttempt, UserAnswer
 from bot.keyboards.user_kb import get_main_menu_kb
+from bot.services.tests import (
+    get_test_snapshot, buffer_user_answer, flush_attempt_answers,
+    get_user_test_progress, invalidate_user_progress, create_test_attempt
+)
 from bot.utils.logger import logger
 
 # Создаем роутер для тестов (пользовательская часть)
@@ -3248,6 +3230,8 @@ async def get_available_tests_kb(session: AsyncSession, user_id: int):
     result = await session.execute(
         select(Test, Article)
         .join(Article, Test.article_id == Article.article_id)
+        # Для кнопок нужно только название статьи
+        .options(defer(Article.content, raiseload=True))
         .order_by(Article.title, Test.title)
     )
     tests_data = result.all()
@@ -3260,36 +3244,19 @@ async def get_available_tests_kb(session: AsyncSession, user_id: int):
         ))
         return builder.as_markup()
     
-    # Проверяем, какие тесты пользователь прошел с максимальным баллом
-    completed_tests = {}
-    for test, _ in tests_data:
-        result = await session.execute(
-            select(TestAttempt)
-            .where(
-                TestAttempt.user_id == user_id,
-                TestAttempt.test_id == test.test_id
-            )
-            .order_by(TestAttempt.created_at.desc())
-        )
-        latest_attempt = result.scalar_one_or_none()
-        
-        if latest_attempt:
-            completed_tests[test.test_id] = {
-                'score': latest_attempt.score,
-                'is_passed': latest_attempt.is_passed,
-                'date': latest_attempt.created_at
-            }
+    # Последние попытки пользователя по всем тестам (один запрос, кэшируется)
+    progress = await get_user_test_progress(session, user_id)
     
     # Добавляем кнопки для каждого теста с информацией о прохождении
     for test, article in tests_data:
-        test_info = completed_tests.get(test.test_id)
+        test_info = progress.get(test.test_id)
         
-        if test_info and test_info['score'] == 10:
+        if test_info and test_info.last_score == 10:
             # Пройден с максимальным баллом
             button_text = f"✅ {test.title} ({article.title}) - 10/10"
         elif test_info:
             # Пройден, но не с максимальным баллом
-            button_text = f"⚠️ {test.title} ({article.title}) - {test_info['score']}/10"
+            button_text = f"⚠️ {test.title} ({article.title}) - {test_info.last_score}/10"
         else:
             # Не пройден
             button_text = f"📝 {test.title} ({article.title})"
@@ -3311,34 +3278,6 @@ async def get_available_tests_kb(session: AsyncSession, user_id: int):
     return builder.as_markup()
 
 
-# Создаем клавиатуру для ответов на вопрос
-async def get_user_answers_kb(session: AsyncSession, question_id: int):
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-    
-    builder = InlineKeyboardBuilder()
-    
-    # Получаем список вариантов ответов для данного вопроса
-    result = await session.execute(
-        select(Answer)
-        .where(Answer.question_id == question_id)
-        .order_by(Answer.position)
-    )
-    answers = result.scalars().all()
-    
-    # Добавляем кнопки для каждого варианта ответа
-    for answer in answers:
-        builder.add(InlineKeyboardButton(
-            text=answer.answer_text,
-            callback_data=f"user_answer_{answer.answer_id}"
-        ))
-    
-    # Настраиваем расположение кнопок (по одной кнопке в строку)
-    builder.adjust(1)
-    
-    return builder.as_markup()
-
-
 # Клавиатура после завершения теста
 async def get_test_completion_kb(test_id: int, max_score: bool = False):
     from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -3399,13 +3338,13 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
     # Извлекаем ID теста из callback_data
     test_id = int(callback.data.split("_")[3])
     
-    # Получаем информацию о тесте
-    result = await session.execute(
-        select(Test)
-        .options(joinedload(Test.questions))
-        .where(Test.test_id == test_id)
-    )
-    test = result.scalar_one_or_none()
+    # Записываем ответы предыдущей незавершенной попытки, если она есть
+    previous_attempt_id = (await state.get_data()).get("attempt_id")
+    if previous_attempt_id:
+        await flush_attempt_answers(session, previous_attempt_id)
+    
+    # Получаем снимок теста с вопросами и ответами (из кэша или одним запросом)
+    test = await get_test_snapshot(session, test_id)
     
     if not test:
         await callback.message.edit_text(
@@ -3415,26 +3354,11 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
         await callback.answer()
         return
     
-    # Получаем информацию о статье
-    result = await session.execute(
-        select(Article).where(Article.article_id == test.article_id)
-    )
-    article = result.scalar_one_or_none()
-    
     # Проверяем, есть ли у пользователя уже пройденный тест с максимальным баллом
     user_id = callback.from_user.id
-    result = await session.execute(
-        select(TestAttempt)
-        .where(
-            TestAttempt.user_id == user_id,
-            TestAttempt.test_id == test_id,
-            TestAttempt.score == 10
-        )
-        .order_by(TestAttempt.created_at.desc())
-    )
-    max_score_attempt = result.scalar_one_or_none()
+    test_progress = (await get_user_test_progress(session, user_id)).get(test_id)
     
-    if max_score_attempt:
+    if test_progress and test_progress.best_score == 10:
         # У пользователя уже есть попытка с максимальным баллом
         await callback.message.edit_text(
             f"Ви вже пройшли тест \"{test.title}\" з максимальним балом (10)!\n\n"
@@ -3444,21 +3368,11 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
         await callback.answer()
         return
     
-    # Получаем предыдущую попытку пользователя (если есть)
-    result = await session.execute(
-        select(TestAttempt)
-        .where(
-            TestAttempt.user_id == user_id,
-            TestAttempt.test_id == test_id
-        )
-        .order_by(TestAttempt.created_at.desc())
-    )
-    previous_attempt = result.scalar_one_or_none()
+    # Результат предыдущей попытки пользователя (если есть)
+    previous_score = test_progress.last_score if test_progress else 0
     
-    previous_score = previous_attempt.score if previous_attempt else 0
-    
-    # Получаем вопросы для теста
-    questions = test.questions if hasattr(test, 'questions') else []
+    # Вопросы теста берем из снимка
+    questions = test.questions
     
     if not questions:
         await callback.message.edit_text(
@@ -3469,21 +3383,16 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
         return
     
     # Создаем новую попытку прохождения теста
-    new_attempt = TestAttempt(
-        user_id=user_id,
-        test_id=test_id,
-        score=10,  # Начинаем с максимального балла и вычитаем за ошибки
-        is_passed=False  # Пока не прошли до конца
-    )
-    session.add(new_attempt)
-    await session.commit()
-    await session.refresh(new_attempt)
+    # Начинаем с максимального балла и вычитаем за ошибки
+    attempt_id = await create_test_attempt(session, user_id, test_id, score=10)
+    invalidate_user_progress(user_id)
     
     # Сохраняем данные теста и текущего вопроса в состоянии
     await state.update_data(
         test_id=test_id,
-        attempt_id=new_attempt.attempt_id,
+        attempt_id=attempt_id,
         questions_ids=[q.question_id for q in questions],
+        test_version=test.version,
         current_question_index=0,
         errors_count=0,
         score=10,
@@ -3493,7 +3402,7 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
     # Отображаем информацию о тесте перед началом
     await callback.message.edit_text(
         f"📝 <b>Тест:</b> {test.title}\n"
-        f"📄 <b>Стаття:</b> {article.title if article else 'Невідома'}\n"
+        f"📄 <b>Стаття:</b> {test.article_title or 'Невідома'}\n"
         f"❓ <b>Кількість питань:</b> {len(questions)}\n"
         f"🏆 <b>Прохідний бал:</b> {test.pass_threshold}%\n"
         f"👤 <b>Ваш попередній результат:</b> {previous_score}/10\n\n"
@@ -3508,7 +3417,7 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
     # Показываем первый вопрос
     await callback.message.answer(
         f"Питання 1 з {len(questions)}:\n\n{first_question.question_text}",
-        reply_markup=await get_user_answers_kb(session, first_question.question_id)
+        reply_markup=first_question.get_keyboard("user_answer_")
     )
     
     # Переходим в состояние ответа на вопросы
@@ -3544,12 +3453,15 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
         await callback.answer()
         return
     
+    # Получаем снимок теста из кэша - ответ на вопрос не требует чтения из БД
+    test = await get_test_snapshot(session, test_id)
+    
+    if test and test.version != data.get("test_version"):
+        logger.info(f"Тест {test_id} был изменен во время попытки {attempt_id}")
+    
     # Получаем информацию о текущем вопросе
     current_question_id = questions_ids[current_question_index]
-    result = await session.execute(
-        select(Question).where(Question.question_id == current_question_id)
-    )
-    question = result.scalar_one_or_none()
+    question = test.get_question(current_question_id) if test else None
     
     if not question:
         await callback.message.edit_text(
@@ -3561,25 +3473,19 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
         return
     
     # Получаем информацию о выбранном ответе
-    result = await session.execute(
-        select(Answer).where(Answer.answer_id == answer_id)
-    )
-    answer = result.scalar_one_or_none()
+    answer = test.get_answer(answer_id)
     
     if not answer:
         await callback.answer("Помилка: відповідь не знайдена.")
         return
     
-    # Сохраняем ответ пользователя
-    user_answer = UserAnswer(
+    # Сохраняем ответ пользователя в буфер попытки (запись в БД - при завершении)
+    buffer_user_answer(
         attempt_id=attempt_id,
         question_id=question.question_id,
         answer_id=answer.answer_id,
-        is_correct=answer.is_correct,
-        created_at=datetime.now()
+        is_correct=answer.is_correct
     )
-    session.add(user_answer)
-    await session.commit()
     
     # Проверяем правильность ответа
     if answer.is_correct:
@@ -3603,16 +3509,9 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
         
         # Проверяем, не превышено ли максимальное количество ошибок (5)
         if errors_count >= 5:
-            # Обновляем данные попытки в БД
-            result = await session.execute(
-                select(TestAttempt).where(TestAttempt.attempt_id == attempt_id)
-            )
-            attempt = result.scalar_one_or_none()
-            
-            if attempt:
-                attempt.score = score
-                attempt.is_passed = False
-                await session.commit()
+            # Записываем ответы и результат попытки в БД одной транзакцией
+            await flush_attempt_answers(session, attempt_id, score=score, is_passed=False)
+            invalidate_user_progress(callback.from_user.id)
             
             # Завершаем тест из-за большого количества ошибок
             await callback.message.answer(
@@ -3632,11 +3531,8 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
         # Если есть еще вопросы, показываем следующий
         next_question_id = questions_ids[current_question_index]
         
-        # Получаем информацию о следующем вопросе
-        result = await session.execute(
-            select(Question).where(Question.question_id == next_question_id)
-        )
-        next_question = result.scalar_one_or_none()
+        # Получаем следующий вопрос из снимка теста
+        next_question = test.get_question(next_question_id)
         
         if not next_question:
             await callback.message.answer(
@@ -3653,41 +3549,19 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
         # Показываем следующий вопрос
         await callback.message.answer(
             f"Питання {current_question_index + 1} з {len(questions_ids)}:\n\n{next_question.question_text}",
-            reply_markup=await get_user_answers_kb(session, next_question.question_id)
+            reply_markup=next_question.get_keyboard("user_answer_")
         )
     else:
         # Если вопросов больше нет, завершаем тест
-        # Получаем информацию о тесте
-        result = await session.execute(
-            select(Test).where(Test.test_id == test_id)
-        )
-        test = result.scalar_one_or_none()
+        # Определяем, пройден ли тест (порог берем из снимка теста)
+        pass_threshold = test.pass_threshold
+        max_score = 10
+        pass_score = max_score * (pass_threshold / 100)
+        is_passed = score >= pass_score
         
-        if not test:
-            await callback.message.answer(
-                "Помилка: тест не знайдено.",
-                reply_markup=get_main_menu_kb()
-            )
-            await state.clear()
-            await callback.answer()
-            return
-        
-        # Обновляем данные попытки в БД
-        result = await session.execute(
-            select(TestAttempt).where(TestAttempt.attempt_id == attempt_id)
-        )
-        attempt = result.scalar_one_or_none()
-        
-        if attempt:
-            # Определяем, пройден ли тест
-            pass_threshold = test.pass_threshold
-            max_score = 10
-            pass_score = max_score * (pass_threshold / 100)
-            is_passed = score >= pass_score
-            
-            attempt.score = score
-            attempt.is_passed = is_passed
-            await session.commit()
+        # Записываем ответы и результат попытки в БД одной транзакцией
+        await flush_attempt_answers(session, attempt_id, score=score, is_passed=is_passed)
+        invalidate_user_progress(callback.from_user.id)
         
         # Формируем сообщение о результате
         if score == 10:
@@ -3718,6 +3592,11 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
 @router.callback_query(F.data.startswith("restart_test_"))
 async def restart_test(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Обработчик перезапуска теста"""
+    # Записываем ответы предыдущей незавершенной попытки, если она есть
+    previous_attempt_id = (await state.get_data()).get("attempt_id")
+    if previous_attempt_id:
+        await flush_attempt_answers(session, previous_attempt_id)
+    
     # Сбрасываем состояние
     await state.clear()
     
@@ -3826,12 +3705,16 @@ async def view_article_for_test(callback: CallbackQuery, session: AsyncSession):
     )
     images = result.scalars().all()
     
-    # Отправляем изображения, если они есть
-    for image in images:
-        await callback.message.answer_photo(
-            photo=image.file_id,
+    # Отправляем изображения альбомами
+    await send_media_groups(
+        callback.message,
+        get_article_media_groups(
+            article.article_id,
+            article.updated_at,
+            [image.file_id for image in images],
             caption=f"Ілюстрація до статті '{article.title}'"
         )
+    )
     
     await callback.answer()
 
@@ -4284,7 +4167,7 @@ async def show_article(callback: CallbackQuery, session: AsyncSession, state: FS
     await state.set_state(LibraryStates.view_article)
     
     # Формируем текст статьи с поддержкой Markdown
-    article_text = f"<b>{article_data['title']}</b>\n\n{article_data['content']}"
+    article_text = f"<b>{article_data.title}</b>\n\n{article_data.content}"
     
     # Отправляем текст статьи
     await callback.message.edit_text(
@@ -4292,12 +4175,12 @@ async def show_article(callback: CallbackQuery, session: AsyncSession, state: FS
         parse_mode="HTML"
     )
     
-    # Отправляем изображения, если они есть
-    for image in article_data["images"]:
-        await callback.message.answer_photo(
-            photo=image["file_id"],
-            caption=f"Ілюстрація до статті '{article_data['title']}'"
-        )
+    # Отправляем изображения альбомами
+    await send_article_images(
+        callback.message,
+        article_data,
+        caption=f"Ілюстрація до статті '{article_data.title}'"
+    )
     
     # Отправляем клавиатуру с действиями
     await callback.message.answer(
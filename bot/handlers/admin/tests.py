@@ -14,10 +14,15 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
+from sqlalchemy.orm import defer
 
 from bot.database.models import Article, Test, Question, Answer, User
 from bot.utils.logger import logger
 from bot.keyboards.admin_kb import get_admin_menu_kb
+from bot.services.tests import invalidate_question_snapshot
+from bot.services.articles import (
+    get_article_media_groups, send_media_groups, select_article_summaries, fetch_article_summaries
+)
 
 # Импортируем функции для работы с тестами
 from bot.database.operations_library import (
@@ -221,14 +226,14 @@ async def list_tests_command(callback: CallbackQuery, session: AsyncSession):
     # Получаем список статей, для которых есть тесты
     from sqlalchemy import func
     
-    # Получаем статьи, у которых есть тесты
-    result = await session.execute(
-        select(Article)
+    # Получаем статьи, у которых есть тесты (без текста статей)
+    articles = await fetch_article_summaries(
+        session,
+        select_article_summaries()
         .join(Test, Article.article_id == Test.article_id)
         .group_by(Article.article_id)
         .order_by(Article.title)
     )
-    articles = result.scalars().all()
     
     if not articles:
         await callback.message.edit_text(
@@ -1595,6 +1600,7 @@ async def process_edit_answer_text(message: Message, state: FSMContext, session:
     try:
         answer.answer_text = answer_text
         await session.commit()
+        invalidate_question_snapshot(answer.question_id)
         
         # Сообщаем об успешном обновлении
         await message.answer(
@@ -1642,6 +1648,7 @@ async def toggle_answer_correct(callback: CallbackQuery, session: AsyncSession):
         # Инвертируем статус ответа
         answer.is_correct = not answer.is_correct
         await session.commit()
+        invalidate_question_snapshot(answer.question_id)
         
         # Получаем обновленную информацию о вопросе для проверки количества правильных ответов
         result = await session.execute(
@@ -1735,6 +1742,7 @@ async def move_answer_up(callback: CallbackQuery, session: AsyncSession):
         prev_answer.position = temp_position
         
         await session.commit()
+        invalidate_question_snapshot(answer.question_id)
         
         # Перенаправляем к просмотру ответов
         await callback.message.edit_text(
@@ -1802,6 +1810,7 @@ async def move_answer_down(callback: CallbackQuery, session: AsyncSession):
         next_answer.position = temp_position
         
         await session.commit()
+        invalidate_question_snapshot(answer.question_id)
         
         # Перенаправляем к просмотру ответов
         await callback.message.edit_text(
@@ -1884,6 +1893,7 @@ async def confirm_delete_answer(callback: CallbackQuery, session: AsyncSession):
     try:
         await session.delete(answer)
         await session.commit()
+        invalidate_question_snapshot(question_id)
         
         # Проверяем, был ли удаленный ответ правильным, и есть ли еще правильные ответы
         if is_correct:
@@ -1918,6 +1928,7 @@ async def confirm_delete_answer(callback: CallbackQuery, session: AsyncSession):
             ans.position = i + 1
         
         await session.commit()
+        invalidate_question_snapshot(question_id)
         
         # Сообщаем об успешном удалении
         await callback.message.edit_text(
@@ -1952,45 +1963,9 @@ async def generate_test_statistics(session: AsyncSession, test_id: int) -> Dict[
     Returns:
         Dict: Словарь со статистикой
     """
-    from sqlalchemy import func
-    
-    # Получаем общее количество попыток прохождения теста
-    result = await session.execute(
-        select(func.count(TestAttempt.attempt_id)).where(TestAttempt.test_id == test_id)
-    )
-    total_attempts = result.scalar() or 0
-    
-    # Получаем количество уникальных пользователей
-    result = await session.execute(
-        select(func.count(func.distinct(TestAttempt.user_id))).where(TestAttempt.test_id == test_id)
-    )
-    unique_users = result.scalar() or 0
-    
-    # Получаем средний балл
-    result = await session.execute(
-        select(func.avg(TestAttempt.score)).where(TestAttempt.test_id == test_id)
-    )
-    avg_score = result.scalar() or 0
-    if avg_score:
-        avg_score = round(avg_score, 1)
-    
-    # Получаем процент успешных прохождений
-    result = await session.execute(
-        select(
-            func.sum(case((TestAttempt.is_passed == True, 1), else_=0)) * 100 / func.count(TestAttempt.attempt_id)
-        ).where(TestAttempt.test_id == test_id)
-    )
-    success_rate = result.scalar() or 0
-    if success_rate:
-        success_rate = round(success_rate, 1)
-    
-    # Формируем результат
-    return {
-        "total_attempts": total_attempts,
-        "unique_users": unique_users,
-        "avg_score": avg_score,
-        "success_rate": success_rate
-    }
+    # Учитываются и попытки, перенесенные в архив
+    from bot.services.tests import get_test_statistics as get_statistics
+    return await get_statistics(session, test_id)
 
 
 # Регистрация дополнительных обработчиков
@@ -1999,11 +1974,11 @@ async def generate_test_statistics(session: AsyncSession, test_id: int) -> Dict[
 @router.callback_query(F.data == "create_test")
 async def create_test_command(callback: CallbackQuery, session: AsyncSession):
     """Обработчик создания нового теста (выбор статьи)"""
-    # Получаем список статей для выбора
-    result = await session.execute(
-        select(Article).order_by(Article.title)
+    # Получаем список статей для выбора (без текста статей)
+    articles = await fetch_article_summaries(
+        session,
+        select_article_summaries().order_by(Article.title)
     )
-    articles = result.scalars().all()
     
     if not articles:
         await callback.message.edit_text(
@@ -2058,6 +2033,10 @@ from sqlalchemy.orm import joinedload
 
 from bot.database.models import User, Article, Test, Question, Answer, TestAttempt, UserAnswer
 from bot.keyboards.user_kb import get_main_menu_kb
+from bot.services.tests import (
+    get_test_snapshot, buffer_user_answer, flush_attempt_answers,
+    get_user_test_progress, invalidate_user_progress, create_test_attempt
+)
 from bot.utils.logger import logger
 
 # Создаем роутер для тестов (пользовательская часть)
@@ -2080,6 +2059,8 @@ async def get_available_tests_kb(session: AsyncSession, user_id: int):
     result = await session.execute(
         select(Test, Article)
         .join(Article, Test.article_id == Article.article_id)
+        # Для кнопок нужно только название статьи
+        .options(defer(Article.content, raiseload=True))
         .order_by(Article.title, Test.title)
     )
     tests_data = result.all()
@@ -2092,36 +2073,19 @@ async def get_available_tests_kb(session: AsyncSession, user_id: int):
         ))
         return builder.as_markup()
     
-    # Проверяем, какие тесты пользователь прошел с максимальным баллом
-    completed_tests = {}
-    for test, _ in tests_data:
-        result = await session.execute(
-            select(TestAttempt)
-            .where(
-                TestAttempt.user_id == user_id,
-                TestAttempt.test_id == test.test_id
-            )
-            .order_by(TestAttempt.created_at.desc())
-        )
-        latest_attempt = result.scalar_one_or_none()
-        
-        if latest_attempt:
-            completed_tests[test.test_id] = {
-                'score': latest_attempt.score,
-                'is_passed': latest_attempt.is_passed,
-                'date': latest_attempt.created_at
-            }
+    # Последние попытки пользователя по всем тестам (один запрос, кэшируется)
+    progress = await get_user_test_progress(session, user_id)
     
     # Добавляем кнопки для каждого теста с информацией о прохождении
     for test, article in tests_data:
-        test_info = completed_tests.get(test.test_id)
+        test_info = progress.get(test.test_id)
         
-        if test_info and test_info['score'] == 10:
+        if test_info and test_info.last_score == 10:
             # Пройден с максимальным баллом
             button_text = f"✅ {test.title} ({article.title}) - 10/10"
         elif test_info:
             # Пройден, но не с максимальным баллом
-            button_text = f"⚠️ {test.title} ({article.title}) - {test_info['score']}/10"
+            button_text = f"⚠️ {test.title} ({article.title}) - {test_info.last_score}/10"
         else:
             # Не пройден
             button_text = f"📝 {test.title} ({article.title})"
@@ -2143,34 +2107,6 @@ async def get_available_tests_kb(session: AsyncSession, user_id: int):
     return builder.as_markup()
 
 
-# Создаем клавиатуру для ответов на вопрос
-async def get_user_answers_kb(session: AsyncSession, question_id: int):
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-    
-    builder = InlineKeyboardBuilder()
-    
-    # Получаем список вариантов ответов для данного вопроса
-    result = await session.execute(
-        select(Answer)
-        .where(Answer.question_id == question_id)
-        .order_by(Answer.position)
-    )
-    answers = result.scalars().all()
-    
-    # Добавляем кнопки для каждого варианта ответа
-    for answer in answers:
-        builder.add(InlineKeyboardButton(
-            text=answer.answer_text,
-            callback_data=f"user_answer_{answer.answer_id}"
-        ))
-    
-    # Настраиваем расположение кнопок (по одной кнопке в строку)
-    builder.adjust(1)
-    
-    return builder.as_markup()
-
-
 # Клавиатура после завершения теста
 async def get_test_completion_kb(test_id: int, max_score: bool = False):
     from aiogram.utils.keyboard import InlineKeyboardBuilder
@@ -2231,13 +2167,13 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
     # Извлекаем ID теста из callback_data
     test_id = int(callback.data.split("_")[3])
     
-    # Получаем информацию о тесте
-    result = await session.execute(
-        select(Test)
-        .options(joinedload(Test.questions))
-        .where(Test.test_id == test_id)
-    )
-    test = result.scalar_one_or_none()
+    # Записываем ответы предыдущей незавершенной попытки, если она есть
+    previous_attempt_id = (await state.get_data()).get("attempt_id")
+    if previous_attempt_id:
+        await flush_attempt_answers(session, previous_attempt_id)
+    
+    # Получаем снимок теста с вопросами и ответами (из кэша или одним запросом)
+    test = await get_test_snapshot(session, test_id)
     
     if not test:
         await callback.message.edit_text(
@@ -2247,26 +2183,11 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
         await callback.answer()
         return
     
-    # Получаем информацию о статье
-    result = await session.execute(
-        select(Article).where(Article.article_id == test.article_id)
-    )
-    article = result.scalar_one_or_none()
-    
     # Проверяем, есть ли у пользователя уже пройденный тест с максимальным баллом
     user_id = callback.from_user.id
-    result = await session.execute(
-        select(TestAttempt)
-        .where(
-            TestAttempt.user_id == user_id,
-            TestAttempt.test_id == test_id,
-            TestAttempt.score == 10
-        )
-        .order_by(TestAttempt.created_at.desc())
-    )
-    max_score_attempt = result.scalar_one_or_none()
+    test_progress = (await get_user_test_progress(session, user_id)).get(test_id)
     
-    if max_score_attempt:
+    if test_progress and test_progress.best_score == 10:
         # У пользователя уже есть попытка с максимальным баллом
         await callback.message.edit_text(
             f"Ви вже пройшли тест \"{test.title}\" з максимальним балом (10)!\n\n"
@@ -2276,21 +2197,11 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
         await callback.answer()
         return
     
-    # Получаем предыдущую попытку пользователя (если есть)
-    result = await session.execute(
-        select(TestAttempt)
-        .where(
-            TestAttempt.user_id == user_id,
-            TestAttempt.test_id == test_id
-        )
-        .order_by(TestAttempt.created_at.desc())
-    )
-    previous_attempt = result.scalar_one_or_none()
-    
-    previous_score = previous_attempt.score if previous_attempt else 0
+    # Результат предыдущей попытки пользователя (если есть)
+    previous_score = test_progress.last_score if test_progress else 0
     
-    # Получаем вопросы для теста
-    questions = test.questions if hasattr(test, 'questions') else []
+    # Вопросы теста берем из снимка
+    questions = test.questions
     
     if not questions:
         await callback.message.edit_text(
@@ -2301,21 +2212,16 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
         return
     
     # Создаем новую попытку прохождения теста
-    new_attempt = TestAttempt(
-        user_id=user_id,
-        test_id=test_id,
-        score=10,  # Начинаем с максимального балла и вычитаем за ошибки
-        is_passed=False  # Пока не прошли до конца
-    )
-    session.add(new_attempt)
-    await session.commit()
-    await session.refresh(new_attempt)
+    # Начинаем с максимального балла и вычитаем за ошибки
+    attempt_id = await create_test_attempt(session, user_id, test_id, score=10)
+    invalidate_user_progress(user_id)
     
     # Сохраняем данные теста и текущего вопроса в состоянии
     await state.update_data(
         test_id=test_id,
-        attempt_id=new_attempt.attempt_id,
+        attempt_id=attempt_id,
         questions_ids=[q.question_id for q in questions],
+        test_version=test.version,
         current_question_index=0,
         errors_count=0,
         score=10,
@@ -2325,7 +2231,7 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
     # Отображаем информацию о тесте перед началом
     await callback.message.edit_text(
         f"📝 <b>Тест:</b> {test.title}\n"
-        f"📄 <b>Стаття:</b> {article.title if article else 'Невідома'}\n"
+        f"📄 <b>Стаття:</b> {test.article_title or 'Невідома'}\n"
         f"❓ <b>Кількість питань:</b> {len(questions)}\n"
         f"🏆 <b>Прохідний бал:</b> {test.pass_threshold}%\n"
         f"👤 <b>Ваш попередній результат:</b> {previous_score}/10\n\n"
@@ -2340,7 +2246,7 @@ async def start_user_test(callback: CallbackQuery, state: FSMContext, session: A
     # Показываем первый вопрос
     await callback.message.answer(
         f"Питання 1 з {len(questions)}:\n\n{first_question.question_text}",
-        reply_markup=await get_user_answers_kb(session, first_question.question_id)
+        reply_markup=first_question.get_keyboard("user_answer_")
     )
     
     # Переходим в состояние ответа на вопросы
@@ -2375,12 +2281,15 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
         await callback.answer()
         return
     
+    # Получаем снимок теста из кэша - ответ на вопрос не требует чтения из БД
+    test = await get_test_snapshot(session, test_id)
+    
+    if test and test.version != data.get("test_version"):
+        logger.info(f"Тест {test_id} был изменен во время попытки {attempt_id}")
+    
     # Получаем информацию о текущем вопросе
     current_question_id = questions_ids[current_question_index]
-    result = await session.execute(
-        select(Question).where(Question.question_id == current_question_id)
-    )
-    question = result.scalar_one_or_none()
+    question = test.get_question(current_question_id) if test else None
     
     if not question:
         await callback.message.edit_text(
@@ -2392,25 +2301,19 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
         return
     
     # Получаем информацию о выбранном ответе
-    result = await session.execute(
-        select(Answer).where(Answer.answer_id == answer_id)
-    )
-    answer = result.scalar_one_or_none()
+    answer = test.get_answer(answer_id)
     
     if not answer:
         await callback.answer("Помилка: відповідь не знайдена.")
         return
     
-    # Сохраняем ответ пользователя
-    user_answer = UserAnswer(
+    # Сохраняем ответ пользователя в буфер попытки (запись в БД - при завершении)
+    buffer_user_answer(
         attempt_id=attempt_id,
         question_id=question.question_id,
         answer_id=answer.answer_id,
-        is_correct=answer.is_correct,
-        created_at=datetime.now()
+        is_correct=answer.is_correct
     )
-    session.add(user_answer)
-    await session.commit()
     
     # Проверяем правильность ответа
     if answer.is_correct:
@@ -2434,16 +2337,9 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
         
         # Проверяем, не превышено ли максимальное количество ошибок (5)
         if errors_count >= 5:
-            # Обновляем данные попытки в БД
-            result = await session.execute(
-                select(TestAttempt).where(TestAttempt.attempt_id == attempt_id)
-            )
-            attempt = result.scalar_one_or_none()
-            
-            if attempt:
-                attempt.score = score
-                attempt.is_passed = False
-                await session.commit()
+            # Записываем ответы и результат попытки в БД одной транзакцией
+            await flush_attempt_answers(session, attempt_id, score=score, is_passed=False)
+            invalidate_user_progress(callback.from_user.id)
             
             # Завершаем тест из-за большого количества ошибок
             await callback.message.answer(
@@ -2463,11 +2359,8 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
         # Если есть еще вопросы, показываем следующий
         next_question_id = questions_ids[current_question_index]
         
-        # Получаем информацию о следующем вопросе
-        result = await session.execute(
-            select(Question).where(Question.question_id == next_question_id)
-        )
-        next_question = result.scalar_one_or_none()
+        # Получаем следующий вопрос из снимка теста
+        next_question = test.get_question(next_question_id)
         
         if not next_question:
             await callback.message.answer(
@@ -2484,41 +2377,19 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
         # Показываем следующий вопрос
         await callback.message.answer(
             f"Питання {current_question_index + 1} з {len(questions_ids)}:\n\n{next_question.question_text}",
-            reply_markup=await get_user_answers_kb(session, next_question.question_id)
+            reply_markup=next_question.get_keyboard("user_answer_")
         )
     else:
         # Если вопросов больше нет, завершаем тест
-        # Получаем информацию о тесте
-        result = await session.execute(
-            select(Test).where(Test.test_id == test_id)
-        )
-        test = result.scalar_one_or_none()
-        
-        if not test:
-            await callback.message.answer(
-                "Помилка: тест не знайдено.",
-                reply_markup=get_main_menu_kb()
-            )
-            await state.clear()
-            await callback.answer()
-            return
+        # Определяем, пройден ли тест (порог берем из снимка теста)
+        pass_threshold = test.pass_threshold
+        max_score = 10
+        pass_score = max_score * (pass_threshold / 100)
+        is_passed = score >= pass_score
         
-        # Обновляем данные попытки в БД
-        result = await session.execute(
-            select(TestAttempt).where(TestAttempt.attempt_id == attempt_id)
-        )
-        attempt = result.scalar_one_or_none()
-        
-        if attempt:
-            # Определяем, пройден ли тест
-            pass_threshold = test.pass_threshold
-            max_score = 10
-            pass_score = max_score * (pass_threshold / 100)
-            is_passed = score >= pass_score
-            
-            attempt.score = score
-            attempt.is_passed = is_passed
-            await session.commit()
+        # Записываем ответы и результат попытки в БД одной транзакцией
+        await flush_attempt_answers(session, attempt_id, score=score, is_passed=is_passed)
+        invalidate_user_progress(callback.from_user.id)
         
         # Формируем сообщение о результате
         if score == 10:
@@ -2549,6 +2420,11 @@ async def process_user_answer(callback: CallbackQuery, state: FSMContext, sessio
 @router.callback_query(F.data.startswith("restart_test_"))
 async def restart_test(callback: CallbackQuery, state: FSMContext, session: AsyncSession):
     """Обработчик перезапуска теста"""
+    # Записываем ответы предыдущей незавершенной попытки, если она есть
+    previous_attempt_id = (await state.get_data()).get("attempt_id")
+    if previous_attempt_id:
+        await flush_attempt_answers(session, previous_attempt_id)
+    
     # Сбрасываем состояние
     await state.clear()
     
@@ -2657,12 +2533,16 @@ async def view_article_for_test(callback: CallbackQuery, session: AsyncSession):
     )
     images = result.scalars().all()
     
-    # Отправляем изображения, если они есть
-    for image in images:
-        await callback.message.answer_photo(
-            photo=image.file_id,
+    # Отправляем изображения альбомами
+    await send_media_groups(
+        callback.message,
+        get_article_media_groups(
+            article.article_id,
+            article.updated_at,
+            [image.file_id for image in images],
             caption=f"Ілюстрація до статті '{article.title}'"
         )
+    )
     
     await callback.answer()
 
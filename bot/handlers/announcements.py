@@ -17,6 +17,8 @@ from bot.database.models import User, Announcement, AnnouncementDelivery, City,
 from bot.keyboards.user_kb import get_main_menu_kb
 from bot.keyboards.admin_kb import get_admin_menu_kb
 from bot.utils.logger import logger
+from bot.services.admins import is_admin_user
+from bot.services.broadcast import enqueue_announcement, get_recipients_condition, start_announcement_broadcast
 
 # Создаем роутер для объявлений
 router = Router()
@@ -134,14 +136,31 @@ async def get_stores_kb_for_announcement(session: AsyncSession, city_id=None):
     return builder.as_markup()
 
 
-# Обработчик команды "Объявления" для пользователя
-@router.message(F.text == "📢 Оголошення")
-async def announcements_command(message: Message, session: AsyncSession):
-    user_id = message.from_user.id
+# Количество объявлений на одной странице
+ANNOUNCEMENTS_PAGE_SIZE = 5
+# Ограничение длины сообщения Telegram
+MESSAGE_MAX_LENGTH = 4096
+
+
+async def send_announcements_page(message: Message, session: AsyncSession, user_id: int,
+                                  before: tuple = None):
+    """
+    Отправка страницы объявлений пользователя одним сообщением
+
+    Args:
+        message: Сообщение, в чат которого отправляется страница
+        session: Сессия базы данных
+        user_id: ID пользователя
+        before: Ключ (created_at, announcement_id) последнего показанного объявления
+
+    Returns:
+        bool: True если страница отправлена, False если объявлений нет
+    """
+    from aiogram.utils.keyboard import InlineKeyboardBuilder
+    from aiogram.types import InlineKeyboardButton
     
-    # Получаем список объявлений, адресованных пользователю
-    announcements_result = await session.execute(
-        select(Announcement, AnnouncementDelivery)
+    query = (
+        select(Announcement.announcement_id, Announcement.title, Announcement.content, Announcement.created_at)
         .join(
             AnnouncementDelivery,
             and_(
@@ -149,41 +168,105 @@ async def announcements_command(message: Message, session: AsyncSession):
                 AnnouncementDelivery.user_id == user_id
             )
         )
-        .order_by(Announcement.created_at.desc())
+        .order_by(Announcement.created_at.desc(), Announcement.announcement_id.desc())
+        .limit(ANNOUNCEMENTS_PAGE_SIZE + 1)
+    )
+    
+    if before:
+        # Keyset-пагинация: объявления старше последнего показанного
+        created_at, announcement_id = before
+        query = query.where(
+            or_(
+                Announcement.created_at < created_at,
+                and_(
+                    Announcement.created_at == created_at,
+                    Announcement.announcement_id < announcement_id
+                )
+            )
+        )
+    
+    rows = (await session.execute(query)).all()
+    
+    if not rows:
+        return False
+    
+    # Собираем страницу в одно сообщение, не превышая лимит Telegram
+    parts = []
+    length = 0
+    shown = []
+    for row in rows[:ANNOUNCEMENTS_PAGE_SIZE]:
+        part = f"<b>{row.title}</b>\n\n{row.content}"
+        if shown and length + len(part) + 2 > MESSAGE_MAX_LENGTH:
+            break
+        parts.append(part)
+        length += len(part) + 2
+        shown.append(row)
+    
+    has_more = len(shown) < len(rows)
+    
+    if has_more:
+        last = shown[-1]
+        builder = InlineKeyboardBuilder()
+        builder.add(InlineKeyboardButton(
+            text="⬇️ Ще",
+            callback_data=f"announcements_more_{last.announcement_id}_{last.created_at.isoformat()}"
+        ))
+        reply_markup = builder.as_markup()
+    else:
+        reply_markup = get_main_menu_kb()
+    
+    await message.answer(
+        "\n\n".join(parts),
+        parse_mode="HTML",
+        reply_markup=reply_markup
     )
     
-    announcements = announcements_result.all()
+    if not has_more:
+        await message.answer("Це всі ваші оголошення.")
     
-    if not announcements:
+    return True
+
+
+# Обработчик команды "Объявления" для пользователя
+@router.message(F.text == "📢 Оголошення")
+async def announcements_command(message: Message, session: AsyncSession):
+    user_id = message.from_user.id
+    
+    # Отмечаем все непрочитанные объявления пользователя одним запросом.
+    # is_delivered/delivered_at - состояние рассылки (bot/services/broadcast.py),
+    # их не трогаем, иначе неотправленные записи считались бы доставленными
+    await session.execute(
+        update(AnnouncementDelivery)
+        .where(
+            AnnouncementDelivery.user_id == user_id,
+            AnnouncementDelivery.read_at.is_(None)
+        )
+        .values(read_at=datetime.utcnow())
+    )
+    await session.commit()
+    
+    if not await send_announcements_page(message, session, user_id):
         await message.answer(
             "У вас немає оголошень.",
             reply_markup=get_main_menu_kb()
         )
-        return
+
+
+# Обработчик кнопки "Ще" в списке объявлений
+@router.callback_query(F.data.startswith("announcements_more_"))
+async def announcements_more(callback: CallbackQuery, session: AsyncSession):
+    _, _, announcement_id, created_at = callback.data.split("_", 3)
     
-    # Отправляем список объявлений
-    await message.answer("Ваші оголошення:")
+    # Убираем кнопку с предыдущей страницы
+    await callback.message.edit_reply_markup(reply_markup=None)
     
-    for announcement, delivery in announcements:
-        # Отмечаем объявление как прочитанное, если еще не отмечено
-        if not delivery.is_delivered:
-            delivery.is_delivered = True
-            delivery.delivered_at = datetime.now()
-            await session.commit()
-        
-        # Формируем сообщение с объявлением
-        announcement_text = f"<b>{announcement.title}</b>\n\n{announcement.content}"
-        
-        # Отправляем объявление
-        await message.answer(
-            announcement_text,
-            parse_mode="HTML"
-        )
-    
-    await message.answer(
-        "Це всі ваші оголошення.",
-        reply_markup=get_main_menu_kb()
+    await send_announcements_page(
+        callback.message,
+        session,
+        callback.from_user.id,
+        before=(datetime.fromisoformat(created_at), int(announcement_id))
     )
+    await callback.answer()
 
 
 # Обработчик команды "Рассылка" для администратора
@@ -192,12 +275,7 @@ async def broadcast_command(message: Message, state: FSMContext, session: AsyncS
     user_id = message.from_user.id
     
     # Проверяем, является ли пользователь администратором
-    user_result = await session.execute(
-        select(User).where(User.user_id == user_id)
-    )
-    user = user_result.scalar_one_or_none()
-    
-    if not user or not user.is_admin:
+    if not await is_admin_user(session, user_id):
         await message.answer(
             "У вас немає прав доступу до цієї команди.",
             reply_markup=get_main_menu_kb()
@@ -521,40 +599,19 @@ async def confirm_send_announcement(callback: CallbackQuery, state: FSMContext,
     await session.commit()
     await session.refresh(new_announcement)
     
-    # Получаем целевых пользователей
-    if recipients_type == "all":
-        # Все пользователи
-        users_result = await session.execute(select(User))
-        users = users_result.scalars().all()
-    
-    elif recipients_type == "by_city":
-        # Пользователи определенного города
-        city_id = data.get("city_id")
-        users_result = await session.execute(
-            select(User).where(User.city_id == city_id)
-        )
-        users = users_result.scalars().all()
-    
-    elif recipients_type == "by_store":
-        # Пользователи определенного магазина
-        store_id = data.get("store_id")
-        users_result = await session.execute(
-            select(User).where(User.store_id == store_id)
+    # Записываем всех получателей в outbox одним INSERT ... SELECT из users
+    recipients_count = await enqueue_announcement(
+        session,
+        new_announcement.announcement_id,
+        get_recipients_condition(
+            recipients_type,
+            city_id=data.get("city_id"),
+            store_id=data.get("store_id"),
+            target_user_id=data.get("target_user_id")
         )
-        users = users_result.scalars().all()
-    
-    elif recipients_type == "by_user":
-        # Конкретный пользователь
-        target_user_id = data.get("target_user_id")
-        users_result = await session.execute(
-            select(User).where(User.user_id == target_user_id)
-        )
-        users = users_result.scalars().all()
-    
-    else:
-        users = []
+    )
     
-    if not users:
+    if not recipients_count:
         await callback.message.edit_text(
             "Не знайдено користувачів для відправки оголошення.",
             reply_markup=get_admin_menu_kb()
@@ -562,73 +619,18 @@ async def confirm_send_announcement(callback: CallbackQuery, state: FSMContext,
         await state.clear()
         await callback.answer()
         return
-    
-    # Записываем для каждого пользователя запись о доставке объявления
-    delivery_count = 0
-    
-    for user in users:
-        # Создаем запись о доставке
-        delivery = AnnouncementDelivery(
-            announcement_id=new_announcement.announcement_id,
-            user_id=user.user_id,
-            is_delivered=False
-        )
-        session.add(delivery)
-        
-        try:
-            # Отправляем объявление пользователю
-            announcement_text = f"<b>{title}</b>\n\n{content}"
-            
-            await bot.send_message(
-                chat_id=user.user_id,
-                text=announcement_text,
-                parse_mode="HTML"
-            )
-            
-            # Отмечаем как доставленное
-            delivery.is_delivered = True
-            delivery.delivered_at = datetime.now()
-            
-            delivery_count += 1
-            
-            # Каждые 30 пользователей делаем коммит и небольшую паузу
-            if delivery_count % 30 == 0:
-                await session.commit()
-                import asyncio
-                await asyncio.sleep(0.5)  # Пауза 0.5 секунды
-                
-                # Обновляем сообщение с прогрессом
-                await callback.message.edit_text(
-                    f"Відправлення оголошення... Відправлено: {delivery_count}/{len(users)}"
-                )
-                
-        except Exception as e:
-            # Если произошла ошибка при отправке, логируем и продолжаем
-            logger.error(f"Ошибка при отправке объявления пользователю {user.user_id}: {e}")
-    
-    # Сохраняем все изменения
-    await session.commit()
-    
-    # Логируем действие администратора
-    from bot.database.models import AdminLog
-    admin_log = AdminLog(
-        admin_id=callback.from_user.id,
-        action_type="SEND",
-        entity_type="ANNOUNCEMENT",
-        entity_id=new_announcement.announcement_id,
-        details={
-            "recipients_type": recipients_type,
-            "users_count": len(users),
-            "delivered_count": delivery_count
-        }
-    )
-    session.add(admin_log)
-    await session.commit()
-    
-    # Отправляем сообщение об успешной отправке
+
+    # Рассылаем в фоне
     await callback.message.edit_text(
-        f"Оголошення успішно відправлено {delivery_count} користувачам.",
-        reply_markup=get_admin_menu_kb()
+        f"Відправлення оголошення... Відправлено: 0/{recipients_count}"
+    )
+
+    start_announcement_broadcast(
+        bot,
+        new_announcement.announcement_id,
+        recipients_type=recipients_type,
+        progress_chat_id=callback.message.chat.id,
+        progress_message_id=callback.message.message_id
     )
     
     await state.clear()
@@ -657,12 +659,7 @@ async def back_to_main_menu(callback: CallbackQuery, state: FSMContext, session:
     user_id = callback.from_user.id
     
     # Проверяем, является ли пользователь администратором
-    result = await session.execute(
-        select(User).where(User.user_id == user_id)
-    )
-    user = result.scalar_one_or_none()
-    
-    if user and user.is_admin:
+    if await is_admin_user(session, user_id):
         await callback.message.edit_text(
             "Ви повернулись до головного меню.",
         )
@@ -0,0 +1,127 @@
+import os
+
+from aiogram import Router, F
+from aiogram.types import Message, CallbackQuery, FSInputFile
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import select
+
+from bot.database.models import City, Store
+from bot.keyboards.admin_kb import get_export_cities_kb, get_export_stores_kb, get_export_format_kb
+from bot.middlewares.auth import IsAdmin
+from bot.services.audit import queue_admin_log
+from bot.services.exports import EXPORT_FORMATS, export_test_results, get_export_filename
+from bot.utils.logger import logger
+
+# Создаем роутер для выгрузки результатов (только для администраторов)
+router = Router()
+router.message.filter(IsAdmin())
+router.callback_query.filter(IsAdmin())
+
+
+# Обработчик кнопки "Статистика": выбор города для выгрузки результатов тестов
+@router.message(F.text == "📊 Статистика")
+async def statistics_command(message: Message, read_session: AsyncSession):
+    result = await read_session.execute(select(City).order_by(City.name))
+    cities = result.scalars().all()
+
+    await message.answer(
+        "Вивантаження результатів тестів.\n\nОберіть місто:",
+        reply_markup=get_export_cities_kb(cities)
+    )
+
+
+# Возврат к выбору города
+@router.callback_query(F.data == "export_results")
+async def export_results_command(callback: CallbackQuery, read_session: AsyncSession):
+    result = await read_session.execute(select(City).order_by(City.name))
+    cities = result.scalars().all()
+
+    await callback.message.edit_text(
+        "Вивантаження результатів тестів.\n\nОберіть місто:",
+        reply_markup=get_export_cities_kb(cities)
+    )
+    await callback.answer()
+
+
+# Выбор магазина (для всех городов сразу переходим к выбору формата)
+@router.callback_query(F.data.startswith("export_city_"))
+async def export_city_selected(callback: CallbackQuery, read_session: AsyncSession):
+    city_id = int(callback.data.split("_")[2])
+
+    if not city_id:
+        await callback.message.edit_text(
+            "Вивантаження результатів усіх міст.\n\nОберіть формат файлу:",
+            reply_markup=get_export_format_kb(0, 0, EXPORT_FORMATS)
+        )
+        await callback.answer()
+        return
+
+    city = await read_session.get(City, city_id)
+    if not city:
+        await callback.answer("Місто не знайдено", show_alert=True)
+        return
+
+    result = await read_session.execute(
+        select(Store).where(Store.city_id == city_id).order_by(Store.name)
+    )
+    stores = result.scalars().all()
+
+    await callback.message.edit_text(
+        f"Місто: {city.name}\n\nОберіть магазин:",
+        reply_markup=get_export_stores_kb(city_id, stores)
+    )
+    await callback.answer()
+
+
+# Выбор формата файла
+@router.callback_query(F.data.startswith("export_store_"))
+async def export_store_selected(callback: CallbackQuery):
+    _, _, city_id, store_id = callback.data.split("_")
+
+    await callback.message.edit_text(
+        "Оберіть формат файлу:",
+        reply_markup=get_export_format_kb(int(city_id), int(store_id), EXPORT_FORMATS)
+    )
+    await callback.answer()
+
+
+# Формирование файла и отправка администратору
+@router.callback_query(F.data.startswith("export_format_"))
+async def export_format_selected(callback: CallbackQuery, read_session: AsyncSession):
+    _, _, city_id, store_id, file_format = callback.data.split("_")
+    city_id, store_id = int(city_id) or None, int(store_id) or None
+
+    await callback.answer()
+    await callback.message.edit_text("⏳ Формування файлу...")
+
+    path = None
+    try:
+        path, count = await export_test_results(
+            read_session,
+            file_format=file_format,
+            city_id=city_id,
+            store_id=store_id
+        )
+
+        if not count:
+            await callback.message.edit_text("Результатів тестів за обраними умовами немає.")
+            return
+
+        await callback.message.answer_document(
+            FSInputFile(path, filename=get_export_filename(file_format)),
+            caption=f"Результати тестів: {count} спроб"
+        )
+        await callback.message.delete()
+
+        queue_admin_log(
+            admin_id=callback.from_user.id,
+            action_type="EXPORT",
+            entity_type="TEST_RESULTS",
+            details={"city_id": city_id, "store_id": store_id, "format": file_format, "rows": count}
+        )
+    except Exception as e:
+        logger.error(f"Error exporting test results: {e}")
+        await callback.message.edit_text("Виникла помилка при формуванні файлу. Спробуйте пізніше.")
+    finally:
+        if path:
+            os.remove(path)
@@ -25,6 +25,9 @@ from bot.database.operations_library import (
     get_articles_by_category, get_article_by_id, create_article, update_article, delete_article,
     get_article_images, add_article_image, delete_article_image
 )
+from bot.services.admins import is_admin_user
+from bot.services.audit import queue_admin_log
+from bot.services.articles import get_article_view, send_article_images
 
 
     
@@ -53,11 +56,8 @@ class LibraryStates(StatesGroup):
 
 # Helper function to check if user is admin
 async def is_admin(user_id: int, session: AsyncSession) -> bool:
-    """Check if user is an admin"""
-    result = await session.execute(
-        select(User).where(User.user_id == user_id, User.is_admin == True)
-    )
-    return result.scalar_one_or_none() is not None
+    """Check if user is an admin (lookup in the in-memory admin set)"""
+    return await is_admin_user(session, user_id)
 
 # ADMIN HANDLERS
 # --------------
@@ -78,14 +78,12 @@ async def admin_articles_command(callback: CallbackQuery, session: AsyncSession)
         )
         
         # Log admin action
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="LIBRARY",
             details={"action": "view_library_categories"}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -148,15 +146,13 @@ async def admin_category_selection(callback: CallbackQuery, session: AsyncSessio
             )
         
         # Log admin action
-        log = AdminLog(
+        queue_admin_log(
             admin_id=callback.from_user.id,
             action_type="VIEW",
             entity_type="CATEGORY",
             entity_id=category_id,
             details={"category_name": category.name, "level": category.level}
         )
-        session.add(log)
-        await session.commit()
         
         await callback.answer()
     except Exception as e:
@@ -175,11 +171,11 @@ async def admin_category_selection(callback: CallbackQuery, session: AsyncSessio
 
 # User library entry point
 @router.message(F.text == "📚 Бібліотека знань")
-async def user_library_command(message: Message, session: AsyncSession):
+async def user_library_command(message: Message, read_session: AsyncSession):
     """Entry point for user to browse the knowledge library"""
     try:
         # Get root categories (level 1)
-        categories = await get_categories(session, parent_id=None, level=1)
+        categories = await get_categories(read_session, parent_id=None, level=1)
         
         if not categories:
             await message.answer(
@@ -202,7 +198,7 @@ async def user_library_command(message: Message, session: AsyncSession):
 
 # User category selection handler
 @router.callback_query(F.data.startswith("category_"))
-async def user_category_selection(callback: CallbackQuery, session: AsyncSession):
+async def user_category_selection(callback: CallbackQuery, read_session: AsyncSession):
     """User handler for selecting a category"""
     try:
         # Extract category ID from callback data
@@ -210,7 +206,7 @@ async def user_category_selection(callback: CallbackQuery, session: AsyncSession
         category_id = int(parts[1])
         
         # Get category information
-        category = await get_category_by_id(session, category_id)
+        category = await get_category_by_id(read_session, category_id)
         
         if not category:
             await callback.message.edit_text(
@@ -223,7 +219,7 @@ async def user_category_selection(callback: CallbackQuery, session: AsyncSession
         # Check category level
         if category.level < 3:
             # If this is level 1 or 2 category, show subcategories
-            subcategories = await get_categories(session, parent_id=category_id)
+            subcategories = await get_categories(read_session, parent_id=category_id)
             
             from bot.keyboards.library_kb import get_categories_kb
             
@@ -241,7 +237,7 @@ async def user_category_selection(callback: CallbackQuery, session: AsyncSession
                 )
         else:
             # If this is level 3 category (product group), show articles
-            articles = await get_articles_by_category(session, category_id)
+            articles = await get_articles_by_category(read_session, category_id)
             
             from bot.keyboards.library_kb import get_articles_kb
             
@@ -268,16 +264,16 @@ async def user_category_selection(callback: CallbackQuery, session: AsyncSession
 
 # Article view handler
 @router.callback_query(F.data.startswith("article_"))
-async def user_article_view(callback: CallbackQuery, session: AsyncSession):
+async def user_article_view(callback: CallbackQuery, read_session: AsyncSession):
     """User handler for viewing an article"""
     try:
         # Extract article ID from callback data
         article_id = int(callback.data.split("_")[1])
         
-        # Get article information
-        article = await get_article_by_id(session, article_id)
+        # Get article with category, images and tests (cached by article version)
+        view = await get_article_view(read_session, article_id)
         
-        if not article:
+        if not view:
             await callback.message.edit_text(
                 "Стаття не знайдена. Поверніться до головного меню.",
                 reply_markup=get_main_menu_kb()
@@ -285,37 +281,28 @@ async def user_article_view(callback: CallbackQuery, session: AsyncSession):
             await callback.answer()
             return
         
-        # Get category information
-        category = await get_category_by_id(session, article.category_id)
-        
-        # Check if there's a test for this article
-        result = await session.execute(
-            select(Test).where(Test.article_id == article_id)
-        )
-        test = result.scalar_one_or_none()
+        article = view.details
         
         from bot.keyboards.library_kb import get_article_navigation_kb
         
-        # Display article text
+        # Display the first page of the article text
         await callback.message.edit_text(
-            f"<b>{article.title}</b>\n\n{article.content}",
+            view.get_page(0),
             parse_mode="HTML",
-            reply_markup=await get_article_navigation_kb(
+            reply_markup=get_article_navigation_kb(
                 article_id, 
-                test_id=test.test_id if test else None,
-                category_id=article.category_id
+                test_id=article.test_id,
+                category_id=article.category_id,
+                page_count=view.page_count
             )
         )
         
-        # Get article images
-        images = await get_article_images(session, article_id)
-        
-        # Send images if any
-        for image in images:
-            await callback.message.answer_photo(
-                photo=image.file_id,
-                caption=f"Зображення до статті \"{article.title}\""
-            )
+        # Send images as albums
+        await send_article_images(
+            callback.message,
+            article,
+            caption=f"Зображення до статті \"{article.title}\""
+        )
         
         await callback.answer()
     except Exception as e:
@@ -326,6 +313,39 @@ async def user_article_view(callback: CallbackQuery, session: AsyncSession):
         )
         await callback.answer()
 
+# Article page handler (pages are served from the cached article view)
+@router.callback_query(F.data.startswith("page_article_"))
+async def user_article_page(callback: CallbackQuery, read_session: AsyncSession):
+    """User handler for paging through a long article"""
+    try:
+        _, _, article_id, page = callback.data.split("_")
+        article_id, page = int(article_id), int(page)
+        
+        view = await get_article_view(read_session, article_id)
+        
+        if not view:
+            await callback.answer("Статтю не знайдено", show_alert=True)
+            return
+        
+        from bot.keyboards.library_kb import get_article_navigation_kb
+        
+        page = min(page, view.page_count - 1)
+        await callback.message.edit_text(
+            view.get_page(page),
+            parse_mode="HTML",
+            reply_markup=get_article_navigation_kb(
+                article_id,
+                test_id=view.details.test_id,
+                category_id=view.details.category_id,
+                page=page,
+                page_count=view.page_count
+            )
+        )
+        await callback.answer()
+    except Exception as e:
+        logger.error(f"Error in user_article_page: {e}")
+        await callback.answer()
+
 # Continue with other user handlers...
 # [Additional user handler implementations would go here]
 
@@ -334,12 +354,11 @@ async def user_article_view(callback: CallbackQuery, session: AsyncSession):
 
 # Back to main menu handler
 @router.callback_query(F.data == "back_to_main_menu")
-async def back_to_main_menu(callback: CallbackQuery, state: FSMContext):
+async def back_to_main_menu(callback: CallbackQuery, state: FSMContext, read_session: AsyncSession):
     """Handler for returning to main menu"""
     try:
         # Check if user is admin
-        session = callback.bot.get('db_session')
-        is_user_admin = await is_admin(callback.from_user.id, session) if session else False
+        is_user_admin = await is_admin(callback.from_user.id, read_session)
         
         # Clear any active state
         await state.clear()
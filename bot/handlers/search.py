@@ -0,0 +1,197 @@
+import html
+
+from aiogram import Router, F
+from aiogram.filters import Command, CommandObject
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.types import Message, CallbackQuery, InlineQuery, InlineQueryResultArticle, InputTextMessageContent
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.keyboards.library_kb import get_search_results_kb, get_search_article_kb
+from bot.services.articles import get_article_view, send_article_images
+from bot.services.search import INLINE_CACHE_TIME, SearchPage, search_articles, search_inline_articles
+from bot.services.users import is_registered_user
+from bot.utils.logger import logger
+
+# Создаем роутер для поиска статей
+router = Router()
+
+
+class SearchStates(StatesGroup):
+    waiting_for_query = State()
+
+
+def format_search_page(search_page: SearchPage) -> str:
+    """Текст страницы результатов поиска (HTML)"""
+    query = html.escape(search_page.query)
+    if not search_page.total:
+        return f"🔍 За запитом «{query}» нічого не знайдено.\n\nСпробуйте інші слова."
+
+    lines = [
+        f"🔍 Знайдено статей за запитом «{query}»: {search_page.total}",
+        f"Сторінка {search_page.page + 1} з {search_page.pages}",
+        ""
+    ]
+    first_number = search_page.page * search_page.page_size + 1
+    for number, hit in enumerate(search_page.hits, start=first_number):
+        lines.append(f"<b>{number}. {html.escape(hit.title)}</b>")
+        lines.append(f"<i>{html.escape(hit.category_path)}</i>")
+        if hit.snippet:
+            lines.append(hit.snippet)
+        lines.append("")
+
+    return "\n".join(lines).rstrip()
+
+
+async def show_search_results(message: Message, state: FSMContext, read_session: AsyncSession,
+                              query: str, page: int = 0, edit: bool = False):
+    search_page = await search_articles(read_session, query, page=page)
+
+    # Запрос и страница нужны для листания и возврата из статьи
+    await state.update_data(search_query=query, search_page=search_page.page)
+
+    text = format_search_page(search_page)
+    reply_markup = get_search_results_kb(search_page)
+    if edit:
+        await message.edit_text(text, parse_mode="HTML", reply_markup=reply_markup)
+    else:
+        await message.answer(text, parse_mode="HTML", reply_markup=reply_markup)
+
+
+# Команда /search: с текстом запроса - сразу поиск, без текста - запрос слов
+@router.message(Command("search"))
+async def search_command(message: Message, command: CommandObject, state: FSMContext, read_session: AsyncSession):
+    if not command.args:
+        await state.set_state(SearchStates.waiting_for_query)
+        await message.answer("Введіть слова для пошуку в бібліотеці знань:")
+        return
+
+    try:
+        await show_search_results(message, state, read_session, command.args)
+    except Exception as e:
+        logger.error(f"Error in search_command: {e}")
+        await message.answer("Виникла помилка при пошуку. Спробуйте пізніше.")
+
+
+# Кнопка "Пошук статей" в главном меню
+@router.message(F.text == "🔍 Пошук статей")
+async def search_button(message: Message, state: FSMContext):
+    await state.set_state(SearchStates.waiting_for_query)
+    await message.answer("Введіть слова для пошуку в бібліотеці знань:")
+
+
+# Текст запроса после команды или кнопки
+@router.message(SearchStates.waiting_for_query, F.text)
+async def process_search_query(message: Message, state: FSMContext, read_session: AsyncSession):
+    # Следующие сообщения пользователя уже не считаются запросом
+    await state.set_state(None)
+
+    try:
+        await show_search_results(message, state, read_session, message.text)
+    except Exception as e:
+        logger.error(f"Error in process_search_query: {e}")
+        await message.answer("Виникла помилка при пошуку. Спробуйте пізніше.")
+
+
+# Листание страниц результатов
+@router.callback_query(F.data.startswith("search_page_"))
+async def search_page_selected(callback: CallbackQuery, state: FSMContext, read_session: AsyncSession):
+    data = await state.get_data()
+    query = data.get("search_query")
+    if not query:
+        await callback.answer("Пошук застарів, введіть запит ще раз", show_alert=True)
+        return
+
+    page = int(callback.data.split("_")[2])
+    try:
+        await show_search_results(callback.message, state, read_session, query, page=page, edit=True)
+    except Exception as e:
+        logger.error(f"Error in search_page_selected: {e}")
+    await callback.answer()
+
+
+# Возврат из статьи к результатам поиска
+@router.callback_query(F.data == "search_back")
+async def search_back(callback: CallbackQuery, state: FSMContext, read_session: AsyncSession):
+    data = await state.get_data()
+    query = data.get("search_query")
+    if not query:
+        await callback.answer("Пошук застарів, введіть запит ще раз", show_alert=True)
+        return
+
+    try:
+        await show_search_results(
+            callback.message, state, read_session, query, page=data.get("search_page", 0), edit=True
+        )
+    except Exception as e:
+        logger.error(f"Error in search_back: {e}")
+    await callback.answer()
+
+
+# Открытие статьи из результатов поиска и листание ее страниц
+@router.callback_query(F.data.startswith("search_article_"))
+async def search_article_selected(callback: CallbackQuery, read_session: AsyncSession):
+    parts = callback.data.split("_")
+    article_id = int(parts[2])
+    # Без номера страницы - статья открывается впервые
+    page = int(parts[3]) if len(parts) > 3 else None
+
+    view = await get_article_view(read_session, article_id)
+    if not view:
+        await callback.answer("Статтю не знайдено", show_alert=True)
+        return
+
+    article = view.details
+    current_page = min(page or 0, view.page_count - 1)
+    await callback.message.edit_text(
+        view.get_page(current_page),
+        parse_mode="HTML",
+        reply_markup=get_search_article_kb(
+            article_id,
+            test_id=article.test_id,
+            page=current_page,
+            page_count=view.page_count
+        )
+    )
+
+    if page is None:
+        # Отправляем изображения альбомами
+        await send_article_images(
+            callback.message,
+            article,
+            caption=f"Зображення до статті \"{article.title}\""
+        )
+    await callback.answer()
+
+
+# Инлайн-режим: @bot молоко в любом чате
+@router.inline_query()
+async def inline_article_search(inline_query: InlineQuery, read_session: AsyncSession):
+    # Статьи - внутренние материалы: отвечаем только зарегистрированным сотрудникам
+    if not await is_registered_user(read_session, inline_query.from_user.id):
+        await inline_query.answer([], cache_time=1, is_personal=True)
+        return
+
+    try:
+        hits = await search_inline_articles(read_session, inline_query.query)
+    except Exception as e:
+        logger.error(f"Error in inline_article_search: {e}")
+        await inline_query.answer([], cache_time=1)
+        return
+
+    results = [
+        InlineQueryResultArticle(
+            id=str(hit.article.article_id),
+            title=hit.article.title,
+            description=f"{hit.article.category_path}\n{hit.snippet}" if hit.snippet else hit.article.category_path,
+            input_message_content=InputTextMessageContent(
+                message_text=hit.article.message_text,
+                parse_mode="HTML"
+            )
+        )
+        for hit in hits
+    ]
+
+    # Ответ кэшируется Telegram только для этого пользователя, иначе
+    # сохраненные результаты получил бы и незарегистрированный пользователь
+    await inline_query.answer(results, cache_time=INLINE_CACHE_TIME, is_personal=True)
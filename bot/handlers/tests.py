@@ -11,10 +11,17 @@ from aiogram.fsm.state import State, StatesGroup
 from aiogram.filters import Command
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, insert, update
+from sqlalchemy.orm import defer
 
 from bot.database.models import Test, Question, Answer, TestAttempt, UserAnswer, User, Article
 from bot.keyboards.user_kb import get_main_menu_kb
+from bot.services.tests import (
+    get_test_snapshot, buffer_user_answer, flush_attempt_answers,
+    get_user_test_progress, invalidate_user_progress, create_test_attempt
+)
 from bot.utils.logger import logger
+from bot.services.admins import is_admin_user
+from bot.services.articles import select_article_summaries, fetch_article_summaries
 
 # Создаем роутер для тестов
 router = Router()
@@ -36,6 +43,8 @@ async def get_tests_kb(session: AsyncSession):
     result = await session.execute(
         select(Test, Article)
         .join(Article, Test.article_id == Article.article_id)
+        # Для кнопок нужно только название статьи
+        .options(defer(Article.content, raiseload=True))
     )
     tests = result.all()
     
@@ -58,34 +67,6 @@ async def get_tests_kb(session: AsyncSession):
     return builder.as_markup()
 
 
-# Создаем клавиатуру для ответов на вопрос
-async def get_answers_kb(session: AsyncSession, question_id):
-    from aiogram.utils.keyboard import InlineKeyboardBuilder
-    from aiogram.types import InlineKeyboardButton
-    
-    builder = InlineKeyboardBuilder()
-    
-    # Получаем список вариантов ответов для данного вопроса
-    result = await session.execute(
-        select(Answer)
-        .where(Answer.question_id == question_id)
-        .order_by(Answer.position)
-    )
-    answers = result.scalars().all()
-    
-    # Добавляем кнопки для каждого варианта ответа
-    for answer in answers:
-        builder.add(InlineKeyboardButton(
-            text=answer.answer_text,
-            callback_data=f"answer_{answer.answer_id}"
-        ))
-    
-    # Настраиваем расположение кнопок (по одной кнопке в строку)
-    builder.adjust(1)
-    
-    return builder.as_markup()
-
-
 # Обработчик команды "Пройти тест"
 @router.message(F.text == "📝 Пройти тест")
 async def tests_command(message: Message, session: AsyncSession):
@@ -101,15 +82,15 @@ async def select_test(callback: CallbackQuery, state: FSMContext, session: Async
     # Извлекаем ID теста из callback_data
     test_id = int(callback.data.split("_")[2])
     
-    # Получаем информацию о тесте
-    test_result = await session.execute(
-        select(Test, Article)
-        .join(Article, Test.article_id == Article.article_id)
-        .where(Test.test_id == test_id)
-    )
-    test_data = test_result.first()
+    # Записываем ответы предыдущей незавершенной попытки, если она есть
+    previous_attempt_id = (await state.get_data()).get("attempt_id")
+    if previous_attempt_id:
+        await flush_attempt_answers(session, previous_attempt_id)
+    
+    # Получаем снимок теста с вопросами и ответами (из кэша или одним запросом)
+    test = await get_test_snapshot(session, test_id)
     
-    if not test_data:
+    if not test:
         await callback.message.edit_text(
             "Тест не знайдено. Виберіть інший тест:",
             reply_markup=await get_tests_kb(session)
@@ -117,21 +98,11 @@ async def select_test(callback: CallbackQuery, state: FSMContext, session: Async
         await callback.answer()
         return
     
-    test, article = test_data
-    
     # Проверяем, нет ли у пользователя уже пройденного теста с максимальным баллом
     user_id = callback.from_user.id
-    attempts_result = await session.execute(
-        select(TestAttempt)
-        .where(
-            TestAttempt.user_id == user_id,
-            TestAttempt.test_id == test_id,
-            TestAttempt.score == 10
-        )
-    )
-    max_score_attempt = attempts_result.scalar_one_or_none()
+    test_progress = (await get_user_test_progress(session, user_id)).get(test_id)
     
-    if max_score_attempt:
+    if test_progress and test_progress.best_score == 10:
         # У пользователя уже есть попытка с максимальным баллом
         await callback.message.edit_text(
             f"Ви вже пройшли тест \"{test.title}\" з максимальним балом (10)! "
@@ -141,13 +112,8 @@ async def select_test(callback: CallbackQuery, state: FSMContext, session: Async
         await callback.answer()
         return
     
-    # Получаем первый вопрос для теста
-    questions_result = await session.execute(
-        select(Question)
-        .where(Question.test_id == test_id)
-        .order_by(Question.question_id)
-    )
-    questions = questions_result.scalars().all()
+    # Вопросы теста берем из снимка
+    questions = test.questions
     
     if not questions:
         await callback.message.edit_text(
@@ -158,22 +124,17 @@ async def select_test(callback: CallbackQuery, state: FSMContext, session: Async
         return
     
     # Создаем новую попытку прохождения теста
-    new_attempt = TestAttempt(
-        user_id=user_id,
-        test_id=test_id,
-        score=10,  # Начинаем с максимального балла и вычитаем за ошибки
-        is_passed=False  # Пока не прошли до конца
-    )
-    session.add(new_attempt)
-    await session.commit()
-    await session.refresh(new_attempt)
+    # Начинаем с максимального балла и вычитаем за ошибки
+    attempt_id = await create_test_attempt(session, user_id, test_id, score=10)
+    invalidate_user_progress(user_id)
     
     # Сохраняем данные теста и текущего вопроса в состоянии
     await state.update_data(
         test_id=test_id,
-        attempt_id=new_attempt.attempt_id,
+        attempt_id=attempt_id,
         current_question_index=0,
         questions=[q.question_id for q in questions],
+        test_version=test.version,
         errors_count=0,
         score=10
     )
@@ -183,7 +144,7 @@ async def select_test(callback: CallbackQuery, state: FSMContext, session: Async
     
     await callback.message.edit_text(
         f"Тест: {test.title}\n\nПитання 1 з {len(questions)}:\n{first_question.question_text}",
-        reply_markup=await get_answers_kb(session, first_question.question_id)
+        reply_markup=first_question.get_keyboard("answer_")
     )
     
     # Переходим в состояние ответа на вопросы
@@ -207,29 +168,24 @@ async def process_answer(callback: CallbackQuery, state: FSMContext, session: As
     errors_count = data.get("errors_count", 0)
     score = data.get("score", 10)
     
-    # Получаем информацию о выбранном ответе
-    answer_result = await session.execute(
-        select(Answer, Question)
-        .join(Question, Answer.question_id == Question.question_id)
-        .where(Answer.answer_id == answer_id)
-    )
-    answer_data = answer_result.first()
+    # Получаем снимок теста из кэша - ответ на вопрос не требует чтения из БД
+    test = await get_test_snapshot(session, test_id)
+    answer = test.get_answer(answer_id) if test else None
     
-    if not answer_data:
+    if not answer:
         await callback.answer("Помилка: відповідь не знайдена.")
         return
     
-    answer, question = answer_data
+    if test.version != data.get("test_version"):
+        logger.info(f"Тест {test_id} был изменен во время попытки {attempt_id}")
     
-    # Сохраняем ответ пользователя
-    user_answer = UserAnswer(
+    # Сохраняем ответ пользователя в буфер попытки (запись в БД - при завершении)
+    buffer_user_answer(
         attempt_id=attempt_id,
-        question_id=question.question_id,
+        question_id=answer.question_id,
         answer_id=answer.answer_id,
         is_correct=answer.is_correct
     )
-    session.add(user_answer)
-    await session.commit()
     
     # Проверяем правильность ответа
     if answer.is_correct:
@@ -253,13 +209,10 @@ async def process_answer(callback: CallbackQuery, state: FSMContext, session: As
         
         # Проверяем, не превышено ли максимальное количество ошибок (5)
         if errors_count >= 5:
-            # Обновляем данные попытки в БД
-            await session.execute(
-                update(TestAttempt)
-                .where(TestAttempt.attempt_id == attempt_id)
-                .values(score=score, is_passed=False)
-            )
-            await session.commit()
+            # Записываем ответы и результат попытки в БД одной транзакцией
+            if not await flush_attempt_answers(session, attempt_id, score=score, is_passed=False):
+                logger.warning(f"Результат попытки {attempt_id} не записан при завершении теста")
+            invalidate_user_progress(callback.from_user.id)
             
             # Завершаем тест из-за большого количества ошибок
             await callback.message.answer(
@@ -279,11 +232,8 @@ async def process_answer(callback: CallbackQuery, state: FSMContext, session: As
         # Если есть еще вопросы, показываем следующий
         next_question_id = questions[current_question_index]
         
-        # Получаем информацию о следующем вопросе
-        question_result = await session.execute(
-            select(Question).where(Question.question_id == next_question_id)
-        )
-        next_question = question_result.scalar_one_or_none()
+        # Получаем следующий вопрос из снимка теста
+        next_question = test.get_question(next_question_id)
         
         if not next_question:
             await callback.message.answer(
@@ -299,25 +249,16 @@ async def process_answer(callback: CallbackQuery, state: FSMContext, session: As
         # Показываем следующий вопрос
         await callback.message.answer(
             f"Питання {current_question_index + 1} з {len(questions)}:\n{next_question.question_text}",
-            reply_markup=await get_answers_kb(session, next_question.question_id)
+            reply_markup=next_question.get_keyboard("answer_")
         )
     else:
         # Если вопросов больше нет, завершаем тест
-        # Обновляем данные попытки в БД
+        # Записываем ответы и результат попытки в БД одной транзакцией
         is_passed = score >= (10 * 0.8)  # 80% от максимального балла
         
-        await session.execute(
-            update(TestAttempt)
-            .where(TestAttempt.attempt_id == attempt_id)
-            .values(score=score, is_passed=is_passed)
-        )
-        await session.commit()
-        
-        # Получаем информацию о тесте
-        test_result = await session.execute(
-            select(Test).where(Test.test_id == test_id)
-        )
-        test = test_result.scalar_one_or_none()
+        if not await flush_attempt_answers(session, attempt_id, score=score, is_passed=is_passed):
+            logger.warning(f"Результат попытки {attempt_id} не записан при завершении теста")
+        invalidate_user_progress(callback.from_user.id)
         
         # Формируем сообщение о результате
         if score == 10:
@@ -416,6 +357,11 @@ async def restart_test(callback: CallbackQuery, state: FSMContext, session: Asyn
     # Извлекаем ID теста из callback_data
     test_id = int(callback.data.split("_")[2])
     
+    # Записываем ответы предыдущей незавершенной попытки, если она есть
+    previous_attempt_id = (await state.get_data()).get("attempt_id")
+    if previous_attempt_id:
+        await flush_attempt_answers(session, previous_attempt_id)
+    
     # Сбрасываем состояние
     await state.clear()
     
@@ -465,23 +411,13 @@ async def get_categories_kb(session: AsyncSession, parent_id=None, level=1):
     from aiogram.utils.keyboard import InlineKeyboardBuilder
     from aiogram.types import InlineKeyboardButton
     from bot.database.models import Category
+    from bot.services.articles import get_category_tree, rebuild_category_tree
     
     builder = InlineKeyboardBuilder()
     
-    # Получаем список категорий из БД
-    if parent_id is None:
-        result = await session.execute(
-            select(Category).where(Category.level == level)
-        )
-    else:
-        result = await session.execute(
-            select(Category).where(
-                Category.parent_id == parent_id,
-                Category.level == level
-            )
-        )
-    
-    categories = result.scalars().all()
+    # Получаем список категорий из индекса дерева категорий
+    tree = await get_category_tree(session)
+    categories = tree.get_children(parent_id, level)
     
     # Если категорий нет, создаем базовые категории для первого уровня
     if not categories and level == 1 and parent_id is None:
@@ -497,10 +433,8 @@ async def get_categories_kb(session: AsyncSession, parent_id=None, level=1):
         await session.commit()
         
         # Получаем категории снова
-        result = await session.execute(
-            select(Category).where(Category.level == level)
-        )
-        categories = result.scalars().all()
+        tree = await rebuild_category_tree(session)
+        categories = tree.get_children(None, level)
     
     # Добавляем кнопки для каждой категории
     for category in categories:
@@ -513,10 +447,7 @@ async def get_categories_kb(session: AsyncSession, parent_id=None, level=1):
     if level > 1 or parent_id is not None:
         # Получаем родительскую категорию, чтобы найти её родителя для кнопки "Назад"
         if parent_id is not None:
-            parent_result = await session.execute(
-                select(Category).where(Category.category_id == parent_id)
-            )
-            parent = parent_result.scalar_one_or_none()
+            parent = tree.get(parent_id)
             
             back_level = level - 1
             back_parent_id = parent.parent_id if parent else None
@@ -544,12 +475,7 @@ async def back_to_main_menu(callback: CallbackQuery, state: FSMContext, session:
     user_id = callback.from_user.id
     
     # Проверяем, является ли пользователь администратором
-    result = await session.execute(
-        select(User).where(User.user_id == user_id)
-    )
-    user = result.scalar_one_or_none()
-    
-    if user and user.is_admin:
+    if await is_admin_user(session, user_id):
         from bot.keyboards.admin_kb import get_admin_menu_kb
         await callback.message.edit_text(
             "Ви повернулись до головного меню.",
@@ -589,6 +515,7 @@ from sqlalchemy import select
 from bot.database.models import Article, Test, Question, Answer, User
 from bot.utils.logger import logger
 from bot.keyboards.admin_kb import get_admin_menu_kb
+from bot.services.tests import invalidate_question_snapshot
 
 # Импортируем функции для работы с тестами
 from bot.database.operations_library import (
@@ -792,14 +719,14 @@ async def list_tests_command(callback: CallbackQuery, session: AsyncSession):
     # Получаем список статей, для которых есть тесты
     from sqlalchemy import func
     
-    # Получаем статьи, у которых есть тесты
-    result = await session.execute(
-        select(Article)
+    # Получаем статьи, у которых есть тесты (без текста статей)
+    articles = await fetch_article_summaries(
+        session,
+        select_article_summaries()
         .join(Test, Article.article_id == Test.article_id)
         .group_by(Article.article_id)
         .order_by(Article.title)
     )
-    articles = result.scalars().all()
     
     if not articles:
         await callback.message.edit_text(
@@ -2171,6 +2098,7 @@ async def process_edit_answer_text(message: Message, state: FSMContext, session:
     try:
         answer.answer_text = answer_text
         await session.commit()
+        invalidate_question_snapshot(answer.question_id)
         
         # Сообщаем об успешном обновлении
         await message.answer(
@@ -2218,6 +2146,7 @@ async def toggle_answer_correct(callback: CallbackQuery, session: AsyncSession):
         # Инвертируем статус ответа
         answer.is_correct = not answer.is_correct
         await session.commit()
+        invalidate_question_snapshot(answer.question_id)
         
         # Получаем обновленную информацию о вопросе для проверки количества правильных ответов
         result = await session.execute(
@@ -2311,6 +2240,7 @@ async def move_answer_up(callback: CallbackQuery, session: AsyncSession):
         prev_answer.position = temp_position
         
         await session.commit()
+        invalidate_question_snapshot(answer.question_id)
         
         # Перенаправляем к просмотру ответов
         await callback.message.edit_text(
@@ -2378,6 +2308,7 @@ async def move_answer_down(callback: CallbackQuery, session: AsyncSession):
         next_answer.position = temp_position
         
         await session.commit()
+        invalidate_question_snapshot(answer.question_id)
         
         # Перенаправляем к просмотру ответов
         await callback.message.edit_text(
@@ -2460,6 +2391,7 @@ async def confirm_delete_answer(callback: CallbackQuery, session: AsyncSession):
     try:
         await session.delete(answer)
         await session.commit()
+        invalidate_question_snapshot(question_id)
         
         # Проверяем, был ли удаленный ответ правильным, и есть ли еще правильные ответы
         if is_correct:
@@ -2494,6 +2426,7 @@ async def confirm_delete_answer(callback: CallbackQuery, session: AsyncSession):
             ans.position = i + 1
         
         await session.commit()
+        invalidate_question_snapshot(question_id)
         
         # Сообщаем об успешном удалении
         await callback.message.edit_text(
@@ -2528,45 +2461,9 @@ async def generate_test_statistics(session: AsyncSession, test_id: int) -> Dict[
     Returns:
         Dict: Словарь со статистикой
     """
-    from sqlalchemy import func
-    
-    # Получаем общее количество попыток прохождения теста
-    result = await session.execute(
-        select(func.count(TestAttempt.attempt_id)).where(TestAttempt.test_id == test_id)
-    )
-    total_attempts = result.scalar() or 0
-    
-    # Получаем количество уникальных пользователей
-    result = await session.execute(
-        select(func.count(func.distinct(TestAttempt.user_id))).where(TestAttempt.test_id == test_id)
-    )
-    unique_users = result.scalar() or 0
-    
-    # Получаем средний балл
-    result = await session.execute(
-        select(func.avg(TestAttempt.score)).where(TestAttempt.test_id == test_id)
-    )
-    avg_score = result.scalar() or 0
-    if avg_score:
-        avg_score = round(avg_score, 1)
-    
-    # Получаем процент успешных прохождений
-    result = await session.execute(
-        select(
-            func.sum(case((TestAttempt.is_passed == True, 1), else_=0)) * 100 / func.count(TestAttempt.attempt_id)
-        ).where(TestAttempt.test_id == test_id)
-    )
-    success_rate = result.scalar() or 0
-    if success_rate:
-        success_rate = round(success_rate, 1)
-    
-    # Формируем результат
-    return {
-        "total_attempts": total_attempts,
-        "unique_users": unique_users,
-        "avg_score": avg_score,
-        "success_rate": success_rate
-    }
+    # Учитываются и попытки, перенесенные в архив
+    from bot.services.tests import get_test_statistics as get_statistics
+    return await get_statistics(session, test_id)
 
 
 # Регистрация дополнительных обработчиков
@@ -2575,11 +2472,11 @@ async def generate_test_statistics(session: AsyncSession, test_id: int) -> Dict[
 @router.callback_query(F.data == "create_test")
 async def create_test_command(callback: CallbackQuery, session: AsyncSession):
     """Обработчик создания нового теста (выбор статьи)"""
-    # Получаем список статей для выбора
-    result = await session.execute(
-        select(Article).order_by(Article.title)
+    # Получаем список статей для выбора (без текста статей)
+    articles = await fetch_article_summaries(
+        session,
+        select_article_summaries().order_by(Article.title)
     )
-    articles = result.scalars().all()
     
     if not articles:
         await callback.message.edit_text(
@@ -144,6 +144,67 @@ def get_statistics_kb():
     return builder.as_markup()
 
 
+# Клавиатура выбора города для выгрузки результатов тестов
+def get_export_cities_kb(cities):
+    builder = InlineKeyboardBuilder()
+    
+    builder.add(InlineKeyboardButton(text="🌍 Усі міста", callback_data="export_city_0"))
+    
+    for city in cities:
+        builder.add(InlineKeyboardButton(
+            text=city.name,
+            callback_data=f"export_city_{city.city_id}"
+        ))
+    
+    builder.add(InlineKeyboardButton(text="🔙 Назад", callback_data="back_to_admin"))
+    
+    # Размещаем кнопки в одну колонку
+    builder.adjust(1)
+    
+    return builder.as_markup()
+
+
+# Клавиатура выбора магазина для выгрузки результатов тестов
+def get_export_stores_kb(city_id, stores):
+    builder = InlineKeyboardBuilder()
+    
+    builder.add(InlineKeyboardButton(
+        text="🏪 Усі магазини міста",
+        callback_data=f"export_store_{city_id}_0"
+    ))
+    
+    for store in stores:
+        builder.add(InlineKeyboardButton(
+            text=store.name,
+            callback_data=f"export_store_{city_id}_{store.store_id}"
+        ))
+    
+    builder.add(InlineKeyboardButton(text="🔙 Назад", callback_data="export_results"))
+    
+    # Размещаем кнопки в одну колонку
+    builder.adjust(1)
+    
+    return builder.as_markup()
+
+
+# Клавиатура выбора формата выгрузки результатов тестов
+def get_export_format_kb(city_id, store_id, formats):
+    builder = InlineKeyboardBuilder()
+    
+    for file_format in formats:
+        builder.add(InlineKeyboardButton(
+            text=f"📥 {file_format.upper()}",
+            callback_data=f"export_format_{city_id}_{store_id}_{file_format}"
+        ))
+    
+    builder.add(InlineKeyboardButton(text="🔙 Назад", callback_data="export_results"))
+    
+    # Размещаем кнопки в одну колонку
+    builder.adjust(1)
+    
+    return builder.as_markup()
+
+
 # Функция для создания клавиатуры списка городов
 def build_cities_kb(cities, callback_prefix="city_", include_back=True):
     builder = InlineKeyboardBuilder()
@@ -204,7 +204,7 @@ def get_article_actions_kb(article_id, category_id):
     
     return builder.as_markup()
 
-def get_article_navigation_kb(article_id, test_id=None, category_id=None):
+def get_article_navigation_kb(article_id, test_id=None, category_id=None, page=0, page_count=1):
     """
     Создает клавиатуру навигации для статьи (для пользователя)
     
@@ -212,12 +212,18 @@ def get_article_navigation_kb(article_id, test_id=None, category_id=None):
         article_id: ID статьи
         test_id: ID теста (если есть)
         category_id: ID категории
+        page: Текущая страница статьи (с нуля)
+        page_count: Количество страниц статьи
     
     Returns:
         InlineKeyboardMarkup: Клавиатура навигации
     """
     builder = InlineKeyboardBuilder()
     
+    # Листание страниц длинной статьи
+    navigation = get_article_pages_buttons(f"page_article_{article_id}_", page, page_count)
+    builder.add(*navigation)
+    
     # Если есть тест, добавляем кнопку
     if test_id:
         builder.add(InlineKeyboardButton(
@@ -237,11 +243,39 @@ def get_article_navigation_kb(article_id, test_id=None, category_id=None):
             callback_data="back_to_library"
         ))
     
-    # Размещаем кнопки по одной в строку
-    builder.adjust(1)
+    # Кнопки листания в одну строку, остальные по одной в строку
+    if navigation:
+        builder.adjust(len(navigation), 1)
+    else:
+        builder.adjust(1)
     
     return builder.as_markup()
 
+def get_article_pages_buttons(callback_prefix, page, page_count):
+    """
+    Создает кнопки листания страниц статьи
+    
+    Args:
+        callback_prefix: Начало callback_data, к нему добавляется номер страницы
+        page: Текущая страница (с нуля)
+        page_count: Количество страниц
+    
+    Returns:
+        list: Кнопки "назад" и "вперед" (пустой список для одной страницы)
+    """
+    buttons = []
+    if page > 0:
+        buttons.append(InlineKeyboardButton(
+            text="◀️",
+            callback_data=f"{callback_prefix}{page - 1}"
+        ))
+    if page + 1 < page_count:
+        buttons.append(InlineKeyboardButton(
+            text="▶️",
+            callback_data=f"{callback_prefix}{page + 1}"
+        ))
+    return buttons
+
 def get_send_article_kb(article_id):
     """
     Создает клавиатуру для выбора получателей рассылки статьи
@@ -349,3 +383,84 @@ def get_confirm_delete_kb(entity_type, entity_id, return_callback):
     builder.adjust(1)
     
     return builder.as_markup()
+
+def get_search_results_kb(search_page):
+    """
+    Создает клавиатуру страницы результатов поиска
+    
+    Args:
+        search_page: Страница результатов (SearchPage)
+    
+    Returns:
+        InlineKeyboardMarkup: Клавиатура с найденными статьями и листанием
+    """
+    builder = InlineKeyboardBuilder()
+    
+    # Кнопки найденных статей (номера совпадают с номерами в тексте)
+    first_number = search_page.page * search_page.page_size + 1
+    for number, hit in enumerate(search_page.hits, start=first_number):
+        builder.row(InlineKeyboardButton(
+            text=f"{number}. {hit.title}",
+            callback_data=f"search_article_{hit.article_id}"
+        ))
+    
+    # Листание страниц
+    navigation = []
+    if search_page.has_prev:
+        navigation.append(InlineKeyboardButton(
+            text="◀️",
+            callback_data=f"search_page_{search_page.page - 1}"
+        ))
+    if search_page.has_next:
+        navigation.append(InlineKeyboardButton(
+            text="▶️",
+            callback_data=f"search_page_{search_page.page + 1}"
+        ))
+    if navigation:
+        builder.row(*navigation)
+    
+    builder.row(InlineKeyboardButton(
+        text="🔙 Головне меню",
+        callback_data="back_to_main_menu"
+    ))
+    
+    return builder.as_markup()
+
+def get_search_article_kb(article_id, test_id=None, page=0, page_count=1):
+    """
+    Создает клавиатуру статьи, открытой из результатов поиска
+    
+    Args:
+        article_id: ID статьи
+        test_id: ID теста (если есть)
+        page: Текущая страница статьи (с нуля)
+        page_count: Количество страниц статьи
+    
+    Returns:
+        InlineKeyboardMarkup: Клавиатура статьи
+    """
+    builder = InlineKeyboardBuilder()
+    
+    # Листание страниц длинной статьи
+    navigation = get_article_pages_buttons(f"search_article_{article_id}_", page, page_count)
+    builder.add(*navigation)
+    
+    # Если есть тест, добавляем кнопку
+    if test_id:
+        builder.add(InlineKeyboardButton(
+            text="📝 Пройти тест",
+            callback_data=f"start_test_{test_id}"
+        ))
+    
+    builder.add(InlineKeyboardButton(
+        text="🔙 До результатів пошуку",
+        callback_data="search_back"
+    ))
+    
+    # Кнопки листания в одну строку, остальные по одной в строку
+    if navigation:
+        builder.adjust(len(navigation), 1)
+    else:
+        builder.adjust(1)
+    
+    return builder.as_markup()
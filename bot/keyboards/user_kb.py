@@ -12,11 +12,12 @@ def get_main_menu_kb():
         KeyboardButton(text="📚 Бібліотека знань"),
         KeyboardButton(text="📝 Пройти тест"),
         KeyboardButton(text="🏆 Мої бали"),
-        KeyboardButton(text="📢 Оголошення")
+        KeyboardButton(text="📢 Оголошення"),
+        KeyboardButton(text="🔍 Пошук статей")
     )
     
-    # Размещаем кнопки в 2 строки по 2 кнопки
-    builder.adjust(2, 2)
+    # Размещаем кнопки в 2 строки по 2 кнопки и поиск отдельной строкой
+    builder.adjust(2, 2, 1)
     
     return builder.as_markup(resize_keyboard=True)
     
@@ -0,0 +1,27 @@
+# bot/middlewares/auth.py
+"""
+Filters for access control.
+"""
+
+from typing import Optional
+
+from aiogram.filters import BaseFilter
+from aiogram.types import TelegramObject
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.services.admins import is_admin_user
+
+
+class IsAdmin(BaseFilter):
+    """
+    Passes updates from administrators only.
+
+    The check is a lookup in the in-memory admin set; ``read_session``
+    (injected by DatabaseMiddleware) is used only if the set is not loaded.
+    """
+
+    async def __call__(self, event: TelegramObject, read_session: Optional[AsyncSession] = None) -> bool:
+        user = getattr(event, "from_user", None)
+        if user is None:
+            return False
+        return await is_admin_user(read_session, user.id)
@@ -6,15 +6,63 @@ Database middleware for providing database sessions to all handlers.
 from typing import Any, Awaitable, Callable, Dict
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
-from bot.database.database import AsyncSessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from bot.database.database import AsyncSessionLocal, ReadOnlySessionLocal
 
 
+class LazySession:
+    """
+    Proxy for AsyncSession that creates the real session on first use.
+
+    Updates whose handlers never touch the database (menu navigation) skip
+    creating and closing session objects. Connection checkout is deferred by
+    AsyncSession itself until the first statement, not by this proxy.
+
+    Attributes not defined here, including ``is_active``, are forwarded to
+    the real session. The proxy is not an AsyncSession subclass, so
+    ``isinstance(session, AsyncSession)`` is False; ``async with session``
+    yields the real session and closes it on exit.
+    """
+
+    __slots__ = ("_factory", "_session")
+
+    def __init__(self, factory: Callable[[], AsyncSession]):
+        self._factory = factory
+        self._session = None
+
+    @property
+    def created(self) -> bool:
+        """True if the real session has been created."""
+        return self._session is not None
+
+    def _get_session(self) -> AsyncSession:
+        if self._session is None:
+            self._session = self._factory()
+        return self._session
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._get_session(), name)
+
+    async def __aenter__(self) -> AsyncSession:
+        return self._get_session()
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
 
 class DatabaseMiddleware(BaseMiddleware):
     """
-    Middleware for injecting database session into handler data.
+    Middleware for injecting database sessions into handler data.
+
+    Handlers receive ``session`` (read-write) and ``read_session``
+    (read-only). Both session objects are created lazily on first use.
     """
-    
+
     async def __call__(
         self,
         handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
@@ -23,17 +71,18 @@ class DatabaseMiddleware(BaseMiddleware):
     ) -> Any:
         """
         This method is called for each update.
-        Creates a new database session and adds it to the data which is passed to handlers.
-        After the handler is executed, the session is closed.
+        Adds lazy sessions to the data which is passed to handlers.
+        After the handler is executed, the sessions that were used are closed.
         """
-        async with AsyncSessionLocal() as session:
-            # Add the session to the data
-            data["session"] = session
-            
-            # Save the session in the bot instance for easy access in callbacks
-            if "bot" in data:
-                data["bot"]["db_session"] = session
-            
+        session = LazySession(AsyncSessionLocal)
+        read_session = LazySession(ReadOnlySessionLocal)
+
+        data["session"] = session
+        data["read_session"] = read_session
+
+        try:
             # Call the handler with the updated data
             return await handler(event, data)
-        
+        finally:
+            await read_session.close()
+            await session.close()
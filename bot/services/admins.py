@@ -0,0 +1,101 @@
+"""
+Определение администраторов.
+
+Администраторы - это ADMIN_IDS из настроек и пользователи с флагом
+users.is_admin. Оба источника объединяются в множество в памяти, которое
+загружается при запуске бота, поэтому проверка прав - это поиск в множестве,
+а не запрос к базе данных. После изменения флага is_admin множество
+перестраивается (refresh_admin_ids) или сбрасывается (invalidate_admin_ids).
+"""
+
+from typing import FrozenSet, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import ADMIN_IDS
+from bot.database.models import User
+from bot.utils.logger import logger
+
+_admin_ids: Optional[FrozenSet[int]] = None
+
+
+async def load_admin_ids(session: AsyncSession) -> FrozenSet[int]:
+    """
+    Загрузка множества администраторов одним запросом
+
+    Args:
+        session: Сессия SQLAlchemy
+
+    Returns:
+        FrozenSet[int]: Telegram ID администраторов
+    """
+    global _admin_ids
+
+    result = await session.execute(
+        select(User.user_id).where(User.is_admin == True)
+    )
+    _admin_ids = frozenset(ADMIN_IDS) | frozenset(result.scalars().all())
+    logger.debug(f"Admin ids loaded: {len(_admin_ids)}")
+    return _admin_ids
+
+
+async def get_admin_ids(session: AsyncSession) -> FrozenSet[int]:
+    """
+    Множество администраторов (загружается при первом обращении)
+
+    Args:
+        session: Сессия SQLAlchemy (используется только для загрузки)
+
+    Returns:
+        FrozenSet[int]: Telegram ID администраторов
+    """
+    if _admin_ids is None:
+        return await load_admin_ids(session)
+    return _admin_ids
+
+
+async def is_admin_user(session: AsyncSession, user_id: int) -> bool:
+    """
+    Проверка, является ли пользователь администратором
+
+    Args:
+        session: Сессия SQLAlchemy (используется только для загрузки множества)
+        user_id: Telegram ID пользователя
+
+    Returns:
+        bool: True если пользователь администратор
+    """
+    if _admin_ids is not None:
+        return user_id in _admin_ids
+    if user_id in ADMIN_IDS:
+        return True
+    if session is None:
+        return False
+    try:
+        return user_id in await load_admin_ids(session)
+    except Exception as e:
+        logger.error(f"Error loading admin ids: {e}")
+        return False
+
+
+def invalidate_admin_ids():
+    """Сброс множества администраторов; оно загрузится при следующей проверке"""
+    global _admin_ids
+    _admin_ids = None
+
+
+async def refresh_admin_ids(session: AsyncSession):
+    """
+    Перестроение множества после изменения флага is_admin
+
+    При ошибке множество сбрасывается и будет загружено при следующей проверке
+
+    Args:
+        session: Сессия SQLAlchemy
+    """
+    try:
+        await load_admin_ids(session)
+    except Exception as e:
+        logger.error(f"Error loading admin ids: {e}")
+        invalidate_admin_ids()
@@ -0,0 +1,597 @@
+"""
+Кэш библиотеки знаний.
+
+Дерево категорий (три уровня) меняется редко, поэтому целиком загружается
+одним запросом в индекс в памяти: категории по ID, дочерние категории по
+родителю и уровню и готовые «хлебные крошки». Навигация по библиотеке
+читает только индекс. create_category/update_category/delete_category в
+operations_library перестраивают индекс после каждого изменения.
+
+Списки статей (кнопки категорий, выбор статьи для теста) читают только ID,
+название и категорию в легкий ArticleSummary: большой текст статьи
+загружается только при ее открытии.
+
+Статья со всеми деталями загружается одним запросом в неизменяемый
+ArticleDetails. Готовые представления статей хранятся в LRU-кэше с ключом
+(article_id, updated_at): повторное открытие статьи стоит одного легкого
+запроса версии.
+
+Текст статьи экранируется для HTML и заранее делится на страницы не длиннее
+лимита Telegram (4096 символов) по границам абзацев, затем строк и слов.
+Страницы хранятся в том же представлении, поэтому листание длинной статьи
+не обращается к базе и не разбирает текст заново.
+
+Изображения статьи отправляются альбомами (send_media_group) по 10 штук
+вместо отдельного сообщения на каждое изображение; готовые списки
+InputMediaPhoto также кэшируются для каждой версии статьи.
+"""
+
+import html
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+from aiogram.types import InputMediaPhoto, Message
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from bot.database.models import Article, Category
+from bot.utils.logger import logger
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryNode:
+    category_id: int
+    name: str
+    parent_id: Optional[int]
+    level: int
+    children_ids: Tuple[int, ...]
+    # Названия категорий от корня до текущей включительно
+    breadcrumbs: Tuple[str, ...]
+
+    @property
+    def path(self) -> str:
+        return " / ".join(self.breadcrumbs)
+
+
+@dataclass(frozen=True, slots=True)
+class CategoryTree:
+    nodes: Mapping[int, CategoryNode]
+    # (parent_id, level) -> дочерние категории
+    children: Mapping[Tuple[Optional[int], int], Tuple[CategoryNode, ...]]
+    # level -> все категории уровня
+    levels: Mapping[int, Tuple[CategoryNode, ...]]
+
+    def get(self, category_id: int) -> Optional[CategoryNode]:
+        return self.nodes.get(category_id)
+
+    def get_children(self, parent_id: Optional[int], level: int) -> Tuple[CategoryNode, ...]:
+        """
+        Категории уровня level с родителем parent_id
+
+        Как и прежний запрос get_categories, при parent_id=None возвращает
+        все категории уровня
+        """
+        if parent_id is None:
+            return self.levels.get(level, ())
+        return self.children.get((parent_id, level), ())
+
+
+_tree: Optional[CategoryTree] = None
+
+
+def _build_tree(rows) -> CategoryTree:
+    raw = {row.category_id: row for row in rows}
+
+    children_ids: Dict[int, List[int]] = {}
+    for row in raw.values():
+        if row.parent_id is not None:
+            children_ids.setdefault(row.parent_id, []).append(row.category_id)
+
+    breadcrumbs: Dict[int, Tuple[str, ...]] = {}
+
+    def get_breadcrumbs(category_id: int, seen=()) -> Tuple[str, ...]:
+        if category_id in breadcrumbs:
+            return breadcrumbs[category_id]
+        row = raw[category_id]
+        # Защита от циклов и ссылок на удаленного родителя
+        if row.parent_id in raw and row.parent_id not in seen:
+            result = get_breadcrumbs(row.parent_id, seen + (category_id,)) + (row.name,)
+        else:
+            result = (row.name,)
+        breadcrumbs[category_id] = result
+        return result
+
+    nodes = {}
+    children: Dict[Tuple[Optional[int], int], List[CategoryNode]] = {}
+    levels: Dict[int, List[CategoryNode]] = {}
+    for category_id in sorted(raw):
+        row = raw[category_id]
+        node = CategoryNode(
+            category_id=row.category_id,
+            name=row.name,
+            parent_id=row.parent_id,
+            level=row.level,
+            children_ids=tuple(children_ids.get(category_id, ())),
+            breadcrumbs=get_breadcrumbs(category_id)
+        )
+        nodes[category_id] = node
+        children.setdefault((row.parent_id, row.level), []).append(node)
+        levels.setdefault(row.level, []).append(node)
+
+    return CategoryTree(
+        nodes=MappingProxyType(nodes),
+        children=MappingProxyType({key: tuple(value) for key, value in children.items()}),
+        levels=MappingProxyType({key: tuple(value) for key, value in levels.items()})
+    )
+
+
+async def rebuild_category_tree(session: AsyncSession) -> CategoryTree:
+    """
+    Загрузка дерева категорий одним запросом
+
+    Args:
+        session: Сессия SQLAlchemy
+
+    Returns:
+        CategoryTree: Новый индекс категорий
+    """
+    global _tree
+
+    result = await session.execute(
+        select(Category.category_id, Category.name, Category.parent_id, Category.level)
+    )
+    _tree = _build_tree(result.all())
+    logger.debug(f"Category tree rebuilt: {len(_tree.nodes)} categories")
+    return _tree
+
+
+async def get_category_tree(session: AsyncSession) -> CategoryTree:
+    """
+    Индекс категорий (загружается при первом обращении)
+
+    Args:
+        session: Сессия SQLAlchemy (используется только для первой загрузки)
+
+    Returns:
+        CategoryTree: Индекс категорий
+    """
+    if _tree is None:
+        return await rebuild_category_tree(session)
+    return _tree
+
+
+def invalidate_category_tree():
+    """Сброс индекса категорий; он загрузится заново при следующем обращении"""
+    global _tree
+    _tree = None
+
+
+async def refresh_category_tree(session: AsyncSession):
+    """
+    Перестроение индекса после изменения категорий
+
+    При ошибке индекс сбрасывается и будет загружен при следующем обращении
+
+    Args:
+        session: Сессия SQLAlchemy
+    """
+    try:
+        await rebuild_category_tree(session)
+    except Exception as e:
+        logger.error(f"Error rebuilding category tree: {e}")
+        invalidate_category_tree()
+
+
+# ====================== СТАТЬИ ======================
+
+# Количество представлений статей в LRU-кэше
+ARTICLE_VIEW_CACHE_SIZE = 256
+
+# Ограничение Telegram на длину текста сообщения
+MESSAGE_MAX_LENGTH = 4096
+# Место под номер страницы в конце сообщения
+ARTICLE_PAGE_FOOTER_RESERVE = 40
+# Разделители, по которым делится текст: абзацы, строки, слова
+ARTICLE_PAGE_SEPARATORS = ("\n\n", "\n", " ")
+
+
+@dataclass(frozen=True, slots=True)
+class ArticleSummary:
+    """Статья в списке: без текста и связанных данных"""
+    article_id: int
+    title: str
+    category_id: Optional[int]
+
+
+def select_article_summaries():
+    """
+    Запрос списка статей без текста
+
+    К запросу можно добавлять where/join/order_by как к select(Article)
+
+    Returns:
+        Select: Запрос колонок для ArticleSummary
+    """
+    return select(Article.article_id, Article.title, Article.category_id)
+
+
+async def fetch_article_summaries(session: AsyncSession, query) -> List[ArticleSummary]:
+    """
+    Выполнение запроса из select_article_summaries
+
+    Args:
+        session: Сессия SQLAlchemy
+        query: Запрос из select_article_summaries
+
+    Returns:
+        List[ArticleSummary]: Статьи в порядке запроса
+    """
+    result = await session.execute(query)
+    return [
+        ArticleSummary(article_id=row.article_id, title=row.title, category_id=row.category_id)
+        for row in result
+    ]
+
+
+@dataclass(frozen=True, slots=True)
+class ArticleImageInfo:
+    image_id: int
+    file_id: str
+    file_unique_id: str
+    position: int
+
+
+@dataclass(frozen=True, slots=True)
+class ArticleTestInfo:
+    test_id: int
+    title: str
+    pass_threshold: int
+
+
+@dataclass(frozen=True, slots=True)
+class ArticleDetails:
+    article_id: int
+    title: str
+    content: str
+    category_id: Optional[int]
+    category_name: str
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    author: str
+    images: Tuple[ArticleImageInfo, ...]
+    tests: Tuple[ArticleTestInfo, ...]
+
+    @property
+    def test_id(self) -> Optional[int]:
+        """ID первого теста статьи (для кнопки «Пройти тест»)"""
+        return self.tests[0].test_id if self.tests else None
+
+
+@dataclass(frozen=True, slots=True)
+class ArticleView:
+    details: ArticleDetails
+    # Страницы текста статьи для отправки с parse_mode="HTML"
+    pages: Tuple[str, ...]
+
+    @property
+    def page_count(self) -> int:
+        return len(self.pages)
+
+    def get_page(self, page: int = 0) -> str:
+        """
+        Текст страницы статьи с номером страницы
+
+        Args:
+            page: Номер страницы (с нуля); выходящий за границы приводится к ближайшей
+
+        Returns:
+            str: Текст страницы (HTML)
+        """
+        page = min(max(page, 0), len(self.pages) - 1)
+        if len(self.pages) == 1:
+            return self.pages[0]
+        return f"{self.pages[page]}\n\n<i>Сторінка {page + 1} з {len(self.pages)}</i>"
+
+
+def _split_text(text: str, limit: int, separators: Sequence[str]) -> List[Tuple[str, bool]]:
+    """
+    Деление текста на куски, которые после экранирования не длиннее limit
+
+    Returns:
+        List[Tuple[str, bool]]: Экранированные куски и признак того, что кусок
+        начинается после разделителя текущего уровня (его можно склеить с
+        предыдущим)
+    """
+    escaped = html.escape(text, quote=False)
+    if len(escaped) <= limit:
+        return [(escaped, True)]
+
+    if not separators:
+        # Слово длиннее страницы - режем по символам, не разрезая HTML-сущности
+        chunks, chunk = [], ""
+        for char in text:
+            char = html.escape(char, quote=False)
+            if len(chunk) + len(char) > limit:
+                chunks.append((chunk, False))
+                chunk = ""
+            chunk += char
+        chunks.append((chunk, False))
+        chunks[0] = (chunks[0][0], True)
+        return chunks
+
+    separator, rest = separators[0], separators[1:]
+    pieces = []
+    for piece in text.split(separator):
+        parts = _split_text(piece, limit, rest)
+        pieces.append((parts[0][0], True))
+        pieces.extend((part, False) for part, _ in parts[1:])
+
+    # Жадно склеиваем соседние куски обратно через разделитель
+    chunks: List[Tuple[str, bool]] = []
+    for piece, joinable in pieces:
+        if chunks and joinable and len(chunks[-1][0]) + len(separator) + len(piece) <= limit:
+            chunks[-1] = (chunks[-1][0] + separator + piece, chunks[-1][1])
+        else:
+            chunks.append((piece, joinable if chunks else True))
+    return chunks
+
+
+def render_article_pages(title: str, content: str) -> Tuple[str, ...]:
+    """
+    Экранирование статьи и деление ее на страницы сообщения Telegram
+
+    Заголовок повторяется на каждой странице, место под номер страницы
+    зарезервировано
+
+    Args:
+        title: Название статьи
+        content: Текст статьи (обычный текст)
+
+    Returns:
+        Tuple[str, ...]: Страницы (HTML), хотя бы одна
+    """
+    header = f"<b>{html.escape(title, quote=False)}</b>\n\n"
+    limit = MESSAGE_MAX_LENGTH - len(header) - ARTICLE_PAGE_FOOTER_RESERVE
+
+    chunks = _split_text(content.strip(), limit, ARTICLE_PAGE_SEPARATORS)
+    pages = tuple(header + chunk.strip() for chunk, _ in chunks if chunk.strip())
+    return pages or (header.rstrip(),)
+
+
+# (article_id, updated_at) -> ArticleView
+_article_views: "OrderedDict[Tuple[int, Optional[datetime]], ArticleView]" = OrderedDict()
+
+
+async def load_article_details(session: AsyncSession, article_id: int) -> Optional[ArticleDetails]:
+    """
+    Загрузка статьи с категорией, автором, изображениями и тестами одним запросом
+
+    Args:
+        session: Сессия SQLAlchemy
+        article_id: ID статьи
+
+    Returns:
+        ArticleDetails: Данные статьи или None
+    """
+    result = await session.execute(
+        select(Article)
+        .where(Article.article_id == article_id)
+        .options(
+            joinedload(Article.category),
+            joinedload(Article.author),
+            joinedload(Article.images),
+            joinedload(Article.tests)
+        )
+    )
+    article = result.unique().scalar_one_or_none()
+    if article is None:
+        return None
+
+    author = article.author
+    return ArticleDetails(
+        article_id=article.article_id,
+        title=article.title,
+        content=article.content,
+        category_id=article.category_id,
+        category_name=article.category.name if article.category else "Без категорії",
+        created_at=article.created_at,
+        updated_at=article.updated_at,
+        author=f"{author.first_name} {author.last_name}" if author else "Невідомий",
+        images=tuple(
+            ArticleImageInfo(
+                image_id=image.image_id,
+                file_id=image.file_id,
+                file_unique_id=image.file_unique_id,
+                position=image.position
+            )
+            for image in sorted(article.images, key=lambda image: image.position)
+        ),
+        tests=tuple(
+            ArticleTestInfo(
+                test_id=test.test_id,
+                title=test.title,
+                pass_threshold=test.pass_threshold
+            )
+            for test in sorted(article.tests, key=lambda test: test.test_id)
+        )
+    )
+
+
+async def get_article_view(session: AsyncSession, article_id: int) -> Optional[ArticleView]:
+    """
+    Готовое представление статьи из LRU-кэша
+
+    Args:
+        session: Сессия SQLAlchemy
+        article_id: ID статьи
+
+    Returns:
+        ArticleView: Представление статьи или None, если статья не найдена
+    """
+    # Легкий запрос версии статьи
+    result = await session.execute(
+        select(Article.updated_at).where(Article.article_id == article_id)
+    )
+    version = result.first()
+    if version is None:
+        return None
+
+    key = (article_id, version.updated_at)
+    view = _article_views.get(key)
+    if view is not None:
+        _article_views.move_to_end(key)
+        return view
+
+    details = await load_article_details(session, article_id)
+    if details is None:
+        return None
+
+    view = ArticleView(
+        details=details,
+        pages=render_article_pages(details.title, details.content)
+    )
+
+    # Старые версии этой статьи больше не нужны
+    _forget_article_versions(article_id)
+    _article_views[(article_id, details.updated_at)] = view
+    while len(_article_views) > ARTICLE_VIEW_CACHE_SIZE:
+        _article_views.popitem(last=False)
+    return view
+
+
+def invalidate_article_view(article_id: Optional[int] = None):
+    """
+    Сброс кэшированных представлений статьи (или всех статей)
+
+    Args:
+        article_id: ID статьи; None - сбросить все
+    """
+    # Карточки инлайн-поиска содержат текст статьи
+    from bot.services.search import invalidate_inline_cache
+    invalidate_inline_cache()
+
+    if article_id is None:
+        _article_views.clear()
+        _article_media.clear()
+        return
+    _forget_article_versions(article_id)
+
+
+def _forget_article_versions(article_id: int):
+    for key in [key for key in _article_views if key[0] == article_id]:
+        del _article_views[key]
+    for key in [key for key in _article_media if key[0] == article_id]:
+        del _article_media[key]
+
+
+# ====================== ИЗОБРАЖЕНИЯ СТАТЕЙ ======================
+
+# Максимальное количество изображений в одном альбоме Telegram
+MEDIA_GROUP_MAX_SIZE = 10
+
+MediaGroups = Tuple[Tuple[InputMediaPhoto, ...], ...]
+
+# (article_id, updated_at, file_ids, caption) -> альбомы изображений
+_article_media: "OrderedDict[tuple, MediaGroups]" = OrderedDict()
+
+
+def build_media_groups(file_ids: Sequence[str], caption: Optional[str] = None) -> MediaGroups:
+    """
+    Разбиение изображений на альбомы не больше MEDIA_GROUP_MAX_SIZE
+
+    Альбомы выравниваются по размеру (11 изображений - 6 и 5), чтобы в
+    последнем не осталось одно изображение: альбом должен содержать от 2
+    до 10 элементов. Подпись добавляется только к первому изображению.
+
+    Args:
+        file_ids: file_id изображений в порядке отображения
+        caption: Подпись к первому изображению
+
+    Returns:
+        MediaGroups: Альбомы InputMediaPhoto
+    """
+    if not file_ids:
+        return ()
+
+    count = -(-len(file_ids) // MEDIA_GROUP_MAX_SIZE)
+    size = -(-len(file_ids) // count)
+
+    media = [
+        InputMediaPhoto(media=file_id, caption=caption if i == 0 and caption else None)
+        for i, file_id in enumerate(file_ids)
+    ]
+    return tuple(tuple(media[i:i + size]) for i in range(0, len(media), size))
+
+
+def get_article_media_groups(
+    article_id: int,
+    updated_at: Optional[datetime],
+    file_ids: Sequence[str],
+    caption: Optional[str] = None
+) -> MediaGroups:
+    """
+    Альбомы изображений статьи из LRU-кэша
+
+    Набор изображений входит в ключ: добавление и удаление изображения не
+    меняет updated_at статьи.
+
+    Args:
+        article_id: ID статьи
+        updated_at: Версия статьи
+        file_ids: file_id изображений в порядке отображения
+        caption: Подпись к первому изображению
+
+    Returns:
+        MediaGroups: Альбомы InputMediaPhoto
+    """
+    key = (article_id, updated_at, tuple(file_ids), caption)
+    groups = _article_media.get(key)
+    if groups is not None:
+        _article_media.move_to_end(key)
+        return groups
+
+    groups = build_media_groups(file_ids, caption)
+    _article_media[key] = groups
+    while len(_article_media) > ARTICLE_VIEW_CACHE_SIZE:
+        _article_media.popitem(last=False)
+    return groups
+
+
+async def send_media_groups(message: Message, groups: MediaGroups):
+    """
+    Отправка альбомов изображений в чат сообщения
+
+    Args:
+        message: Сообщение, в чат которого отправляются изображения
+        groups: Альбомы InputMediaPhoto
+    """
+    for group in groups:
+        if len(group) == 1:
+            # Альбом из одного изображения Telegram не принимает
+            await message.answer_photo(photo=group[0].media, caption=group[0].caption)
+        else:
+            await message.answer_media_group(media=list(group))
+
+
+async def send_article_images(message: Message, article: ArticleDetails, caption: Optional[str] = None):
+    """
+    Отправка изображений статьи альбомами
+
+    Args:
+        message: Сообщение, в чат которого отправляются изображения
+        article: Данные статьи
+        caption: Подпись к первому изображению
+    """
+    if not article.images:
+        return
+    groups = get_article_media_groups(
+        article.article_id,
+        article.updated_at,
+        [image.file_id for image in article.images],
+        caption
+    )
+    await send_media_groups(message, groups)
@@ -0,0 +1,187 @@
+"""
+Журнал действий администраторов.
+
+Записи AdminLog не пишутся в БД в транзакции действия администратора:
+queue_admin_log только ставит запись в очередь asyncio.Queue. Фоновая
+задача run_admin_log_writer записывает очередь пакетами (один INSERT с
+executemany), когда набирается ADMIN_LOG_BATCH_SIZE записей или проходит
+ADMIN_LOG_FLUSH_INTERVAL секунд, а при остановке бота записывает все, что
+осталось. flush_admin_logs записывает очередь немедленно (для тестов и
+для мест, которым нужна запись в журнале до продолжения работы).
+
+Если пакет нарушает ограничения БД, записи пишутся по одной: запись
+администратора, которого нет в users (ADMIN_IDS без /start, --author-id
+импорта), сохраняется с admin_id = NULL, остальные ошибочные записи
+отбрасываются. При недоступной БД запись возвращается в очередь не более
+ADMIN_LOG_MAX_ATTEMPTS раз, поэтому одна запись не блокирует журнал.
+"""
+
+import asyncio
+from datetime import datetime
+from time import monotonic
+from typing import List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from bot.config import ADMIN_LOG_BATCH_SIZE, ADMIN_LOG_FLUSH_INTERVAL, ADMIN_LOG_MAX_ATTEMPTS
+from bot.database.models import AdminLog
+from bot.utils.logger import logger
+
+# Записи журнала, еще не записанные в БД
+_admin_log_queue: "asyncio.Queue[dict]" = asyncio.Queue()
+# Не даем фоновой задаче и flush_admin_logs писать один пакет одновременно
+_write_lock = asyncio.Lock()
+
+
+def queue_admin_log(admin_id: int, action_type: str, entity_type: str, entity_id: int = None, details=None):
+    """
+    Постановка записи журнала действий администратора в очередь (без обращения к БД)
+
+    Args:
+        admin_id: ID администратора
+        action_type: Тип действия (ADD, EDIT, DELETE, SEND, VIEW)
+        entity_type: Тип сущности (ARTICLE, TEST, CITY, STORE, CATEGORY)
+        entity_id: ID сущности (опционально)
+        details: Дополнительные детали (опционально)
+    """
+    _admin_log_queue.put_nowait({
+        "admin_id": admin_id,
+        "action_type": action_type,
+        "entity_type": entity_type,
+        "entity_id": entity_id,
+        "details": details,
+        # Время действия, а не время записи пакета
+        "created_at": datetime.utcnow()
+    })
+
+
+def pending_admin_logs() -> int:
+    """Количество записей журнала в очереди"""
+    return _admin_log_queue.qsize()
+
+
+def _take_batch(limit: int) -> List[dict]:
+    rows = []
+    while len(rows) < limit and not _admin_log_queue.empty():
+        rows.append(_admin_log_queue.get_nowait())
+    return rows
+
+
+def _requeue(rows: List[dict]):
+    """Возврат записей в очередь для следующей попытки (не более ADMIN_LOG_MAX_ATTEMPTS раз)"""
+    for row in rows:
+        attempts = row.get("attempts", 0) + 1
+        if attempts >= ADMIN_LOG_MAX_ATTEMPTS:
+            logger.error(f"Dropping admin log record after {attempts} attempts: {row}")
+            continue
+        _admin_log_queue.put_nowait({**row, "attempts": attempts})
+
+
+async def _insert_rows(rows: List[dict]):
+    from bot.database.database import AsyncSessionLocal
+
+    # Счетчик попыток хранится только в очереди
+    values = [{key: value for key, value in row.items() if key != "attempts"} for row in rows]
+    async with AsyncSessionLocal() as session:
+        await session.execute(insert(AdminLog), values)
+        await session.commit()
+
+
+async def _write_rows_one_by_one(rows: List[dict]) -> Optional[int]:
+    """Запись пакета по одной записи после ошибки целостности"""
+    written = 0
+    for index, row in enumerate(rows):
+        try:
+            try:
+                await _insert_rows([row])
+            except IntegrityError:
+                if row["admin_id"] is None:
+                    raise
+                # Администратора нет в users - сохраняем действие без ссылки на него
+                logger.warning(f"Admin {row['admin_id']} not found in users, logging action without admin_id: {row}")
+                await _insert_rows([{**row, "admin_id": None}])
+            written += 1
+        except IntegrityError as e:
+            logger.error(f"Dropping invalid admin log record {row}: {e}")
+        except Exception as e:
+            logger.error(f"Error writing admin log record: {e}")
+            _requeue(rows[index:])
+            return None
+    return written
+
+
+async def _write_batch(rows: List[dict]) -> Optional[int]:
+    """
+    Запись пакета журнала одним INSERT
+
+    Returns:
+        Optional[int]: Количество записанных записей или None, если БД недоступна
+    """
+    try:
+        await _insert_rows(rows)
+        return len(rows)
+    except IntegrityError as e:
+        logger.warning(f"Admin log batch of {len(rows)} records rejected, writing one by one: {e}")
+        return await _write_rows_one_by_one(rows)
+    except Exception as e:
+        logger.error(f"Error writing {len(rows)} admin log records: {e}")
+        _requeue(rows)
+        return None
+
+
+async def flush_admin_logs() -> int:
+    """
+    Немедленная запись всей очереди журнала в БД
+
+    Returns:
+        int: Количество записанных записей
+    """
+    written = 0
+    async with _write_lock:
+        # Записываем только то, что было в очереди на момент вызова
+        remaining = _admin_log_queue.qsize()
+        while remaining > 0:
+            rows = _take_batch(min(ADMIN_LOG_BATCH_SIZE, remaining))
+            if not rows:
+                break
+            remaining -= len(rows)
+            batch_written = await _write_batch(rows)
+            if batch_written is None:
+                break
+            written += batch_written
+    return written
+
+
+async def run_admin_log_writer(batch_size: int = ADMIN_LOG_BATCH_SIZE, interval: float = ADMIN_LOG_FLUSH_INTERVAL):
+    """
+    Фоновая задача: записывает журнал действий администраторов пакетами
+
+    Args:
+        batch_size: Размер пакета, при котором он записывается сразу
+        interval: Максимальное время ожидания неполного пакета в секундах
+    """
+    rows: List[dict] = []
+    try:
+        while True:
+            rows.append(await _admin_log_queue.get())
+            deadline = monotonic() + interval
+            while len(rows) < batch_size:
+                timeout = deadline - monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    rows.append(await asyncio.wait_for(_admin_log_queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            batch, rows = rows, []
+            async with _write_lock:
+                if await _write_batch(batch) is None:
+                    # БД недоступна - не повторяем запись сразу
+                    await asyncio.sleep(interval)
+    finally:
+        # При остановке бота записываем собранный пакет и остаток очереди
+        if rows:
+            await _write_batch(rows)
+        await flush_admin_logs()
@@ -0,0 +1,605 @@
+"""
+Движок массовых рассылок с ограничением скорости.
+
+Сообщения отправляются фоновой задачей ограниченным числом параллельных
+воркеров. Общая скорость ограничивается глобальным token bucket (лимит
+Telegram около 30 сообщений в секунду на бота), а частота сообщений в
+один чат - отдельным ограничителем. TelegramRetryAfter приостанавливает
+всю рассылку на указанное время, временные ошибки сети и сервера
+повторяются с экспоненциальной задержкой.
+"""
+
+import asyncio
+import random
+from dataclasses import dataclass
+from datetime import datetime
+from time import monotonic
+from typing import AsyncIterable, Awaitable, Callable, Dict, Iterable, Optional, Set, Union
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest, TelegramForbiddenError, TelegramNetworkError,
+    TelegramNotFound, TelegramRetryAfter, TelegramServerError
+)
+
+from sqlalchemy import Integer, and_, case, false, func, insert, literal, select, true, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import BROADCAST_RATE, BROADCAST_CONCURRENCY, BROADCAST_MAX_RETRIES
+from bot.services.audit import queue_admin_log
+from bot.utils.logger import logger
+
+# Минимальный интервал между сообщениями в один чат (секунды)
+PER_CHAT_INTERVAL = 1.0
+# Границы экспоненциальной задержки при временных ошибках (секунды)
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+# Как часто обновлять сообщение с прогрессом рассылки (секунды)
+PROGRESS_INTERVAL = 3.0
+
+
+class TokenBucket:
+    """
+    Token bucket: не более rate операций в секунду со всплесками до capacity
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated_at = monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """Ожидание свободного токена"""
+        async with self._lock:
+            while True:
+                now = monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Приостановка выдачи токенов (например, по TelegramRetryAfter)"""
+        self._paused_until = max(self._paused_until, monotonic() + seconds)
+        self._tokens = 0
+
+
+class PerChatLimiter:
+    """
+    Ограничитель частоты сообщений в один чат
+    """
+
+    def __init__(self, interval: float = PER_CHAT_INTERVAL):
+        self.interval = interval
+        self._next_allowed: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        """Ожидание, пока в чат снова можно отправить сообщение"""
+        now = monotonic()
+        allowed_at = max(now, self._next_allowed.get(chat_id, 0.0))
+        self._next_allowed[chat_id] = allowed_at + self.interval
+
+        # Чистим устаревшие записи, чтобы словарь не рос бесконечно
+        if len(self._next_allowed) > 10000:
+            self._next_allowed = {
+                cid: ts for cid, ts in self._next_allowed.items() if ts > now
+            }
+
+        if allowed_at > now:
+            await asyncio.sleep(allowed_at - now)
+
+
+# Общие для всех рассылок ограничители: лимит Telegram действует на весь бот
+global_bucket = TokenBucket(BROADCAST_RATE)
+chat_limiter = PerChatLimiter()
+
+# Ссылки на фоновые задачи, чтобы их не собрал сборщик мусора
+_background_tasks: Set[asyncio.Task] = set()
+
+
+@dataclass(slots=True)
+class BroadcastResult:
+    total: int = 0
+    sent: int = 0
+    failed: int = 0
+
+
+def spawn_background(coro: Awaitable, name: str = None) -> asyncio.Task:
+    """
+    Запуск корутины фоновой задачей с сохранением ссылки на нее
+
+    Args:
+        coro: Корутина
+        name: Имя задачи
+
+    Returns:
+        asyncio.Task: Запущенная задача
+    """
+    task = asyncio.create_task(coro, name=name)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+    return task
+
+
+async def send_message_limited(bot: Bot, chat_id: int, text: str, parse_mode: str = "HTML",
+                               max_retries: int = BROADCAST_MAX_RETRIES) -> bool:
+    """
+    Отправка сообщения с учетом лимитов Telegram и повторами при временных ошибках
+
+    Args:
+        bot: Экземпляр бота
+        chat_id: ID чата
+        text: Текст сообщения
+        parse_mode: Режим разметки
+        max_retries: Максимальное количество повторов при ошибках сети и сервера
+            (ожидание flood control повтором не считается)
+
+    Returns:
+        bool: True если сообщение доставлено, иначе False
+    """
+    retries = 0
+    while True:
+        await chat_limiter.wait(chat_id)
+        await global_bucket.acquire()
+
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+            return True
+        except TelegramRetryAfter as e:
+            # Telegram просит подождать - приостанавливаем всю рассылку и
+            # отправляем это же сообщение после паузы
+            logger.warning(f"Flood control при отправке в чат {chat_id}: пауза {e.retry_after} с")
+            global_bucket.pause(e.retry_after)
+        except (TelegramForbiddenError, TelegramNotFound, TelegramBadRequest) as e:
+            # Пользователь заблокировал бота или чат недоступен - повтор не поможет
+            logger.warning(f"Сообщение в чат {chat_id} не доставлено: {e}")
+            return False
+        except (TelegramNetworkError, TelegramServerError) as e:
+            if retries >= max_retries:
+                logger.error(f"Сообщение в чат {chat_id} не доставлено после {max_retries} повторов: {e}")
+                return False
+            delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** retries) * random.uniform(0.5, 1.0)
+            retries += 1
+            logger.warning(f"Временная ошибка при отправке в чат {chat_id}: {e}. Повтор через {delay:.1f} с")
+            await asyncio.sleep(delay)
+
+
+async def _iterate(chat_ids: Union[Iterable[int], AsyncIterable[int]]):
+    if hasattr(chat_ids, "__aiter__"):
+        async for chat_id in chat_ids:
+            yield chat_id
+    else:
+        for chat_id in chat_ids:
+            yield chat_id
+
+
+async def broadcast(
+    bot: Bot,
+    chat_ids: Union[Iterable[int], AsyncIterable[int]],
+    text: str,
+    parse_mode: str = "HTML",
+    concurrency: int = BROADCAST_CONCURRENCY,
+    on_result: Callable[[int, bool], Awaitable[None]] = None,
+    on_progress: Callable[[BroadcastResult], Awaitable[None]] = None
+) -> BroadcastResult:
+    """
+    Рассылка сообщения списку чатов ограниченным числом параллельных воркеров
+
+    Args:
+        bot: Экземпляр бота
+        chat_ids: ID чатов получателей (обычный или асинхронный итератор)
+        text: Текст сообщения
+        parse_mode: Режим разметки
+        concurrency: Количество параллельных отправок
+        on_result: Вызывается после каждой отправки с (chat_id, доставлено ли)
+        on_progress: Вызывается не чаще раза в PROGRESS_INTERVAL секунд
+
+    Returns:
+        BroadcastResult: Итоги рассылки
+    """
+    result = BroadcastResult()
+    queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    last_progress = monotonic()
+
+    async def worker():
+        nonlocal last_progress
+        while True:
+            chat_id = await queue.get()
+            try:
+                if chat_id is None:
+                    return
+
+                ok = await send_message_limited(bot, chat_id, text, parse_mode)
+                if ok:
+                    result.sent += 1
+                else:
+                    result.failed += 1
+
+                if on_result:
+                    await on_result(chat_id, ok)
+
+                if on_progress and monotonic() - last_progress >= PROGRESS_INTERVAL:
+                    last_progress = monotonic()
+                    await on_progress(result)
+            except Exception as e:
+                logger.error(f"Ошибка воркера рассылки (чат {chat_id}): {e}")
+            finally:
+                queue.task_done()
+
+    workers = [asyncio.create_task(worker()) for _ in range(concurrency)]
+    try:
+        async for chat_id in _iterate(chat_ids):
+            result.total += 1
+            await queue.put(chat_id)
+    finally:
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    return result
+
+
+# ---------------------------------------------------------------------------
+# Outbox объявлений
+#
+# Записи AnnouncementDelivery для всех получателей создаются сразу при
+# отправке объявления, а воркер отправляет их пачками. Ожидающими отправки
+# считаются записи с is_delivered = False и пустым delivered_at: при
+# неустранимой ошибке заполняется только delivered_at, чтобы запись больше
+# не отправлялась. После перезапуска бота незавершенные рассылки
+# продолжаются с того же места.
+# ---------------------------------------------------------------------------
+
+# Размер страницы чтения outbox
+OUTBOX_BATCH_SIZE = 100
+# Статусы фиксируются пачками не больше OUTBOX_STATUS_BATCH_SIZE и не реже
+# раза в OUTBOX_STATUS_FLUSH_INTERVAL секунд: после падения бота повторно
+# отправляются только сообщения из незафиксированной пачки
+OUTBOX_STATUS_BATCH_SIZE = 10
+OUTBOX_STATUS_FLUSH_INTERVAL = 1.0
+
+# Активные воркеры рассылок по ID объявления
+_active_broadcasts: Dict[int, asyncio.Task] = {}
+
+
+@dataclass(frozen=True, slots=True)
+class OutboxProgress:
+    total: int
+    delivered: int
+    failed: int
+    pending: int
+
+
+def _pending_condition(announcement_id: int = None):
+    from bot.database.models import AnnouncementDelivery
+
+    condition = and_(
+        AnnouncementDelivery.is_delivered == False,
+        AnnouncementDelivery.delivered_at.is_(None)
+    )
+    if announcement_id is not None:
+        condition = and_(condition, AnnouncementDelivery.announcement_id == announcement_id)
+    return condition
+
+
+def get_recipients_condition(recipients_type: str, city_id: int = None, store_id: int = None,
+                             target_user_id: int = None):
+    """
+    Условие выбора получателей объявления по типу рассылки
+
+    Args:
+        recipients_type: Тип получателей (all, by_city, by_store, by_user)
+        city_id: ID города для by_city
+        store_id: ID магазина для by_store
+        target_user_id: ID пользователя для by_user
+
+    Returns:
+        Условие для User или None, если тип получателей неизвестен
+    """
+    from bot.database.models import User
+
+    if recipients_type == "all":
+        return true()
+    elif recipients_type == "by_city":
+        return User.city_id == city_id
+    elif recipients_type == "by_store":
+        return User.store_id == store_id
+    elif recipients_type == "by_user":
+        return User.user_id == target_user_id
+    return None
+
+
+async def enqueue_announcement(session: AsyncSession, announcement_id: int, recipients_condition) -> int:
+    """
+    Запись получателей объявления в outbox одним INSERT ... SELECT из users
+
+    Args:
+        session: Сессия базы данных
+        announcement_id: ID объявления
+        recipients_condition: Условие выбора получателей (см. get_recipients_condition)
+
+    Returns:
+        int: Количество добавленных записей
+    """
+    from bot.database.models import AnnouncementDelivery, User
+
+    if recipients_condition is None:
+        return 0
+
+    result = await session.execute(
+        insert(AnnouncementDelivery).from_select(
+            ["announcement_id", "user_id", "is_delivered"],
+            select(
+                literal(announcement_id, Integer),
+                User.user_id,
+                false()
+            ).where(recipients_condition)
+        )
+    )
+    await session.commit()
+    return result.rowcount
+
+
+async def get_outbox_progress(session: AsyncSession, announcement_id: int) -> OutboxProgress:
+    """
+    Прогресс рассылки объявления
+
+    Args:
+        session: Сессия базы данных
+        announcement_id: ID объявления
+
+    Returns:
+        OutboxProgress: Количество всех, доставленных, неудачных и ожидающих записей
+    """
+    from bot.database.models import AnnouncementDelivery
+
+    delivered = AnnouncementDelivery.is_delivered == True
+    failed = and_(AnnouncementDelivery.is_delivered == False, AnnouncementDelivery.delivered_at.isnot(None))
+
+    row = (await session.execute(
+        select(
+            func.count(),
+            func.coalesce(func.sum(case((delivered, 1), else_=0)), 0),
+            func.coalesce(func.sum(case((failed, 1), else_=0)), 0)
+        )
+        .select_from(AnnouncementDelivery)
+        .where(AnnouncementDelivery.announcement_id == announcement_id)
+    )).one()
+
+    total, delivered_count, failed_count = row
+    return OutboxProgress(
+        total=total,
+        delivered=delivered_count,
+        failed=failed_count,
+        pending=total - delivered_count - failed_count
+    )
+
+
+async def drain_announcement(
+    bot: Bot,
+    announcement_id: int,
+    recipients_type: str = None,
+    progress_chat_id: int = None,
+    progress_message_id: int = None
+) -> Optional[OutboxProgress]:
+    """
+    Отправка всех ожидающих записей outbox объявления пачками
+
+    Args:
+        bot: Экземпляр бота
+        announcement_id: ID объявления
+        recipients_type: Тип получателей (для лога)
+        progress_chat_id: Чат сообщения с прогрессом
+        progress_message_id: ID сообщения с прогрессом
+
+    Returns:
+        Optional[OutboxProgress]: Итоговый прогресс или None, если объявление не найдено
+    """
+    from bot.database.database import AsyncSessionLocal
+    from bot.database.models import Announcement, AnnouncementDelivery
+    from bot.keyboards.admin_kb import get_admin_menu_kb
+
+    async def report(text: str, reply_markup=None):
+        if progress_chat_id is None or progress_message_id is None:
+            return
+        try:
+            await bot.edit_message_text(
+                text=text,
+                chat_id=progress_chat_id,
+                message_id=progress_message_id,
+                reply_markup=reply_markup
+            )
+        except Exception as e:
+            logger.warning(f"Не удалось обновить прогресс рассылки {announcement_id}: {e}")
+
+    async with AsyncSessionLocal() as session, AsyncSessionLocal() as reader:
+        announcement = await session.get(Announcement, announcement_id)
+        if not announcement:
+            logger.warning(f"Объявление {announcement_id} для рассылки не найдено")
+            return None
+
+        text = f"<b>{announcement.title}</b>\n\n{announcement.content}"
+        admin_id = announcement.created_by
+
+        # Итоги считаем одним COUNT при старте, дальше ведем счетчики в памяти
+        initial = await get_outbox_progress(session, announcement_id)
+        delivered = initial.delivered
+        failed = initial.failed
+
+        delivery_ids: Dict[int, int] = {}
+        statuses = []
+        write_lock = asyncio.Lock()
+
+        async def recipients():
+            # Получателей читаем страницами по ключу (только delivery_id и user_id)
+            # и сразу передаем воркерам, не дожидаясь окончания предыдущей страницы
+            last_id = 0
+            while True:
+                page = (await reader.execute(
+                    select(AnnouncementDelivery.delivery_id, AnnouncementDelivery.user_id)
+                    .where(
+                        _pending_condition(announcement_id),
+                        AnnouncementDelivery.delivery_id > last_id
+                    )
+                    .order_by(AnnouncementDelivery.delivery_id)
+                    .limit(OUTBOX_BATCH_SIZE)
+                )).all()
+                if not page:
+                    return
+
+                for delivery_id, user_id in page:
+                    delivery_ids[user_id] = delivery_id
+                    yield user_id
+                last_id = page[-1].delivery_id
+
+        async def flush_statuses() -> bool:
+            nonlocal statuses
+            async with write_lock:
+                if not statuses:
+                    return True
+                batch, statuses = statuses, []
+                try:
+                    # Статусы пачки записываем одним executemany UPDATE по первичному ключу
+                    await session.execute(update(AnnouncementDelivery), batch)
+                    await session.commit()
+                    return True
+                except Exception as e:
+                    # Незаписанные статусы вернули бы получателей в очередь и
+                    # сообщения ушли бы повторно - оставляем их для следующей записи
+                    await session.rollback()
+                    statuses = batch + statuses
+                    logger.error(f"Не удалось сохранить статусы рассылки {announcement_id}: {e}")
+                    return False
+
+        async def flush_periodically():
+            # Статусы фиксируются и тогда, когда отправка стоит (TelegramRetryAfter)
+            while True:
+                await asyncio.sleep(OUTBOX_STATUS_FLUSH_INTERVAL)
+                await flush_statuses()
+
+        async def on_result(user_id: int, ok: bool):
+            nonlocal delivered, failed
+            if ok:
+                delivered += 1
+            else:
+                failed += 1
+
+            # Неустранимая ошибка: заполняем только delivered_at, запись больше не отправляется
+            statuses.append({
+                "delivery_id": delivery_ids.pop(user_id),
+                "is_delivered": ok,
+                "delivered_at": datetime.utcnow()
+            })
+            if len(statuses) >= OUTBOX_STATUS_BATCH_SIZE:
+                await flush_statuses()
+
+        async def on_progress(_: BroadcastResult):
+            await report(
+                f"Відправлення оголошення... Відправлено: {delivered}/{initial.total}"
+            )
+
+        flusher = asyncio.create_task(flush_periodically())
+        try:
+            await broadcast(bot, recipients(), text, on_result=on_result, on_progress=on_progress)
+        finally:
+            flusher.cancel()
+            await asyncio.gather(flusher, return_exceptions=True)
+
+        # Последние статусы повторяем: после выхода из функции они были бы потеряны
+        for _ in range(BROADCAST_MAX_RETRIES):
+            if await flush_statuses():
+                break
+            await asyncio.sleep(OUTBOX_STATUS_FLUSH_INTERVAL)
+
+        progress = OutboxProgress(
+            total=initial.total,
+            delivered=delivered,
+            failed=failed,
+            pending=initial.total - delivered - failed
+        )
+
+    # Логируем действие администратора
+    queue_admin_log(
+        admin_id=admin_id,
+        action_type="SEND",
+        entity_type="ANNOUNCEMENT",
+        entity_id=announcement_id,
+        details={
+            "recipients_type": recipients_type,
+            "users_count": progress.total,
+            "delivered_count": progress.delivered
+        }
+    )
+
+    logger.info(f"Рассылка объявления {announcement_id} завершена: {progress.delivered}/{progress.total}")
+    await report(
+        f"Оголошення успішно відправлено {progress.delivered} користувачам.",
+        reply_markup=get_admin_menu_kb()
+    )
+    return progress
+
+
+def start_announcement_broadcast(bot: Bot, announcement_id: int, **kwargs) -> asyncio.Task:
+    """
+    Запуск воркера рассылки объявления, если он еще не запущен
+
+    Args:
+        bot: Экземпляр бота
+        announcement_id: ID объявления
+        **kwargs: Параметры drain_announcement
+
+    Returns:
+        asyncio.Task: Задача воркера
+    """
+    task = _active_broadcasts.get(announcement_id)
+    if task and not task.done():
+        return task
+
+    task = spawn_background(
+        drain_announcement(bot, announcement_id, **kwargs),
+        name=f"announcement-{announcement_id}"
+    )
+    _active_broadcasts[announcement_id] = task
+    task.add_done_callback(lambda _: _active_broadcasts.pop(announcement_id, None))
+    return task
+
+
+async def resume_pending_broadcasts(bot: Bot) -> int:
+    """
+    Продолжение незавершенных рассылок после перезапуска бота
+
+    Args:
+        bot: Экземпляр бота
+
+    Returns:
+        int: Количество возобновленных рассылок
+    """
+    from bot.database.database import AsyncSessionLocal
+    from bot.database.models import AnnouncementDelivery
+
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(
+            select(AnnouncementDelivery.announcement_id)
+            .where(_pending_condition())
+            .distinct()
+        )
+        announcement_ids = result.scalars().all()
+
+    for announcement_id in announcement_ids:
+        logger.info(f"Возобновление рассылки объявления {announcement_id}")
+        start_announcement_broadcast(bot, announcement_id)
+
+    return len(announcement_ids)
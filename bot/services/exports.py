@@ -0,0 +1,199 @@
+"""
+Выгрузка результатов тестов в CSV или XLSX.
+
+Попытки тестов с данными пользователя, города, магазина и теста читаются
+потоком (AsyncSession.stream с yield_per - на PostgreSQL это серверный
+курсор) и пакетами дописываются во временный файл. В памяти одновременно
+находится не больше EXPORT_BATCH_SIZE строк, сколько бы попыток ни было.
+Текстовые ячейки, которые Excel принял бы за формулу (имя и фамилия вводятся
+пользователем при регистрации), экранируются апострофом.
+Для XLSX используется режим write_only библиотеки openpyxl (необязательная
+зависимость).
+"""
+
+import asyncio
+import csv
+import importlib.util
+import os
+import tempfile
+from datetime import datetime
+from typing import AsyncIterator, Optional, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.models import TestAttempt, User, City, Store, Test
+from bot.utils.logger import logger
+
+# Количество строк, читаемых из БД и записываемых в файл за один раз
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = (
+    "Дата", "Місто", "Магазин", "Прізвище", "Ім'я", "Telegram ID", "Тест", "Бал", "Пройдено"
+)
+
+# Начало ячейки, при котором Excel вычисляет ее как формулу
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+# openpyxl нужен только для выгрузки в XLSX
+XLSX_AVAILABLE = importlib.util.find_spec("openpyxl") is not None
+
+EXPORT_FORMATS = ("csv", "xlsx") if XLSX_AVAILABLE else ("csv",)
+
+
+def build_results_query(city_id: Optional[int] = None, store_id: Optional[int] = None, test_id: Optional[int] = None):
+    """
+    Запрос результатов тестов с фильтрами
+
+    Args:
+        city_id: ID города (None - все города)
+        store_id: ID магазина (None - все магазины)
+        test_id: ID теста (None - все тесты)
+
+    Returns:
+        Select: Запрос строк выгрузки в порядке прохождения
+    """
+    query = (
+        select(
+            TestAttempt.created_at,
+            City.name,
+            Store.name,
+            User.last_name,
+            User.first_name,
+            User.user_id,
+            Test.title,
+            TestAttempt.score,
+            TestAttempt.is_passed
+        )
+        .join(User, User.user_id == TestAttempt.user_id)
+        .outerjoin(City, City.city_id == User.city_id)
+        .outerjoin(Store, Store.store_id == User.store_id)
+        # Попытки удаленных тестов остаются с test_id = NULL
+        .outerjoin(Test, Test.test_id == TestAttempt.test_id)
+        .order_by(TestAttempt.attempt_id)
+    )
+
+    if city_id is not None:
+        query = query.where(User.city_id == city_id)
+    if store_id is not None:
+        query = query.where(User.store_id == store_id)
+    if test_id is not None:
+        query = query.where(TestAttempt.test_id == test_id)
+
+    return query
+
+
+def _escape_text(value: Optional[str]) -> str:
+    """Текст ячейки, который Excel не выполнит как формулу (CSV/formula injection)"""
+    if value and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value or ""
+
+
+async def iter_result_batches(session: AsyncSession, query) -> AsyncIterator[list]:
+    """
+    Потоковое чтение результатов пакетами по EXPORT_BATCH_SIZE строк
+
+    Args:
+        session: Сессия SQLAlchemy
+        query: Запрос из build_results_query
+
+    Yields:
+        list: Строки пакета, готовые к записи в файл
+    """
+    result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+    async for partition in result.partitions():
+        yield [
+            (
+                created_at,
+                _escape_text(city),
+                _escape_text(store),
+                _escape_text(last_name),
+                _escape_text(first_name),
+                user_id,
+                _escape_text(test) or "Видалений тест",
+                score,
+                "Так" if is_passed else "Ні"
+            )
+            for created_at, city, store, last_name, first_name, user_id, test, score, is_passed in partition
+        ]
+
+
+async def _write_csv(path: str, batches: AsyncIterator[list]) -> int:
+    count = 0
+    # utf-8-sig и ";" - чтобы файл открывался в Excel без настройки импорта
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(EXPORT_COLUMNS)
+        async for rows in batches:
+            writer.writerows(
+                (row[0].strftime("%d.%m.%Y %H:%M") if row[0] else "",) + row[1:]
+                for row in rows
+            )
+            count += len(rows)
+    return count
+
+
+async def _write_xlsx(path: str, batches: AsyncIterator[list]) -> int:
+    from openpyxl import Workbook
+
+    # write_only: строки сразу сбрасываются во временный файл книги
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Результати")
+    sheet.append(EXPORT_COLUMNS)
+
+    count = 0
+    async for rows in batches:
+        for row in rows:
+            sheet.append(row)
+        count += len(rows)
+
+    # Упаковка книги - блокирующая операция, выполняем вне цикла событий
+    await asyncio.to_thread(workbook.save, path)
+    return count
+
+
+async def export_test_results(
+    session: AsyncSession,
+    file_format: str = "csv",
+    city_id: Optional[int] = None,
+    store_id: Optional[int] = None,
+    test_id: Optional[int] = None
+) -> Tuple[str, int]:
+    """
+    Выгрузка результатов тестов во временный файл
+
+    Файл нужно удалить после отправки.
+
+    Args:
+        session: Сессия SQLAlchemy
+        file_format: "csv" или "xlsx"
+        city_id: ID города (None - все города)
+        store_id: ID магазина (None - все магазины)
+        test_id: ID теста (None - все тесты)
+
+    Returns:
+        Tuple[str, int]: Путь к файлу и количество выгруженных строк
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {file_format}")
+
+    fd, path = tempfile.mkstemp(prefix="test_results_", suffix=f".{file_format}")
+    os.close(fd)
+
+    query = build_results_query(city_id=city_id, store_id=store_id, test_id=test_id)
+    writer = _write_xlsx if file_format == "xlsx" else _write_csv
+
+    try:
+        count = await writer(path, iter_result_batches(session, query))
+    except Exception:
+        os.remove(path)
+        raise
+
+    logger.info(f"Exported {count} test results to {path} ({os.path.getsize(path)} bytes)")
+    return path, count
+
+
+def get_export_filename(file_format: str) -> str:
+    """Имя файла выгрузки для пользователя"""
+    return f"test_results_{datetime.now().strftime('%Y%m%d_%H%M')}.{file_format}"
@@ -0,0 +1,489 @@
+"""
+Массовый импорт библиотеки знаний из JSON или CSV.
+
+Категории, статьи, тесты, вопросы и ответы загружаются одной транзакцией:
+на каждый уровень иерархии выполняется один SELECT существующих записей,
+один INSERT (executemany) для новых и один UPDATE (executemany) для
+измененных. Записи сопоставляются по естественным ключам, поэтому
+повторный импорт того же файла ничего не дублирует:
+
+    категория - (родитель, уровень, название)
+    статья    - (категория, заголовок)
+    тест      - (статья, название)
+    вопрос    - (тест, текст вопроса)
+    ответ     - (вопрос, текст ответа)
+
+Формат JSON - вложенные объекты:
+
+    {"categories": [{"name": "...", "children": [...], "articles": [
+        {"title": "...", "content": "...", "tests": [
+            {"title": "...", "pass_threshold": 80, "questions": [
+                {"text": "...", "points": 1, "answers": [
+                    {"text": "...", "is_correct": true}]}]}]}]}]}
+
+Формат CSV - одна строка на ответ (или на статью без тестов) с колонками
+category_1, category_2, category_3, article_title, article_content,
+test_title, pass_threshold, question_text, points, answer_text, is_correct.
+
+Запуск из командной строки:
+
+    python -m bot.services.library_import library.json --dry-run
+
+Импорт увеличивает версию библиотеки (bot/services/library_version.py),
+поэтому запущенный бот сбрасывает кэши статей и тестов в течение
+LIBRARY_VERSION_CHECK_INTERVAL секунд.
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+from dataclasses import dataclass, field, asdict
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, insert, update, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.models import Category, Article, Test, Question, Answer
+from bot.services.library_version import bump_library_version, invalidate_library_caches
+from bot.utils.logger import logger
+
+# Максимальная глубина дерева категорий (тип товара, категория, группа товаров)
+MAX_CATEGORY_LEVEL = 3
+# Ограничение длины текста статьи, как при редактировании через бота
+ARTICLE_MAX_LENGTH = 4000
+
+CSV_COLUMNS = (
+    "category_1", "category_2", "category_3",
+    "article_title", "article_content",
+    "test_title", "pass_threshold",
+    "question_text", "points",
+    "answer_text", "is_correct"
+)
+
+
+@dataclass(slots=True)
+class ImportCounts:
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+
+@dataclass(slots=True)
+class ImportResult:
+    dry_run: bool
+    categories: ImportCounts = field(default_factory=ImportCounts)
+    articles: ImportCounts = field(default_factory=ImportCounts)
+    tests: ImportCounts = field(default_factory=ImportCounts)
+    questions: ImportCounts = field(default_factory=ImportCounts)
+    answers: ImportCounts = field(default_factory=ImportCounts)
+
+    def as_dict(self) -> dict:
+        return asdict(self)
+
+
+@dataclass(slots=True)
+class _Item:
+    # Естественный ключ внутри родителя
+    key: str
+    # Поля, которые обновляются у существующей записи
+    values: dict
+    # Вложенные элементы по типу: "children", "articles", "tests", ...
+    children: Dict[str, list]
+    id: Optional[int] = None
+
+
+# ====================== ЧТЕНИЕ ФАЙЛОВ ======================
+
+def _parse_bool(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ("1", "true", "yes", "y", "+", "так", "да")
+
+
+def _get_or_add(items: list, key_field: str, key: str) -> dict:
+    for item in items:
+        if item[key_field] == key:
+            return item
+    item = {key_field: key}
+    items.append(item)
+    return item
+
+
+def read_csv_bundle(path: str) -> List[dict]:
+    """
+    Чтение CSV в дерево категорий формата JSON
+
+    Args:
+        path: Путь к CSV-файлу (UTF-8, первая строка - заголовки колонок)
+
+    Returns:
+        List[dict]: Категории верхнего уровня
+    """
+    categories: List[dict] = []
+
+    with open(path, encoding="utf-8-sig", newline="") as f:
+        reader = csv.DictReader(f)
+        missing = {"category_1", "article_title"} - set(reader.fieldnames or ())
+        if missing:
+            raise ValueError(f"{path}: немає колонок {', '.join(sorted(missing))}")
+
+        for line, row in enumerate(reader, start=2):
+            row = {column: (row.get(column) or "").strip() for column in CSV_COLUMNS}
+
+            siblings, node = categories, None
+            for column in ("category_1", "category_2", "category_3"):
+                if not row[column]:
+                    break
+                node = _get_or_add(siblings, "name", row[column])
+                siblings = node.setdefault("children", [])
+            if node is None:
+                raise ValueError(f"{path}:{line}: не вказана категорія")
+
+            if not row["article_title"]:
+                continue
+            article = _get_or_add(node.setdefault("articles", []), "title", row["article_title"])
+            if row["article_content"]:
+                article["content"] = row["article_content"]
+
+            if not row["test_title"]:
+                continue
+            test = _get_or_add(article.setdefault("tests", []), "title", row["test_title"])
+            if row["pass_threshold"]:
+                test["pass_threshold"] = int(row["pass_threshold"])
+
+            if not row["question_text"]:
+                continue
+            question = _get_or_add(test.setdefault("questions", []), "text", row["question_text"])
+            if row["points"]:
+                question["points"] = int(row["points"])
+
+            if not row["answer_text"]:
+                continue
+            answer = _get_or_add(question.setdefault("answers", []), "text", row["answer_text"])
+            answer["is_correct"] = _parse_bool(row["is_correct"])
+
+    return categories
+
+
+def read_bundle(path: str) -> List[dict]:
+    """
+    Чтение файла импорта (.json или .csv)
+
+    Args:
+        path: Путь к файлу
+
+    Returns:
+        List[dict]: Категории верхнего уровня
+    """
+    if path.lower().endswith(".csv"):
+        return read_csv_bundle(path)
+
+    with open(path, encoding="utf-8-sig") as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get("categories", [])
+    if not isinstance(data, list):
+        raise ValueError(f"{path}: очікується список категорій")
+    return data
+
+
+# ====================== ИМПОРТ ======================
+
+def _required(raw: dict, *names: str, where: str) -> str:
+    for name in names:
+        value = raw.get(name)
+        if isinstance(value, str) and value.strip():
+            return value.strip()
+    raise ValueError(f"{where}: не заповнено поле {names[0]}")
+
+
+async def _upsert_level(
+    session: AsyncSession,
+    model,
+    pk,
+    parent,
+    key,
+    items: Dict[Tuple[Optional[int], str], _Item],
+    counts: ImportCounts,
+    defaults: dict,
+    extra_filter=None
+) -> List[_Item]:
+    """
+    Вставка новых и обновление существующих записей одного уровня
+
+    Args:
+        session: Сессия SQLAlchemy
+        model: Модель уровня
+        pk, parent, key: Колонки первичного ключа, родителя и естественного ключа
+        items: (ID родителя, ключ) -> элемент файла импорта
+        counts: Счетчики уровня
+        defaults: Поля, которые задаются только при создании записи
+        extra_filter: Дополнительное условие выборки существующих записей
+
+    Returns:
+        List[_Item]: Элементы уровня с заполненными ID
+    """
+    if not items:
+        return []
+
+    value_fields = sorted({name for item in items.values() for name in item.values})
+    parent_ids = {parent_id for parent_id, _ in items}
+    condition = parent.in_([parent_id for parent_id in parent_ids if parent_id is not None])
+    if None in parent_ids:
+        condition = or_(condition, parent.is_(None))
+    if extra_filter is not None:
+        condition = condition & extra_filter
+
+    query = select(pk, parent, key, *(getattr(model, name) for name in value_fields)).where(condition)
+
+    existing = {
+        (row[1], row[2]): row
+        for row in (await session.execute(query)).all()
+    }
+
+    inserts, updates = [], []
+    for (parent_id, item_key), item in items.items():
+        row = existing.get((parent_id, item_key))
+        if row is None:
+            inserts.append({parent.key: parent_id, key.key: item_key, **defaults, **item.values})
+            continue
+
+        item.id = row[0]
+        changed = {
+            name: value for name, value in item.values.items()
+            if getattr(row, name) != value
+        }
+        if changed:
+            updates.append({pk.key: item.id, **changed})
+            counts.updated += 1
+        else:
+            counts.unchanged += 1
+
+    if updates:
+        await session.execute(update(model), updates)
+
+    if inserts:
+        await session.execute(insert(model), inserts)
+        counts.created += len(inserts)
+
+        # ID новых записей одним запросом
+        created = {
+            (row[1], row[2]): row[0]
+            for row in (await session.execute(select(pk, parent, key).where(condition))).all()
+        }
+        for (parent_id, item_key), item in items.items():
+            if item.id is None:
+                item.id = created[(parent_id, item_key)]
+
+    return list(items.values())
+
+
+def _collect(parents: List[_Item], child_field: str, parse) -> Dict[Tuple[Optional[int], str], _Item]:
+    """Разбор вложенных элементов; повторы с тем же ключом объединяются"""
+    items: Dict[Tuple[Optional[int], str], _Item] = {}
+    for parent in parents:
+        for position, raw in enumerate(parent.children.get(child_field) or []):
+            item = parse(raw, position, parent)
+            known = items.get((parent.id, item.key))
+            if known is None:
+                items[(parent.id, item.key)] = item
+            else:
+                known.values.update(item.values)
+                for name, children in item.children.items():
+                    known.children.setdefault(name, []).extend(children)
+    return items
+
+
+def _parse_category(raw: dict, position: int, parent: _Item) -> _Item:
+    name = _required(raw, "name", where=f"Категорія {parent.key!r}")
+    return _Item(
+        key=name,
+        values={},
+        children={"children": raw.get("children") or [], "articles": raw.get("articles") or []}
+    )
+
+
+def _parse_article(raw: dict, position: int, parent: _Item) -> _Item:
+    title = _required(raw, "title", where=f"Стаття в категорії {parent.key!r}")
+    content = _required(raw, "content", where=f"Стаття {title!r}")
+    if len(title) > 255:
+        raise ValueError(f"Стаття {title[:50]!r}: заголовок довший за 255 символів")
+    if len(content) > ARTICLE_MAX_LENGTH:
+        raise ValueError(f"Стаття {title!r}: текст довший за {ARTICLE_MAX_LENGTH} символів")
+    return _Item(key=title, values={"content": content}, children={"tests": raw.get("tests") or []})
+
+
+def _parse_test(raw: dict, position: int, parent: _Item) -> _Item:
+    title = _required(raw, "title", where=f"Тест статті {parent.key!r}")
+    threshold = int(raw.get("pass_threshold", 80))
+    if not 0 <= threshold <= 100:
+        raise ValueError(f"Тест {title!r}: прохідний бал має бути від 0 до 100")
+    return _Item(key=title, values={"pass_threshold": threshold}, children={"questions": raw.get("questions") or []})
+
+
+def _parse_question(raw: dict, position: int, parent: _Item) -> _Item:
+    text = _required(raw, "text", "question_text", where=f"Питання тесту {parent.key!r}")
+    answers = raw.get("answers") or []
+    if answers and not any(_parse_bool(answer.get("is_correct", False)) for answer in answers):
+        raise ValueError(f"Питання {text!r}: немає правильної відповіді")
+    return _Item(key=text, values={"points": int(raw.get("points", 1))}, children={"answers": answers})
+
+
+def _parse_answer(raw: dict, position: int, parent: _Item) -> _Item:
+    text = _required(raw, "text", "answer_text", where=f"Відповідь на питання {parent.key!r}")
+    return _Item(
+        key=text,
+        values={"is_correct": _parse_bool(raw.get("is_correct", False)), "position": position},
+        children={}
+    )
+
+
+async def import_library(
+    session: AsyncSession,
+    categories: List[dict],
+    author_id: Optional[int] = None,
+    dry_run: bool = False
+) -> ImportResult:
+    """
+    Импорт библиотеки одной транзакцией
+
+    Args:
+        session: Сессия SQLAlchemy
+        categories: Категории верхнего уровня (см. read_bundle)
+        author_id: ID пользователя - автора новых статей и тестов
+        dry_run: Только подсчитать изменения и откатить транзакцию
+
+    Returns:
+        ImportResult: Количество созданных, обновленных и неизмененных записей
+    """
+    result = ImportResult(dry_run=dry_run)
+    root = _Item(key="", values={}, children={"children": categories})
+
+    try:
+        # Категории по уровням: родители должны получить ID раньше детей
+        parents, category_items = [root], []
+        for level in range(1, MAX_CATEGORY_LEVEL + 1):
+            parents = await _upsert_level(
+                session, Category, Category.category_id, Category.parent_id, Category.name,
+                _collect(parents, "children", _parse_category),
+                result.categories,
+                defaults={"level": level},
+                extra_filter=Category.level == level
+            )
+            category_items.extend(parents)
+
+        too_deep = [item.key for item in parents if item.children.get("children")]
+        if too_deep:
+            raise ValueError(
+                f"Категорія {too_deep[0]!r}: допускається не більше {MAX_CATEGORY_LEVEL} рівнів"
+            )
+
+        articles = await _upsert_level(
+            session, Article, Article.article_id, Article.category_id, Article.title,
+            _collect(category_items, "articles", _parse_article),
+            result.articles,
+            defaults={"created_by": author_id}
+        )
+        tests = await _upsert_level(
+            session, Test, Test.test_id, Test.article_id, Test.title,
+            _collect(articles, "tests", _parse_test),
+            result.tests,
+            defaults={"created_by": author_id}
+        )
+        questions = await _upsert_level(
+            session, Question, Question.question_id, Question.test_id, Question.question_text,
+            _collect(tests, "questions", _parse_question),
+            result.questions,
+            defaults={}
+        )
+        await _upsert_level(
+            session, Answer, Answer.answer_id, Answer.question_id, Answer.answer_text,
+            _collect(questions, "answers", _parse_answer),
+            result.answers,
+            defaults={}
+        )
+
+        if dry_run:
+            await session.rollback()
+            return result
+
+        # Запущенный бот увидит новую версию и сбросит свои кэши библиотеки
+        await bump_library_version(session)
+        await session.commit()
+    except Exception:
+        await session.rollback()
+        raise
+
+    logger.info(f"Library imported: {result.as_dict()}")
+
+    # Сбрасываем кэши библиотеки и тестов этого процесса
+    invalidate_library_caches()
+
+    if author_id:
+        from bot.services.audit import queue_admin_log
+        queue_admin_log(
+            admin_id=author_id,
+            action_type="IMPORT",
+            entity_type="LIBRARY",
+            details=result.as_dict()
+        )
+
+    return result
+
+
+# ====================== КОМАНДНАЯ СТРОКА ======================
+
+def _format_result(result: ImportResult) -> str:
+    lines = ["Пробний імпорт (зміни не збережено):" if result.dry_run else "Імпорт завершено:"]
+    for name, counts in result.as_dict().items():
+        if name == "dry_run":
+            continue
+        lines.append(
+            f"  {name}: створено {counts['created']}, оновлено {counts['updated']}, "
+            f"без змін {counts['unchanged']}"
+        )
+    return "\n".join(lines)
+
+
+async def _run(path: str, author_id: Optional[int], dry_run: bool) -> ImportResult:
+    from bot.database.database import AsyncSessionLocal
+    from bot.services.audit import flush_admin_logs
+
+    categories = read_bundle(path)
+    async with AsyncSessionLocal() as session:
+        result = await import_library(session, categories, author_id=author_id, dry_run=dry_run)
+    await flush_admin_logs()
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m bot.services.library_import",
+        description="Імпорт категорій, статей і тестів бібліотеки з JSON або CSV"
+    )
+    parser.add_argument("path", help="Файл імпорту (.json або .csv)")
+    parser.add_argument("--author-id", type=int, default=None,
+                        help="Telegram ID адміністратора - автора нових статей і тестів")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="Перевірити файл і показати зміни без збереження")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.path):
+        print(f"Файл не знайдено: {args.path}", file=sys.stderr)
+        return 1
+
+    try:
+        result = asyncio.run(_run(args.path, args.author_id, args.dry_run))
+    except (ValueError, KeyError) as e:
+        print(f"Помилка у файлі імпорту: {e}", file=sys.stderr)
+        return 1
+
+    print(_format_result(result))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,91 @@
+"""
+Версия библиотеки для сброса кэшей между процессами.
+
+Кэши категорий, статей и снимков тестов живут в памяти процесса бота, а
+импорт библиотеки (bot/services/library_import.py) запускается отдельным
+процессом. Импорт увеличивает версию в таблице library_version в своей
+транзакции, а фоновая задача бота run_library_version_watcher раз в
+LIBRARY_VERSION_CHECK_INTERVAL секунд сравнивает версию с последней
+увиденной и при изменении сбрасывает кэши. Поэтому после импорта тесты
+проверяются по новым ответам без перезапуска бота.
+"""
+
+import asyncio
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.config import LIBRARY_VERSION_CHECK_INTERVAL
+from bot.database.models import LibraryVersion
+from bot.utils.logger import logger
+
+# Строка таблицы library_version
+LIBRARY_VERSION_ID = 1
+
+
+async def get_library_version(session: AsyncSession) -> int:
+    """
+    Текущая версия библиотеки
+
+    Args:
+        session: Сессия SQLAlchemy
+
+    Returns:
+        int: Версия (0, если библиотека еще не импортировалась)
+    """
+    version = await session.scalar(
+        select(LibraryVersion.version).where(LibraryVersion.id == LIBRARY_VERSION_ID)
+    )
+    return version or 0
+
+
+async def bump_library_version(session: AsyncSession):
+    """
+    Увеличение версии библиотеки в текущей транзакции (без commit)
+
+    Args:
+        session: Сессия SQLAlchemy
+    """
+    result = await session.execute(
+        update(LibraryVersion)
+        .where(LibraryVersion.id == LIBRARY_VERSION_ID)
+        .values(version=LibraryVersion.version + 1, updated_at=datetime.utcnow())
+    )
+    if not result.rowcount:
+        session.add(LibraryVersion(id=LIBRARY_VERSION_ID, version=1, updated_at=datetime.utcnow()))
+        await session.flush()
+
+
+def invalidate_library_caches():
+    """Сброс кэшей категорий, статей и снимков тестов этого процесса"""
+    from bot.services.articles import invalidate_category_tree, invalidate_article_view
+    from bot.services.tests import invalidate_test_snapshot
+
+    invalidate_category_tree()
+    invalidate_article_view()
+    invalidate_test_snapshot()
+
+
+async def run_library_version_watcher(interval: float = LIBRARY_VERSION_CHECK_INTERVAL):
+    """
+    Фоновая задача: сбрасывает кэши библиотеки после импорта другим процессом
+
+    Args:
+        interval: Интервал проверки версии в секундах
+    """
+    from bot.database.database import ReadOnlySessionLocal
+
+    known: Optional[int] = None
+    while True:
+        try:
+            async with ReadOnlySessionLocal() as session:
+                version = await get_library_version(session)
+            if known is not None and version != known:
+                logger.info(f"Library version changed {known} -> {version}, dropping library caches")
+                invalidate_library_caches()
+            known = version
+        except Exception as e:
+            logger.error(f"Error checking library version: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,294 @@
+"""
+Хранение данных: архивация устаревших попыток тестов и доставок объявлений.
+
+Попытки тестов (вместе с ответами пользователей) и доставки объявлений
+старше RETENTION_DAYS переносятся в архивную базу SQLite
+(ARCHIVE_DATABASE_PATH), подключенную к основной командой ATTACH.
+Перенос идет пакетами по RETENTION_BATCH_SIZE строк, каждый пакет - отдельная
+короткая транзакция, поэтому бот не ждет блокировку записи дольше одного
+пакета.
+
+Итоги перенесенных попыток накапливаются в test_attempt_rollups (по
+пользователю и тесту), поэтому статистика тестов и прогресс пользователя
+учитывают архив (см. get_test_statistics и get_user_test_progress в
+bot/services/tests.py). После переноса выполняются VACUUM и ANALYZE.
+
+Архивация поддерживается только для SQLite; для других СУБД задача
+ничего не делает.
+"""
+
+import asyncio
+from dataclasses import dataclass, asdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, delete, case, func, or_, table, column
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from bot.config import RETENTION_DAYS, RETENTION_BATCH_SIZE, RETENTION_INTERVAL_HOURS, ARCHIVE_DATABASE_PATH
+from bot.database.database import async_engine, get_insert
+from bot.database.models import TestAttempt, UserAnswer, AnnouncementDelivery, TestAttemptRollup
+from bot.utils.logger import logger
+
+# Имя, под которым архивная база подключается к соединению
+ARCHIVE_SCHEMA = "archive"
+# Пауза между пакетами, чтобы запись бота не ждала блокировку
+RETENTION_BATCH_PAUSE = 0.1
+# Задержка первого запуска после старта бота (секунды)
+RETENTION_START_DELAY = 5 * 60
+
+ARCHIVED_TABLES = (TestAttempt.__table__, UserAnswer.__table__, AnnouncementDelivery.__table__)
+
+
+@dataclass(slots=True)
+class RetentionResult:
+    test_attempts: int = 0
+    user_answers: int = 0
+    announcement_deliveries: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.test_attempts + self.user_answers + self.announcement_deliveries
+
+
+def _archive_table(source):
+    """Таблица архивной базы с теми же колонками, что и source"""
+    return table(source.name, *(column(c.name) for c in source.columns), schema=ARCHIVE_SCHEMA)
+
+
+async def _copy_to_archive(conn: AsyncConnection, source, condition) -> int:
+    columns = [c.name for c in source.columns]
+    result = await conn.execute(
+        _archive_table(source).insert().from_select(columns, select(*source.columns).where(condition))
+    )
+    return result.rowcount
+
+
+async def _ensure_archive_tables(conn: AsyncConnection):
+    for source in ARCHIVED_TABLES:
+        columns = ", ".join(c.name for c in source.columns)
+        # Структура без ограничений: архив только хранит строки
+        await conn.exec_driver_sql(
+            f"CREATE TABLE IF NOT EXISTS {ARCHIVE_SCHEMA}.{source.name} AS "
+            f"SELECT {columns} FROM main.{source.name} WHERE 0"
+        )
+        # Колонки, добавленные в основную таблицу после создания архива
+        result = await conn.exec_driver_sql(f"PRAGMA {ARCHIVE_SCHEMA}.table_info({source.name})")
+        archived = {row[1] for row in result}
+        for source_column in source.columns:
+            if source_column.name not in archived:
+                await conn.exec_driver_sql(
+                    f"ALTER TABLE {ARCHIVE_SCHEMA}.{source.name} ADD COLUMN {source_column.name}"
+                )
+    await conn.commit()
+
+
+def _build_rollups(rows) -> List[dict]:
+    """Итоги пакета попыток по пользователю и тесту"""
+    rollups: Dict[Tuple[int, int], dict] = {}
+    for row in rows:
+        if row.test_id is None or row.user_id is None:
+            # Попытки удаленных тестов в статистике не участвуют
+            continue
+        rollup = rollups.get((row.user_id, row.test_id))
+        if rollup is None:
+            rollup = rollups[(row.user_id, row.test_id)] = {
+                "user_id": row.user_id,
+                "test_id": row.test_id,
+                "attempts_count": 0,
+                "passed_count": 0,
+                "score_sum": 0,
+                "best_score": row.score,
+                "last_score": row.score,
+                "last_is_passed": row.is_passed,
+                "last_attempt_at": row.created_at
+            }
+        rollup["attempts_count"] += 1
+        rollup["passed_count"] += 1 if row.is_passed else 0
+        rollup["score_sum"] += row.score
+        rollup["best_score"] = max(rollup["best_score"], row.score)
+        if row.created_at and (rollup["last_attempt_at"] is None or row.created_at >= rollup["last_attempt_at"]):
+            rollup["last_score"] = row.score
+            rollup["last_is_passed"] = row.is_passed
+            rollup["last_attempt_at"] = row.created_at
+    return list(rollups.values())
+
+
+async def _save_rollups(conn: AsyncConnection, rollups: List[dict]):
+    stmt = get_insert(TestAttemptRollup)
+    excluded = stmt.excluded
+    is_newer = or_(
+        TestAttemptRollup.last_attempt_at.is_(None),
+        excluded.last_attempt_at >= TestAttemptRollup.last_attempt_at
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[TestAttemptRollup.user_id, TestAttemptRollup.test_id],
+        set_={
+            "attempts_count": TestAttemptRollup.attempts_count + excluded.attempts_count,
+            "passed_count": TestAttemptRollup.passed_count + excluded.passed_count,
+            "score_sum": TestAttemptRollup.score_sum + excluded.score_sum,
+            # max с двумя аргументами в SQLite - скалярная функция
+            "best_score": func.max(TestAttemptRollup.best_score, excluded.best_score),
+            "last_score": case((is_newer, excluded.last_score), else_=TestAttemptRollup.last_score),
+            "last_is_passed": case((is_newer, excluded.last_is_passed), else_=TestAttemptRollup.last_is_passed),
+            "last_attempt_at": case((is_newer, excluded.last_attempt_at), else_=TestAttemptRollup.last_attempt_at)
+        }
+    )
+    await conn.execute(stmt, rollups)
+
+
+async def _archive_attempts_batch(conn: AsyncConnection, cutoff: datetime, batch_size: int) -> Tuple[int, int]:
+    """
+    Перенос одного пакета попыток с ответами в архив
+
+    Returns:
+        Tuple[int, int]: Количество перенесенных попыток и ответов
+    """
+    result = await conn.execute(
+        select(
+            TestAttempt.attempt_id,
+            TestAttempt.user_id,
+            TestAttempt.test_id,
+            TestAttempt.score,
+            TestAttempt.is_passed,
+            TestAttempt.created_at
+        )
+        .where(TestAttempt.created_at < cutoff)
+        .order_by(TestAttempt.attempt_id)
+        .limit(batch_size)
+    )
+    rows = result.all()
+    if not rows:
+        return 0, 0
+
+    attempt_ids = [row.attempt_id for row in rows]
+    try:
+        rollups = _build_rollups(rows)
+        if rollups:
+            await _save_rollups(conn, rollups)
+
+        # Сначала копия в архив, затем удаление: при сбое строки могут
+        # оказаться в архиве дважды, но не потеряются
+        answers = await _copy_to_archive(conn, UserAnswer.__table__, UserAnswer.attempt_id.in_(attempt_ids))
+        await _copy_to_archive(conn, TestAttempt.__table__, TestAttempt.attempt_id.in_(attempt_ids))
+        await conn.execute(delete(UserAnswer).where(UserAnswer.attempt_id.in_(attempt_ids)))
+        await conn.execute(delete(TestAttempt).where(TestAttempt.attempt_id.in_(attempt_ids)))
+        await conn.commit()
+    except Exception:
+        await conn.rollback()
+        raise
+
+    return len(attempt_ids), answers
+
+
+async def _archive_deliveries_batch(conn: AsyncConnection, cutoff: datetime, batch_size: int) -> int:
+    """
+    Перенос одного пакета доставок объявлений в архив
+
+    Ожидающие отправки записи (delivered_at IS NULL) не переносятся
+
+    Returns:
+        int: Количество перенесенных записей
+    """
+    result = await conn.execute(
+        select(AnnouncementDelivery.delivery_id)
+        .where(AnnouncementDelivery.delivered_at < cutoff)
+        .order_by(AnnouncementDelivery.delivery_id)
+        .limit(batch_size)
+    )
+    delivery_ids = result.scalars().all()
+    if not delivery_ids:
+        return 0
+
+    try:
+        condition = AnnouncementDelivery.delivery_id.in_(delivery_ids)
+        await _copy_to_archive(conn, AnnouncementDelivery.__table__, condition)
+        await conn.execute(delete(AnnouncementDelivery).where(condition))
+        await conn.commit()
+    except Exception:
+        await conn.rollback()
+        raise
+
+    return len(delivery_ids)
+
+
+async def archive_old_data(
+    retention_days: int = RETENTION_DAYS,
+    batch_size: int = RETENTION_BATCH_SIZE,
+    archive_path: str = ARCHIVE_DATABASE_PATH,
+    now: Optional[datetime] = None
+) -> RetentionResult:
+    """
+    Перенос устаревших попыток тестов и доставок объявлений в архивную базу
+
+    Args:
+        retention_days: Сколько дней данные хранятся в основной базе
+        batch_size: Количество строк в одной транзакции
+        archive_path: Путь к архивной базе SQLite
+        now: Текущее время (для тестов)
+
+    Returns:
+        RetentionResult: Количество перенесенных строк
+    """
+    result = RetentionResult()
+    if retention_days <= 0:
+        return result
+    if async_engine.dialect.name != "sqlite":
+        logger.info("Архивация данных поддерживается только для SQLite, пропускаем")
+        return result
+
+    cutoff = (now or datetime.utcnow()) - timedelta(days=retention_days)
+
+    async with async_engine.connect() as conn:
+        # ATTACH нельзя выполнить внутри транзакции
+        await conn.exec_driver_sql(f"ATTACH DATABASE ? AS {ARCHIVE_SCHEMA}", (archive_path,))
+        try:
+            await _ensure_archive_tables(conn)
+
+            while True:
+                attempts, answers = await _archive_attempts_batch(conn, cutoff, batch_size)
+                if not attempts:
+                    break
+                result.test_attempts += attempts
+                result.user_answers += answers
+                await asyncio.sleep(RETENTION_BATCH_PAUSE)
+
+            while True:
+                deliveries = await _archive_deliveries_batch(conn, cutoff, batch_size)
+                if not deliveries:
+                    break
+                result.announcement_deliveries += deliveries
+                await asyncio.sleep(RETENTION_BATCH_PAUSE)
+        finally:
+            await conn.rollback()
+            await conn.exec_driver_sql(f"DETACH DATABASE {ARCHIVE_SCHEMA}")
+
+        if result.total:
+            # Возвращаем освободившееся место и обновляем статистику планировщика
+            await conn.exec_driver_sql("VACUUM")
+            await conn.exec_driver_sql("ANALYZE")
+            await conn.commit()
+
+    if result.test_attempts:
+        from bot.services.tests import invalidate_user_progress
+        invalidate_user_progress()
+
+    logger.info(f"Архивация данных старше {retention_days} дней: {asdict(result)}")
+    return result
+
+
+async def run_retention_job(interval: float = RETENTION_INTERVAL_HOURS * 3600, start_delay: float = RETENTION_START_DELAY):
+    """
+    Фоновая задача: периодически переносит устаревшие данные в архив
+
+    Args:
+        interval: Интервал запуска в секундах
+        start_delay: Задержка первого запуска в секундах
+    """
+    await asyncio.sleep(start_delay)
+    while True:
+        try:
+            await archive_old_data()
+        except Exception as e:
+            logger.error(f"Error in retention job: {e}")
+        await asyncio.sleep(interval)
@@ -0,0 +1,408 @@
+"""
+Полнотекстовый поиск по статьям библиотеки.
+
+Для SQLite используется виртуальная таблица FTS5 articles_fts над
+articles.title и articles.content (external content: текст хранится только в
+articles). Индекс поддерживают триггеры на INSERT/UPDATE/DELETE, поэтому
+обработчики статей о поиске ничего не знают. Результаты ранжируются bm25
+(совпадение в названии весит больше, чем в тексте) и возвращаются
+страницами с фрагментами текста, в которых подсвечены найденные слова.
+
+Слова запроса сокращаются до основы и ищутся по префиксу: «сроки хранения
+молочки» находит «срок хранения молочной продукции».
+
+Без FTS5 (PostgreSQL, сборка SQLite без расширения) поиск выполняется через
+ILIKE по названию и тексту статьи.
+
+Инлайн-режим (@bot молоко) обслуживается из памяти: LRU-кэш связывает основы
+слов запроса с найденными статьями, поэтому соседние нажатия клавиш («моло»,
+«молок», «молоко») дают один ключ и один запрос к базе. Если более короткий
+запрос ничего не нашел, более длинный тоже не ищется. Готовые карточки
+статей кэшируются отдельно и сбрасываются при изменении статей.
+"""
+
+import html
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from time import monotonic
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select, func, and_, or_, case, text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.database import async_engine
+from bot.database.models import Article
+from bot.services.articles import get_category_tree, render_article_pages
+from bot.utils.logger import logger
+
+FTS_TABLE = "articles_fts"
+
+# Количество статей на странице результатов
+SEARCH_PAGE_SIZE = 5
+# Больше слов в запросе не учитывается
+SEARCH_MAX_TERMS = 8
+# Вес совпадения в названии и в тексте статьи для bm25
+SEARCH_TITLE_WEIGHT = 10.0
+SEARCH_CONTENT_WEIGHT = 1.0
+# Количество слов во фрагменте текста
+SNIPPET_TOKENS = 16
+
+# Инлайн-режим: количество результатов, размер кэшей и время их жизни
+INLINE_RESULTS_LIMIT = 20
+INLINE_CACHE_SIZE = 256
+INLINE_ARTICLES_CACHE_SIZE = 512
+INLINE_CACHE_TTL = 300  # секунд
+# Сколько Telegram хранит ответ на одинаковый запрос пользователя на своей стороне
+INLINE_CACHE_TIME = 300  # секунд
+
+# Маркеры подсветки в snippet(): заменяются на <b></b> после экранирования HTML
+_HIGHLIGHT_START = "\x02"
+_HIGHLIGHT_END = "\x03"
+
+FTS_SCHEMA = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    "title, content, content='articles', content_rowid='article_id')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON articles BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.article_id, new.title, new.content); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON articles BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) "
+    "VALUES ('delete', old.article_id, old.title, old.content); "
+    "END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF title, content ON articles BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, content) "
+    "VALUES ('delete', old.article_id, old.title, old.content); "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, content) VALUES (new.article_id, new.title, new.content); "
+    "END",
+)
+
+# Создан ли индекс FTS5 (проверяется при запуске бота)
+_fts_enabled = False
+
+
+@dataclass(frozen=True, slots=True)
+class SearchHit:
+    article_id: int
+    title: str
+    # Путь категории: «Продукти / Молочні / Йогурти»
+    category_path: str
+    # Фрагмент текста в HTML с подсвеченными словами
+    snippet: str
+
+
+@dataclass(frozen=True, slots=True)
+class SearchPage:
+    query: str
+    hits: Tuple[SearchHit, ...]
+    total: int
+    page: int
+    page_size: int = SEARCH_PAGE_SIZE
+
+    @property
+    def pages(self) -> int:
+        return max(1, -(-self.total // self.page_size))
+
+    @property
+    def has_prev(self) -> bool:
+        return self.page > 0
+
+    @property
+    def has_next(self) -> bool:
+        return self.page + 1 < self.pages
+
+
+async def ensure_search_index() -> bool:
+    """
+    Создание индекса FTS5 и триггеров при запуске бота
+
+    Если таблица индекса создается впервые, она заполняется из articles.
+
+    Returns:
+        bool: Используется ли FTS5
+    """
+    global _fts_enabled
+
+    if async_engine.dialect.name != "sqlite":
+        logger.info("Поиск статей: FTS5 доступен только для SQLite, используется ILIKE")
+        return False
+
+    try:
+        async with async_engine.begin() as conn:
+            exists = (await conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": FTS_TABLE}
+            )).first() is not None
+
+            for statement in FTS_SCHEMA:
+                await conn.exec_driver_sql(statement)
+
+            if not exists:
+                await conn.exec_driver_sql(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+                logger.info("Поиск статей: индекс FTS5 построен")
+    except Exception as e:
+        logger.warning(f"Поиск статей: FTS5 недоступен ({e}), используется LIKE")
+        _fts_enabled = False
+        return False
+
+    _fts_enabled = True
+    return True
+
+
+def get_search_terms(query: str) -> List[str]:
+    """
+    Основы слов запроса
+
+    Окончания отсекаются грубо (до двух последних букв, но не короче четырех),
+    чтобы разные формы слова находились одним префиксом
+
+    Args:
+        query: Текст запроса пользователя
+
+    Returns:
+        List[str]: Основы слов в нижнем регистре
+    """
+    terms = []
+    for word in re.findall(r"\w+", query.lower()):
+        if len(word) > 4:
+            word = word[:max(4, len(word) - 2)]
+        if word not in terms:
+            terms.append(word)
+    return terms[:SEARCH_MAX_TERMS]
+
+
+def build_match_query(terms: List[str]) -> str:
+    """Выражение MATCH для FTS5: все слова по префиксу"""
+    # Кавычки: слова ищутся буквально, без синтаксиса FTS5 (AND, NEAR, *)
+    return " ".join(f'"{term}"*' for term in terms)
+
+
+def _format_snippet(snippet: Optional[str]) -> str:
+    if not snippet:
+        return ""
+    snippet = html.escape(" ".join(snippet.split()))
+    return snippet.replace(_HIGHLIGHT_START, "<b>").replace(_HIGHLIGHT_END, "</b>")
+
+
+async def _search_fts(session: AsyncSession, terms: List[str], limit: int, offset: int) -> Tuple[int, list]:
+    params = {"match": build_match_query(terms), "limit": limit, "offset": offset}
+
+    total = (await session.execute(
+        text(f"SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :match"),
+        params
+    )).scalar() or 0
+    if not total or offset >= total:
+        return total, []
+
+    result = await session.execute(
+        text(
+            f"SELECT a.article_id, a.title, a.category_id, "
+            f"snippet({FTS_TABLE}, 1, '{_HIGHLIGHT_START}', '{_HIGHLIGHT_END}', '…', {SNIPPET_TOKENS}) AS snippet "
+            f"FROM {FTS_TABLE} JOIN articles AS a ON a.article_id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH :match "
+            f"ORDER BY bm25({FTS_TABLE}, {SEARCH_TITLE_WEIGHT}, {SEARCH_CONTENT_WEIGHT}), a.article_id "
+            f"LIMIT :limit OFFSET :offset"
+        ),
+        params
+    )
+    return total, result.all()
+
+
+async def _search_like(session: AsyncSession, terms: List[str], limit: int, offset: int) -> Tuple[int, list]:
+    condition = and_(*(
+        or_(Article.title.ilike(f"%{term}%"), Article.content.ilike(f"%{term}%"))
+        for term in terms
+    ))
+
+    total = (await session.execute(
+        select(func.count(Article.article_id)).where(condition)
+    )).scalar() or 0
+    if not total or offset >= total:
+        return total, []
+
+    # Сначала статьи, в названии которых есть все слова
+    title_match = and_(*(Article.title.ilike(f"%{term}%") for term in terms))
+    result = await session.execute(
+        select(
+            Article.article_id,
+            Article.title,
+            Article.category_id,
+            (func.substr(Article.content, 1, SNIPPET_TOKENS * 8) + "…").label("snippet")
+        )
+        .where(condition)
+        .order_by(case((title_match, 0), else_=1), Article.title, Article.article_id)
+        .limit(limit)
+        .offset(offset)
+    )
+    return total, result.all()
+
+
+async def search_articles(
+    session: AsyncSession,
+    query: str,
+    page: int = 0,
+    page_size: int = SEARCH_PAGE_SIZE
+) -> SearchPage:
+    """
+    Поиск статей по названию и тексту
+
+    Args:
+        session: Сессия SQLAlchemy
+        query: Текст запроса пользователя
+        page: Номер страницы (с нуля)
+        page_size: Количество статей на странице
+
+    Returns:
+        SearchPage: Страница результатов, отсортированных по релевантности
+    """
+    terms = get_search_terms(query)
+    page = max(page, 0)
+    if not terms:
+        return SearchPage(query=query, hits=(), total=0, page=0, page_size=page_size)
+
+    search = _search_fts if _fts_enabled else _search_like
+    total, rows = await search(session, terms, page_size, page * page_size)
+
+    tree = await get_category_tree(session)
+    hits = []
+    for row in rows:
+        category = tree.get(row.category_id) if row.category_id is not None else None
+        hits.append(SearchHit(
+            article_id=row.article_id,
+            title=row.title,
+            category_path=category.path if category else "Без категорії",
+            snippet=_format_snippet(row.snippet)
+        ))
+
+    return SearchPage(query=query, hits=tuple(hits), total=total, page=page, page_size=page_size)
+
+
+# ====================== ИНЛАЙН-РЕЖИМ ======================
+
+@dataclass(frozen=True, slots=True)
+class InlineArticle:
+    article_id: int
+    title: str
+    category_path: str
+    # Текст сообщения, которое отправляется в чат (HTML)
+    message_text: str
+
+
+@dataclass(frozen=True, slots=True)
+class InlineHit:
+    article: InlineArticle
+    # Фрагмент текста без разметки (для описания результата)
+    snippet: str
+
+
+# Основы слов запроса -> (срок годности, ((article_id, фрагмент), ...))
+_inline_queries: "OrderedDict[Tuple[str, ...], Tuple[float, Tuple[Tuple[int, str], ...]]]" = OrderedDict()
+# article_id -> карточка статьи
+_inline_articles: "OrderedDict[int, InlineArticle]" = OrderedDict()
+
+
+def _build_message_text(title: str, content: str) -> str:
+    # В чат отправляется первая страница статьи
+    pages = render_article_pages(title, content)
+    return pages[0] + "\n\n…" if len(pages) > 1 else pages[0]
+
+
+def _plain_snippet(snippet: Optional[str]) -> str:
+    if not snippet:
+        return ""
+    return " ".join(snippet.replace(_HIGHLIGHT_START, "").replace(_HIGHLIGHT_END, "").split())
+
+
+def _has_empty_prefix(terms: Tuple[str, ...], now: float) -> bool:
+    """
+    Нашел ли пустой результат запрос, все слова которого - префиксы слов terms
+
+    Статьи, найденные по более длинному префиксу, всегда найдены и по более
+    короткому, поэтому такой запрос тоже ничего не найдет
+    """
+    for cached_terms, (expires_at, hits) in _inline_queries.items():
+        if hits or expires_at <= now or len(cached_terms) > len(terms):
+            continue
+        if all(any(term.startswith(cached) for term in terms) for cached in cached_terms):
+            return True
+    return False
+
+
+async def _load_inline_articles(session: AsyncSession, article_ids: List[int]) -> Dict[int, InlineArticle]:
+    missing = [article_id for article_id in article_ids if article_id not in _inline_articles]
+    if missing:
+        result = await session.execute(
+            select(Article.article_id, Article.title, Article.category_id, Article.content)
+            .where(Article.article_id.in_(missing))
+        )
+        tree = await get_category_tree(session)
+        for row in result:
+            category = tree.get(row.category_id) if row.category_id is not None else None
+            _inline_articles[row.article_id] = InlineArticle(
+                article_id=row.article_id,
+                title=row.title,
+                category_path=category.path if category else "Без категорії",
+                message_text=_build_message_text(row.title, row.content)
+            )
+        while len(_inline_articles) > INLINE_ARTICLES_CACHE_SIZE:
+            _inline_articles.popitem(last=False)
+
+    articles = {}
+    for article_id in article_ids:
+        article = _inline_articles.get(article_id)
+        if article is not None:
+            _inline_articles.move_to_end(article_id)
+            articles[article_id] = article
+    return articles
+
+
+async def search_inline_articles(session: AsyncSession, query: str) -> Tuple[InlineHit, ...]:
+    """
+    Статьи для ответа на инлайн-запрос
+
+    Повторные и соседние запросы обслуживаются из кэша без обращения к базе
+
+    Args:
+        session: Сессия SQLAlchemy
+        query: Текст инлайн-запроса
+
+    Returns:
+        Tuple[InlineHit, ...]: Не больше INLINE_RESULTS_LIMIT статей по релевантности
+    """
+    terms = tuple(get_search_terms(query))
+    if not terms:
+        return ()
+
+    now = monotonic()
+    cached = _inline_queries.get(terms)
+    if cached is not None and cached[0] > now:
+        _inline_queries.move_to_end(terms)
+        hits = cached[1]
+    else:
+        if _has_empty_prefix(terms, now):
+            hits = ()
+        else:
+            search = _search_fts if _fts_enabled else _search_like
+            _, rows = await search(session, list(terms), INLINE_RESULTS_LIMIT, 0)
+            hits = tuple((row.article_id, _plain_snippet(row.snippet)) for row in rows)
+
+        _inline_queries[terms] = (now + INLINE_CACHE_TTL, hits)
+        _inline_queries.move_to_end(terms)
+        while len(_inline_queries) > INLINE_CACHE_SIZE:
+            _inline_queries.popitem(last=False)
+
+    if not hits:
+        return ()
+
+    articles = await _load_inline_articles(session, [article_id for article_id, _ in hits])
+    return tuple(
+        InlineHit(article=articles[article_id], snippet=snippet)
+        for article_id, snippet in hits
+        if article_id in articles
+    )
+
+
+def invalidate_inline_cache():
+    """Сброс кэша инлайн-поиска (после изменения статей)"""
+    _inline_queries.clear()
+    _inline_articles.clear()
@@ -0,0 +1,620 @@
+"""
+Кэш снимков тестов для прохождения тестирования.
+
+Снимок (TestSnapshot) - неизменяемая копия теста со всеми вопросами,
+упорядоченными вариантами ответов, флагами правильности и заранее
+собранными клавиатурами ответов. Снимок загружается одним запросом и
+хранится в кэше процесса, поэтому ответ пользователя на вопрос не требует
+чтения из базы данных. Любое изменение теста, вопроса или ответа через
+operations_library сбрасывает соответствующий снимок.
+
+Ответы пользователей накапливаются в буфере попытки и записываются в БД
+одной транзакцией вместе с итоговым баллом, когда попытка завершается.
+Брошенные попытки записывает фоновая задача run_answer_flusher. Если запись
+не удалась, ответы и итоговый балл остаются в буфере и повторяются фоновой
+задачей; ответы на удаленные за время попытки вопросы сохраняются без
+ссылок на них.
+"""
+
+import asyncio
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import count
+from time import monotonic
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
+from sqlalchemy import select, insert, update, func, case, union, union_all
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from bot.database.database import SUPPORTS_RETURNING
+from bot.database.models import Test, Question, Answer, TestAttempt, TestAttemptRollup, UserAnswer
+from bot.utils.logger import logger
+
+# Префиксы callback_data, для которых заранее собираются клавиатуры ответов:
+# "answer_" - bot/handlers/tests.py, "user_answer_" - bot/handlers/admin/library.py
+ANSWER_CALLBACK_PREFIXES = ("answer_", "user_answer_")
+
+
+@dataclass(frozen=True, slots=True)
+class AnswerSnapshot:
+    answer_id: int
+    question_id: int
+    answer_text: str
+    is_correct: bool
+    position: int
+
+
+@dataclass(frozen=True, slots=True)
+class QuestionSnapshot:
+    question_id: int
+    question_text: str
+    points: int
+    answers: Tuple[AnswerSnapshot, ...]
+    keyboards: Mapping[str, InlineKeyboardMarkup]
+
+    def get_keyboard(self, prefix: str = "answer_") -> InlineKeyboardMarkup:
+        """
+        Получение готовой клавиатуры ответов
+
+        Args:
+            prefix: Префикс callback_data кнопок ответов
+
+        Returns:
+            InlineKeyboardMarkup: Клавиатура с вариантами ответов
+        """
+        return self.keyboards[prefix]
+
+
+@dataclass(frozen=True, slots=True)
+class TestSnapshot:
+    test_id: int
+    title: str
+    article_id: Optional[int]
+    article_title: Optional[str]
+    pass_threshold: int
+    version: int
+    questions: Tuple[QuestionSnapshot, ...]
+    questions_by_id: Mapping[int, QuestionSnapshot]
+    answers_by_id: Mapping[int, AnswerSnapshot]
+
+    def get_question(self, question_id: int) -> Optional[QuestionSnapshot]:
+        return self.questions_by_id.get(question_id)
+
+    def get_answer(self, answer_id: int) -> Optional[AnswerSnapshot]:
+        return self.answers_by_id.get(answer_id)
+
+
+# Кэш снимков: test_id -> TestSnapshot
+_snapshots: Dict[int, TestSnapshot] = {}
+# Обратные индексы для сброса кэша по вопросу или статье
+_question_to_test: Dict[int, int] = {}
+_article_to_tests: Dict[int, set] = {}
+# Монотонный счетчик версий снимков
+_versions = count(1)
+
+
+def _build_answers_kb(answers: Tuple[AnswerSnapshot, ...], prefix: str) -> InlineKeyboardMarkup:
+    # По одной кнопке в строку, как в get_answers_kb
+    return InlineKeyboardMarkup(inline_keyboard=[
+        [InlineKeyboardButton(text=answer.answer_text, callback_data=f"{prefix}{answer.answer_id}")]
+        for answer in answers
+    ])
+
+
+def _build_snapshot(test: Test) -> TestSnapshot:
+    questions = []
+    answers_by_id = {}
+
+    for question in sorted(test.questions, key=lambda q: q.question_id):
+        answers = tuple(
+            AnswerSnapshot(
+                answer_id=answer.answer_id,
+                question_id=question.question_id,
+                answer_text=answer.answer_text,
+                is_correct=answer.is_correct,
+                position=answer.position
+            )
+            for answer in sorted(question.answers, key=lambda a: (a.position, a.answer_id))
+        )
+        answers_by_id.update((answer.answer_id, answer) for answer in answers)
+
+        questions.append(QuestionSnapshot(
+            question_id=question.question_id,
+            question_text=question.question_text,
+            points=question.points,
+            answers=answers,
+            keyboards=MappingProxyType({
+                prefix: _build_answers_kb(answers, prefix) for prefix in ANSWER_CALLBACK_PREFIXES
+            })
+        ))
+
+    return TestSnapshot(
+        test_id=test.test_id,
+        title=test.title,
+        article_id=test.article_id,
+        article_title=test.article.title if test.article else None,
+        pass_threshold=test.pass_threshold,
+        version=next(_versions),
+        questions=tuple(questions),
+        questions_by_id=MappingProxyType({q.question_id: q for q in questions}),
+        answers_by_id=MappingProxyType(answers_by_id)
+    )
+
+
+async def get_test_snapshot(session: AsyncSession, test_id: int) -> Optional[TestSnapshot]:
+    """
+    Получение снимка теста из кэша (при промахе - загрузка одним запросом)
+
+    Args:
+        session: Сессия SQLAlchemy
+        test_id: ID теста
+
+    Returns:
+        TestSnapshot: Снимок теста или None, если тест не найден
+    """
+    snapshot = _snapshots.get(test_id)
+    if snapshot is not None:
+        return snapshot
+
+    result = await session.execute(
+        select(Test)
+        .options(
+            joinedload(Test.article),
+            joinedload(Test.questions).joinedload(Question.answers)
+        )
+        .where(Test.test_id == test_id)
+    )
+    test = result.unique().scalar_one_or_none()
+
+    if not test:
+        return None
+
+    snapshot = _build_snapshot(test)
+    _snapshots[test_id] = snapshot
+    for question in snapshot.questions:
+        _question_to_test[question.question_id] = test_id
+    if snapshot.article_id is not None:
+        _article_to_tests.setdefault(snapshot.article_id, set()).add(test_id)
+
+    logger.debug(f"Test snapshot loaded: test_id={test_id}, version={snapshot.version}")
+    return snapshot
+
+
+def invalidate_test_snapshot(test_id: Optional[int] = None):
+    """
+    Сброс снимка теста (или всего кэша, если test_id не указан)
+
+    Args:
+        test_id: ID теста
+    """
+    if test_id is None:
+        _snapshots.clear()
+        _question_to_test.clear()
+        _article_to_tests.clear()
+        return
+
+    snapshot = _snapshots.pop(test_id, None)
+    if snapshot is None:
+        return
+
+    for question in snapshot.questions:
+        _question_to_test.pop(question.question_id, None)
+    if snapshot.article_id is not None:
+        _article_to_tests.get(snapshot.article_id, set()).discard(test_id)
+
+
+def invalidate_question_snapshot(question_id: int):
+    """
+    Сброс снимка теста, которому принадлежит вопрос
+
+    Args:
+        question_id: ID вопроса
+    """
+    test_id = _question_to_test.get(question_id)
+    if test_id is not None:
+        invalidate_test_snapshot(test_id)
+
+
+def invalidate_article_snapshots(article_id: int):
+    """
+    Сброс снимков всех тестов статьи (название статьи входит в снимок)
+
+    Args:
+        article_id: ID статьи
+    """
+    for test_id in list(_article_to_tests.pop(article_id, ())):
+        invalidate_test_snapshot(test_id)
+
+
+# ====================== БУФЕР ОТВЕТОВ ПОЛЬЗОВАТЕЛЕЙ ======================
+
+# Попытка без новых ответов дольше этого времени считается брошенной
+ATTEMPT_IDLE_TIMEOUT = 30 * 60
+# Интервал фоновой проверки брошенных попыток (секунды)
+ANSWER_FLUSH_INTERVAL = 60
+
+
+@dataclass(slots=True)
+class _PendingAttempt:
+    rows: list
+    touched_at: float
+    # Итог завершенной попытки, запись которого не удалась
+    score: Optional[int] = None
+    is_passed: Optional[bool] = None
+
+
+# Буфер ответов: attempt_id -> ответы, еще не записанные в БД
+_pending_attempts: Dict[int, _PendingAttempt] = {}
+
+
+async def create_test_attempt(session: AsyncSession, user_id: int, test_id: int, score: int = 10) -> int:
+    """
+    Создание попытки прохождения теста
+
+    Args:
+        session: Сессия SQLAlchemy
+        user_id: ID пользователя
+        test_id: ID теста
+        score: Начальный балл (вычитается за ошибки)
+
+    Returns:
+        int: ID созданной попытки
+    """
+    values = {"user_id": user_id, "test_id": test_id, "score": score, "is_passed": False}
+
+    if SUPPORTS_RETURNING:
+        # Один INSERT ... RETURNING вместо INSERT и повторного SELECT для refresh
+        result = await session.execute(
+            insert(TestAttempt).values(**values).returning(TestAttempt.attempt_id)
+        )
+        attempt_id = result.scalar_one()
+    else:
+        attempt = TestAttempt(**values)
+        session.add(attempt)
+        await session.flush()
+        attempt_id = attempt.attempt_id
+
+    await session.commit()
+    return attempt_id
+
+
+def buffer_user_answer(attempt_id: int, question_id: int, answer_id: int, is_correct: bool):
+    """
+    Добавление ответа пользователя в буфер попытки (без обращения к БД)
+
+    Args:
+        attempt_id: ID попытки
+        question_id: ID вопроса
+        answer_id: ID выбранного ответа
+        is_correct: Правильный ли ответ
+    """
+    pending = _pending_attempts.get(attempt_id)
+    if pending is None:
+        pending = _pending_attempts[attempt_id] = _PendingAttempt(rows=[], touched_at=0.0)
+
+    pending.rows.append({
+        "attempt_id": attempt_id,
+        "question_id": question_id,
+        "answer_id": answer_id,
+        "is_correct": is_correct,
+        "created_at": datetime.utcnow()
+    })
+    pending.touched_at = monotonic()
+
+
+async def _write_attempt(session: AsyncSession, attempt_id: int, rows: list, values: dict):
+    if rows:
+        await session.execute(insert(UserAnswer), rows)
+    if values:
+        await session.execute(
+            update(TestAttempt)
+            .where(TestAttempt.attempt_id == attempt_id)
+            .values(**values)
+        )
+    await session.commit()
+
+
+async def _detach_missing_references(session: AsyncSession, rows: list) -> list:
+    """Обнуление ссылок ответов на вопросы и варианты, удаленные за время попытки"""
+    question_ids = {row["question_id"] for row in rows if row["question_id"] is not None}
+    answer_ids = {row["answer_id"] for row in rows if row["answer_id"] is not None}
+    existing_questions = set((await session.execute(
+        select(Question.question_id).where(Question.question_id.in_(question_ids))
+    )).scalars())
+    existing_answers = set((await session.execute(
+        select(Answer.answer_id).where(Answer.answer_id.in_(answer_ids))
+    )).scalars())
+
+    detached = []
+    for row in rows:
+        if row["question_id"] not in existing_questions:
+            row = {**row, "question_id": None, "answer_id": None}
+        elif row["answer_id"] not in existing_answers:
+            row = {**row, "answer_id": None}
+        detached.append(row)
+    return detached
+
+
+def _restore_pending(attempt_id: int, rows: list, values: dict):
+    """Возврат ответов и итога попытки в буфер для повтора фоновой задачей"""
+    # touched_at = 0: попытка записывается при следующей проверке run_answer_flusher
+    restored = _pending_attempts.setdefault(attempt_id, _PendingAttempt(rows=[], touched_at=0.0))
+    restored.rows[:0] = rows
+    if restored.score is None:
+        restored.score = values.get("score")
+    if restored.is_passed is None:
+        restored.is_passed = values.get("is_passed")
+
+
+async def flush_attempt_answers(session: AsyncSession, attempt_id: int, score: int = None, is_passed: bool = None) -> bool:
+    """
+    Запись буферизованных ответов попытки и итогового результата одной транзакцией
+
+    Args:
+        session: Сессия SQLAlchemy
+        attempt_id: ID попытки
+        score: Итоговый балл (None - не менять или записать отложенный итог)
+        is_passed: Пройден ли тест (None - не менять или записать отложенный итог)
+
+    Returns:
+        bool: True если запись успешна, иначе False (ответы и итог остаются в
+        буфере и записываются фоновой задачей)
+    """
+    pending = _pending_attempts.pop(attempt_id, None)
+    rows = pending.rows if pending else []
+
+    values = {}
+    if score is None and pending:
+        score = pending.score
+    if is_passed is None and pending:
+        is_passed = pending.is_passed
+    if score is not None:
+        values["score"] = score
+    if is_passed is not None:
+        values["is_passed"] = is_passed
+
+    if not rows and not values:
+        return True
+
+    try:
+        await _write_attempt(session, attempt_id, rows, values)
+        return True
+    except IntegrityError as e:
+        # Повтор не поможет: вопрос или ответ удалены во время попытки
+        await session.rollback()
+        logger.warning(f"Attempt {attempt_id} references deleted questions or answers, saving without them: {e}")
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Error flushing answers of attempt {attempt_id}: {e}")
+        _restore_pending(attempt_id, rows, values)
+        return False
+
+    try:
+        await _write_attempt(session, attempt_id, await _detach_missing_references(session, rows), values)
+        return True
+    except IntegrityError as e:
+        # Попытки больше нет (пользователь удален) - записывать нечего
+        await session.rollback()
+        logger.error(f"Dropping {len(rows)} answers of attempt {attempt_id}: {e}")
+        return False
+    except Exception as e:
+        await session.rollback()
+        logger.error(f"Error flushing answers of attempt {attempt_id}: {e}")
+        _restore_pending(attempt_id, rows, values)
+        return False
+
+
+async def flush_idle_attempts(idle_timeout: float = ATTEMPT_IDLE_TIMEOUT) -> int:
+    """
+    Запись ответов брошенных попыток (без новых ответов дольше idle_timeout)
+
+    Args:
+        idle_timeout: Время бездействия в секундах (0 - записать все попытки)
+
+    Returns:
+        int: Количество записанных попыток
+    """
+    from bot.database.database import AsyncSessionLocal
+
+    now = monotonic()
+    idle = [
+        attempt_id for attempt_id, pending in _pending_attempts.items()
+        if now - pending.touched_at >= idle_timeout
+    ]
+    if not idle:
+        return 0
+
+    flushed = 0
+    async with AsyncSessionLocal() as session:
+        for attempt_id in idle:
+            # Итог записывается, только если он отложен после ошибки записи
+            if await flush_attempt_answers(session, attempt_id):
+                flushed += 1
+
+    logger.info(f"Flushed {flushed} idle test attempts")
+    return flushed
+
+
+async def run_answer_flusher(interval: float = ANSWER_FLUSH_INTERVAL, idle_timeout: float = ATTEMPT_IDLE_TIMEOUT):
+    """
+    Фоновая задача: периодически записывает ответы брошенных попыток
+
+    Args:
+        interval: Интервал проверки в секундах
+        idle_timeout: Время бездействия попытки в секундах
+    """
+    try:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await flush_idle_attempts(idle_timeout)
+            except Exception as e:
+                logger.error(f"Error in answer flusher: {e}")
+    finally:
+        # При остановке бота записываем все, что осталось в буфере
+        await flush_idle_attempts(0)
+
+
+# ====================== ПРОГРЕСС ПОЛЬЗОВАТЕЛЯ ПО ТЕСТАМ ======================
+
+# Время жизни кэша прогресса пользователя (секунды)
+PROGRESS_CACHE_TTL = 60
+
+
+@dataclass(frozen=True, slots=True)
+class TestProgress:
+    test_id: int
+    last_score: int
+    last_is_passed: bool
+    last_attempt_at: Optional[datetime]
+    best_score: int
+    attempts_count: int
+
+
+# Кэш прогресса: user_id -> (время истечения, test_id -> TestProgress)
+_progress_cache: Dict[int, Tuple[float, Mapping[int, TestProgress]]] = {}
+
+
+async def get_user_test_progress(session: AsyncSession, user_id: int) -> Mapping[int, TestProgress]:
+    """
+    Получение последней и лучшей попытки пользователя по каждому тесту одним запросом
+
+    Args:
+        session: Сессия SQLAlchemy
+        user_id: ID пользователя
+
+    Returns:
+        Mapping[int, TestProgress]: Прогресс по тестам (test_id -> TestProgress)
+    """
+    cached = _progress_cache.get(user_id)
+    if cached is not None and cached[0] > monotonic():
+        return cached[1]
+
+    partition = TestAttempt.test_id
+    ranked = (
+        select(
+            TestAttempt.test_id,
+            TestAttempt.score,
+            TestAttempt.is_passed,
+            TestAttempt.created_at,
+            func.row_number().over(
+                partition_by=partition,
+                order_by=(TestAttempt.created_at.desc(), TestAttempt.attempt_id.desc())
+            ).label("rn"),
+            func.max(TestAttempt.score).over(partition_by=partition).label("best_score"),
+            func.count().over(partition_by=partition).label("attempts_count")
+        )
+        .where(TestAttempt.user_id == user_id)
+        .subquery()
+    )
+    result = await session.execute(select(ranked).where(ranked.c.rn == 1))
+
+    progress = {
+        row.test_id: TestProgress(
+            test_id=row.test_id,
+            last_score=row.score,
+            last_is_passed=row.is_passed,
+            last_attempt_at=row.created_at,
+            best_score=row.best_score,
+            attempts_count=row.attempts_count
+        )
+        for row in result
+    }
+
+    # Итоги попыток, перенесенных в архив (bot/services/retention.py)
+    rollups = await session.execute(
+        select(TestAttemptRollup).where(TestAttemptRollup.user_id == user_id)
+    )
+    for rollup in rollups.scalars():
+        live = progress.get(rollup.test_id)
+        if live is None:
+            progress[rollup.test_id] = TestProgress(
+                test_id=rollup.test_id,
+                last_score=rollup.last_score,
+                last_is_passed=rollup.last_is_passed,
+                last_attempt_at=rollup.last_attempt_at,
+                best_score=rollup.best_score,
+                attempts_count=rollup.attempts_count
+            )
+        else:
+            # Попытки в основной базе всегда новее архивных
+            progress[rollup.test_id] = TestProgress(
+                test_id=live.test_id,
+                last_score=live.last_score,
+                last_is_passed=live.last_is_passed,
+                last_attempt_at=live.last_attempt_at,
+                best_score=max(live.best_score, rollup.best_score),
+                attempts_count=live.attempts_count + rollup.attempts_count
+            )
+
+    progress = MappingProxyType(progress)
+    _progress_cache[user_id] = (monotonic() + PROGRESS_CACHE_TTL, progress)
+    return progress
+
+
+def invalidate_user_progress(user_id: Optional[int] = None):
+    """
+    Сброс кэша прогресса пользователя (или всех пользователей, если user_id не указан)
+
+    Args:
+        user_id: ID пользователя
+    """
+    if user_id is None:
+        _progress_cache.clear()
+    else:
+        _progress_cache.pop(user_id, None)
+
+
+# ====================== СТАТИСТИКА ТЕСТОВ ======================
+
+async def get_test_statistics(session: AsyncSession, test_id: int) -> Dict[str, Any]:
+    """
+    Статистика теста одним запросом с учетом попыток, перенесенных в архив
+
+    Args:
+        session: Сессия SQLAlchemy
+        test_id: ID теста
+
+    Returns:
+        Dict: total_attempts, unique_users, avg_score, success_rate
+    """
+    # Итоги попыток основной базы и архива - по одной строке
+    totals = union_all(
+        select(
+            func.count(TestAttempt.attempt_id).label("attempts"),
+            func.coalesce(func.sum(TestAttempt.score), 0).label("score_sum"),
+            func.coalesce(func.sum(case((TestAttempt.is_passed == True, 1), else_=0)), 0).label("passed")
+        ).where(TestAttempt.test_id == test_id),
+        select(
+            func.coalesce(func.sum(TestAttemptRollup.attempts_count), 0),
+            func.coalesce(func.sum(TestAttemptRollup.score_sum), 0),
+            func.coalesce(func.sum(TestAttemptRollup.passed_count), 0)
+        ).where(TestAttemptRollup.test_id == test_id)
+    ).subquery()
+
+    users = union(
+        select(TestAttempt.user_id).where(TestAttempt.test_id == test_id),
+        select(TestAttemptRollup.user_id).where(TestAttemptRollup.test_id == test_id)
+    ).subquery()
+
+    result = await session.execute(
+        select(
+            func.sum(totals.c.attempts),
+            func.sum(totals.c.score_sum),
+            func.sum(totals.c.passed),
+            select(func.count()).select_from(users).scalar_subquery()
+        )
+    )
+    attempts, score_sum, passed, unique_users = result.one()
+    attempts = attempts or 0
+
+    return {
+        "total_attempts": attempts,
+        "unique_users": unique_users or 0,
+        "avg_score": round(score_sum / attempts, 1) if attempts else 0,
+        "success_rate": round(passed * 100 / attempts, 1) if attempts else 0
+    }
@@ -0,0 +1,87 @@
+"""
+Сервисные функции для пользователей.
+
+Зарегистрированные пользователи хранятся в множестве в памяти (как
+администраторы в bot/services/admins.py): оно загружается при запуске бота
+и пополняется при регистрации, поэтому проверка регистрации - это поиск в
+множестве, а не запрос к базе данных.
+"""
+
+from typing import Optional, Set
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from bot.database.database import get_insert, supports_on_conflict
+from bot.database.models import User
+from bot.services.admins import refresh_admin_ids
+from bot.utils.logger import logger
+
+_registered_ids: Optional[Set[int]] = None
+
+
+async def load_registered_user_ids(session: AsyncSession) -> Set[int]:
+    """
+    Загрузка множества зарегистрированных пользователей одним запросом
+
+    Args:
+        session: Сессия SQLAlchemy
+
+    Returns:
+        Set[int]: Telegram ID пользователей из таблицы users
+    """
+    global _registered_ids
+
+    result = await session.execute(select(User.user_id))
+    _registered_ids = set(result.scalars().all())
+    logger.debug(f"Registered user ids loaded: {len(_registered_ids)}")
+    return _registered_ids
+
+
+async def is_registered_user(session: AsyncSession, user_id: int) -> bool:
+    """
+    Проверка, зарегистрирован ли пользователь
+
+    Args:
+        session: Сессия SQLAlchemy (используется только для загрузки множества)
+        user_id: Telegram ID пользователя
+
+    Returns:
+        bool: True если пользователь есть в таблице users
+    """
+    if _registered_ids is not None:
+        return user_id in _registered_ids
+    try:
+        return user_id in await load_registered_user_ids(session)
+    except Exception as e:
+        logger.error(f"Error loading registered user ids: {e}")
+        return False
+
+
+async def upsert_user(session: AsyncSession, user_id: int, **values) -> None:
+    """
+    Создание пользователя или обновление его данных, если он уже существует
+
+    На PostgreSQL и SQLite выполняется одним INSERT ... ON CONFLICT, поэтому
+    повторное нажатие кнопки при регистрации не приводит к ошибке уникальности.
+
+    Args:
+        session: Сессия SQLAlchemy
+        user_id: Telegram ID пользователя
+        **values: Поля пользователя (first_name, last_name, city_id, store_id, is_admin)
+    """
+    if supports_on_conflict():
+        stmt = get_insert(User).values(user_id=user_id, **values)
+        stmt = stmt.on_conflict_do_update(index_elements=[User.user_id], set_=values)
+        await session.execute(stmt)
+    else:
+        await session.merge(User(user_id=user_id, **values))
+
+    await session.commit()
+
+    if _registered_ids is not None:
+        _registered_ids.add(user_id)
+
+    # Флаг администратора изменился - перестраиваем множество администраторов
+    if "is_admin" in values:
+        await refresh_admin_ids(session)
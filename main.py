@@ -11,10 +11,18 @@ from aiogram.utils.keyboard import ReplyKeyboardBuilder, InlineKeyboardBuilder
 from aiogram.types import KeyboardButton, InlineKeyboardButton
 from aiogram.dispatcher.middlewares.base import BaseMiddleware
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, update
 from bot.config import BOT_TOKEN, ADMIN_IDS
-from bot.database.database import Base, async_engine, AsyncSessionLocal
+from bot.database.database import Base, async_engine, AsyncSessionLocal, check_database_profile
 from bot.database.models import User, City, Store
+from bot.services.tests import run_answer_flusher
+from bot.services.audit import run_admin_log_writer
+from bot.services.retention import run_retention_job
+from bot.services.library_version import run_library_version_watcher
+from bot.services.search import ensure_search_index
+from bot.services.broadcast import resume_pending_broadcasts
+from bot.services.users import upsert_user, load_registered_user_ids
+from bot.services.admins import is_admin_user, load_admin_ids
 from bot.utils.logger import logger
 from aiogram import Bot, Dispatcher
 from aiogram.fsm.storage.memory import MemoryStorage
@@ -35,6 +43,9 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'bot'))
 
 # Import middleware
 from bot.middlewares.database import DatabaseMiddleware
+from bot.middlewares.auth import IsAdmin
+from bot.handlers.exports import router as exports_router
+from bot.handlers.search import router as search_router
 
 # Import all handlers
 from bot.handlers.library_handler import router as library_router
@@ -51,6 +62,7 @@ async def set_commands(bot: Bot):
     commands = [
         BotCommand(command="start", description="Запустить бота"),
         BotCommand(command="help", description="Показать помощь"),
+        BotCommand(command="search", description="Поиск статей"),
         BotCommand(command="admin", description="Панель администратора")
     ]
     await bot.set_my_commands(commands)
@@ -99,12 +111,6 @@ class AdminStates(StatesGroup):
     waiting_for_city_new_name = State()
 
 # Middleware для работы с базой данных
-class DbSessionMiddleware(BaseMiddleware):
-    async def __call__(self, handler, event, data):
-        async with AsyncSessionLocal() as session:
-            data["session"] = session
-            return await handler(event, data)
-
 # Создание основной клавиатуры
 def get_main_menu_kb():
     """Клавиатура главного меню пользователя"""
@@ -115,11 +121,12 @@ def get_main_menu_kb():
         KeyboardButton(text="📝 Пройти тест"),
         KeyboardButton(text="🏆 Мої бали"),
         KeyboardButton(text="📢 Оголошення"),
-        KeyboardButton(text="👤 Мій профіль")  # Добавлена кнопка профиля
+        KeyboardButton(text="👤 Мій профіль"),  # Добавлена кнопка профиля
+        KeyboardButton(text="🔍 Пошук статей")
     )
     
-    # Размещаем кнопки в 2 строки по 2 кнопки и последнюю отдельно
-    builder.adjust(2, 2, 1)
+    # Размещаем кнопки в 3 строки по 2 кнопки
+    builder.adjust(2, 2, 2)
     
     return builder.as_markup(resize_keyboard=True)
 
@@ -318,7 +325,7 @@ async def cmd_start(message: Message, state: FSMContext, session: AsyncSession):
         
         if user:
             # Если пользователь уже зарегистрирован, показываем приветствие
-            if user.is_admin:
+            if await is_admin_user(session, user_id):
                 await message.answer(
                     f"З поверненням, {user.first_name} {user.last_name}!\n"
                     f"Ви є адміністратором. Виберіть опцію:",
@@ -353,6 +360,7 @@ async def cmd_help(message: Message):
         "<b>Доступні команди:</b>\n"
         "/start - Запустити бота / повернутися в головне меню\n"
         "/help - Показати цю довідку\n"
+        "/search - Пошук статей у бібліотеці знань\n"
         "/admin - Доступ до панелі адміністратора (тільки для адміністраторів)",
         parse_mode="HTML"
     )
@@ -362,13 +370,14 @@ async def cmd_admin(message: Message, session: AsyncSession):
     user_id = message.from_user.id
     
     # Проверяем, является ли пользователь администратором
-    if user_id in ADMIN_IDS:
-        # Обновляем статус в базе данных
-        user = await session.execute(select(User).where(User.user_id == user_id))
-        user = user.scalar_one_or_none()
-        
-        if user:
-            user.is_admin = True
+    if await is_admin_user(session, user_id):
+        if user_id in ADMIN_IDS:
+            # Обновляем статус в базе данных
+            await session.execute(
+                update(User)
+                .where(User.user_id == user_id, User.is_admin == False)
+                .values(is_admin=True)
+            )
             await session.commit()
         
         # Показываем админ-меню
@@ -520,8 +529,9 @@ async def process_store_selection(callback: CallbackQuery, state: FSMContext, se
             is_admin = callback.from_user.id in ADMIN_IDS
             
             # Создаем нового пользователя в базе данных
-            new_user = User(
-                user_id=callback.from_user.id,
+            await upsert_user(
+                session,
+                callback.from_user.id,
                 first_name=first_name,
                 last_name=last_name,
                 city_id=city_id,
@@ -529,9 +539,6 @@ async def process_store_selection(callback: CallbackQuery, state: FSMContext, se
                 is_admin=is_admin
             )
             
-            session.add(new_user)
-            await session.commit()
-            
             # Получаем информацию о городе и магазине
             city_result = await session.execute(select(City).where(City.city_id == city_id))
             city = city_result.scalar_one_or_none()
@@ -788,12 +795,7 @@ async def back_to_main_menu(callback: CallbackQuery, state: FSMContext, session:
     user_id = callback.from_user.id
     
     # Проверяем, является ли пользователь администратором
-    result = await session.execute(
-        select(User).where(User.user_id == user_id)
-    )
-    user = result.scalar_one_or_none()
-    
-    if user and user.is_admin:
+    if await is_admin_user(session, user_id):
         await callback.message.edit_text(
             "Ви повернулись до головного меню.",
         )
@@ -1317,13 +1319,25 @@ async def main():
         logger.error(f"Ошибка при создании таблиц: {e}")
         raise
 
+    # Проверяем, какой профиль хранения применен к базе данных
+    await check_database_profile()
+    
+    # Индекс полнотекстового поиска статей (FTS5)
+    await ensure_search_index()
+
+    # Загружаем множества администраторов (ADMIN_IDS и users.is_admin)
+    # и зарегистрированных пользователей (инлайн-поиск статей)
+    async with AsyncSessionLocal() as session:
+        await load_admin_ids(session)
+        await load_registered_user_ids(session)
+
     # Инициализация бота и диспетчера
     bot = Bot(token=BOT_TOKEN)
     storage = MemoryStorage()
     dp = Dispatcher(storage=storage)
     
     # Регистрация middleware
-    dp.update.middleware(DbSessionMiddleware())
+    dp.update.middleware(DatabaseMiddleware())
     
     # Регистрация обработчиков
     dp.message.register(cmd_start, CommandStart())
@@ -1350,37 +1364,64 @@ async def main():
     dp.callback_query.register(back_to_main_menu, F.data == "back_to_main_menu")
     
     # Обработчики админа
-    dp.callback_query.register(admin_locations, F.data == "admin_locations")
-    dp.callback_query.register(back_to_admin_menu, F.data == "back_to_admin")
-    dp.callback_query.register(back_to_locations, F.data == "back_to_locations")
-    dp.callback_query.register(user_mode_command, F.data == "user_mode")
+    dp.callback_query.register(admin_locations, F.data == "admin_locations", IsAdmin())
+    dp.callback_query.register(back_to_admin_menu, F.data == "back_to_admin", IsAdmin())
+    dp.callback_query.register(back_to_locations, F.data == "back_to_locations", IsAdmin())
+    dp.callback_query.register(user_mode_command, F.data == "user_mode", IsAdmin())
     
     # Обработчики для управления городами и магазинами
-    dp.callback_query.register(add_city_command, F.data == "add_city")
-    dp.message.register(process_city_name, AdminStates.waiting_for_city_name)
-    dp.callback_query.register(list_cities_command, F.data == "list_cities")
-    dp.callback_query.register(add_store_command, F.data == "add_store")
-    dp.callback_query.register(process_city_for_store, F.data.startswith("admin_city_"))
-    dp.message.register(process_store_name, AdminStates.waiting_for_store_name)
-    dp.callback_query.register(list_stores_command, F.data == "list_stores")
-    dp.callback_query.register(list_stores_by_city, F.data.startswith("list_stores_city_"))
+    dp.callback_query.register(add_city_command, F.data == "add_city", IsAdmin())
+    dp.message.register(process_city_name, AdminStates.waiting_for_city_name, IsAdmin())
+    dp.callback_query.register(list_cities_command, F.data == "list_cities", IsAdmin())
+    dp.callback_query.register(add_store_command, F.data == "add_store", IsAdmin())
+    dp.callback_query.register(process_city_for_store, F.data.startswith("admin_city_"), IsAdmin())
+    dp.message.register(process_store_name, AdminStates.waiting_for_store_name, IsAdmin())
+    dp.callback_query.register(list_stores_command, F.data == "list_stores", IsAdmin())
+    dp.callback_query.register(list_stores_by_city, F.data.startswith("list_stores_city_"), IsAdmin())
     
      # Обработчики для редактирования городов и магазинов
-    dp.callback_query.register(edit_cities_command, F.data == "edit_cities")
-    dp.callback_query.register(edit_city_name_command, F.data.startswith("edit_city_"))
-    dp.message.register(process_edit_city_name, AdminStates.waiting_for_city_new_name)
-    dp.callback_query.register(edit_stores_command, F.data == "edit_stores")
-    dp.callback_query.register(edit_stores_city, F.data.startswith("edit_stores_city_"))
-    dp.callback_query.register(edit_store_name_command, F.data.startswith("edit_store_"))
-    dp.message.register(process_edit_store_name, AdminStates.waiting_for_store_new_name)
+    dp.callback_query.register(edit_cities_command, F.data == "edit_cities", IsAdmin())
+    dp.callback_query.register(edit_city_name_command, F.data.startswith("edit_city_"), IsAdmin())
+    dp.message.register(process_edit_city_name, AdminStates.waiting_for_city_new_name, IsAdmin())
+    dp.callback_query.register(edit_stores_command, F.data == "edit_stores", IsAdmin())
+    dp.callback_query.register(edit_stores_city, F.data.startswith("edit_stores_city_"), IsAdmin())
+    dp.callback_query.register(edit_store_name_command, F.data.startswith("edit_store_"), IsAdmin())
+    dp.message.register(process_edit_store_name, AdminStates.waiting_for_store_new_name, IsAdmin())
+    
+    # Выгрузка результатов тестов
+    dp.include_router(exports_router)
+    dp.include_router(search_router)
     
        
     
+    # Фоновая запись ответов брошенных попыток тестов
+    answer_flusher = asyncio.create_task(run_answer_flusher())
+    
+    # Фоновая пакетная запись журнала действий администраторов
+    admin_log_writer = asyncio.create_task(run_admin_log_writer())
+    
+    # Периодический перенос устаревших попыток и доставок в архив
+    retention_job = asyncio.create_task(run_retention_job())
+    
+    # Сброс кэшей библиотеки после импорта из командной строки
+    library_watcher = asyncio.create_task(run_library_version_watcher())
+    
+    # Продолжаем рассылки, прерванные перезапуском
+    await resume_pending_broadcasts(bot)
+    
     # Запуск бота
     logger.info("Бот запускается...")
     await bot.delete_webhook(drop_pending_updates=True)
     logger.info("Бот запущен!")
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        # При остановке записываем все буферизованные ответы и журнал
+        answer_flusher.cancel()
+        admin_log_writer.cancel()
+        retention_job.cancel()
+        library_watcher.cancel()
+        await asyncio.gather(answer_flusher, admin_log_writer, retention_job, library_watcher, return_exceptions=True)
 
 if __name__ == "__main__":
     try: